@@ -1,6 +1,6 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from flask import Flask, render_template
+from flask import Flask, render_template, g, send_from_directory, url_for, abort
 from playwright.sync_api import sync_playwright
 import json
 import os 
@@ -12,15 +12,66 @@ from intelligent_reporting.profiling.DataSampler import DataSampler
 from intelligent_reporting.profiling.DataSummarizer import DataSummarizer
 from intelligent_reporting.profiling.DataVisualizer import DataVisualizer
 from intelligent_reporting.profiling.DataCorrelater import DataCorrelater
+from intelligent_reporting.profiling.DatasetProfile import DatasetProfile
+from intelligent_reporting.profiling.FigureRenderer import FigureRenderer
+from intelligent_reporting.profiling.FigureCache import FigureCache
 from datetime import datetime
 from intelligent_reporting.pipeline import Pipeline
+from intelligent_reporting.orchestrator.scheduler import DAGScheduler
+from intelligent_reporting.core import tracing
+from intelligent_reporting.core.profiler import PROFILE_URL_HEADER, RequestProfiler, requested_mode, is_enabled as profiling_enabled
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+)
+logger = logging.getLogger(__name__)
 
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=[PROFILE_URL_HEADER])
+
+# figures of all the profilers rendered concurrently, the worker processes are kept between uploads
+# and figures already rendered from the same plot inputs are reused from the cache
+FIGURE_RENDERER = FigureRenderer(cache=FigureCache(os.path.join("results", ".figure_cache")))
 
 USERS_FILE = "users.json"
 
+# profiles of the requests sent with an X-Profile header or ?profile=1
+PROFILES_DIR = os.path.join("results", "profiles")
+
+@app.before_request
+def start_profiler():
+    mode = requested_mode(request.headers, request.args)
+    if mode is None:
+        return
+    g.profiler = RequestProfiler(PROFILES_DIR, mode=mode, name=request.endpoint or request.path)
+    g.profiler.__enter__()
+
+@app.after_request
+def stop_profiler(response):
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.__exit__(None, None, None)
+    if profiler.filename:
+        response.headers[PROFILE_URL_HEADER] = url_for("get_profile", filename=profiler.filename, _external=True)
+    return response
+
+@app.teardown_request
+def discard_profiler(exc):
+    # still set when the request raised before after_request ran, the profile is written anyway
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.__exit__(None, None, None)
+
+@app.get("/profiles/<filename>")
+def get_profile(filename):
+    if not profiling_enabled():
+        abort(404)
+    return send_from_directory(os.path.abspath(PROFILES_DIR), filename, as_attachment=True)
+
 @app.get("/")
 def test():
     return "<h1>Hello! Flask is running.</h1>" 
@@ -142,45 +193,54 @@ def upload_files():
     #'''
     extension = filepath.split(".")[-1]
     pipeline = Pipeline(file=f"./data/{file.filename}")
-    data=None
+    load_options = {}
     try:
         if(extension=="csv"):
             has_header = param_string["has_header"].rstrip()
             seperator = param_string["seperator"].rstrip()
             encoding = param_string["encoding"].rstrip()
             if(has_header!="" and seperator!="" and encoding!=""):
-               data = pipeline.load(has_header=(has_header=="true"), seperator=seperator, encoding=encoding)
-            else:
-               data = pipeline.load()    
+               load_options = dict(has_header=(has_header=="true"), seperator=seperator, encoding=encoding)
         elif(extension in ["xls", "xlsx"]):
             sheet_id = param_string["sheet_id"].strip()
             sheet_name = param_string["sheet_name"].strip()
             table_name = param_string["table_name"].strip()
             has_header = param_string["has_header"].strip()
             if(sheet_id!="" and sheet_name!="" and table_name!="" and has_header!=""):
-                data = pipeline.load(sheet_id=int(sheet_id), sheet_name=sheet_name, table_name=table_name, has_header=(has_header=="true"))
-            else:
-                data = pipeline.load()    
-        else:
-            data = pipeline.load()
-
-        typed, schema = pipeline.infer(data=data) 
-
-        downcasted = pipeline.downcast(data=typed)
+                load_options = dict(sheet_id=int(sheet_id), sheet_name=sheet_name, table_name=table_name, has_header=(has_header=="true"))
 
         RESULTS_DIR = "results"
         FIGURES_DIR = "figures"
         MAX_ROWS = 5  
         cleanOutputPath(path=f"{RESULTS_DIR}/{FIGURES_DIR}")
-        sampler = DataSampler(df=downcasted, max_rows=MAX_ROWS, sample_dir = RESULTS_DIR)
-        summarizer = DataSummarizer(df=downcasted, summary_dir= RESULTS_DIR, figures_dir= FIGURES_DIR)
-        visualizer = DataVisualizer(df=downcasted, summary_dir= RESULTS_DIR, figures_dir= FIGURES_DIR, top_k_categories=5)
-        correlater = DataCorrelater(df=downcasted)
- 
-        sample = sampler.run_sample()
-        summary = summarizer.summary()
-        visualizer.run_viz()
-        correlater.run()
+
+        def stats(downcasted):
+            # derived facts (stats, column roles, pandas views...) computed once and shared by the profilers
+            profile = DatasetProfile(downcasted)
+            profile.stats, profile.index_cols
+            return profile
+
+        # the profilers only share the profile, they run concurrently once its stats are computed
+        dag = DAGScheduler()
+        # the figures of this upload, waited for apart from the other requests sharing the renderer
+        figures = FIGURE_RENDERER.batch()
+        # load, infer and downcast fused in one lazy query, no raw or typed copy is kept alive
+        dag.add("pipeline", lambda: pipeline.run(**load_options))
+        dag.add("stats", lambda result: stats(result.data), deps=["pipeline"])
+        dag.add("sample", lambda profile: DataSampler(df=profile, max_rows=MAX_ROWS, sample_dir = RESULTS_DIR).run_sample(), deps=["stats"])
+        dag.add("summary", lambda profile: DataSummarizer(df=profile, summary_dir= RESULTS_DIR, figures_dir= FIGURES_DIR, renderer=figures).summary(), deps=["stats"])
+        dag.add("plots", lambda profile: DataVisualizer(df=profile, summary_dir= RESULTS_DIR, figures_dir= FIGURES_DIR, top_k_categories=5, renderer=figures).run_viz(), deps=["stats"])
+        dag.add("correlations", lambda profile: DataCorrelater(df=profile, renderer=figures).run(), deps=["stats"])
+        dag.run()
+        figures.wait()
+        logger.info(f"Stage timings: {dag.timings()}")
+        logger.info(f"Pipeline memory: {dag.stages['pipeline'].result.memory}")
+        logger.info(f"Figure metrics: {figures.metrics()}")
+        if tracing.is_enabled():
+            # INTELLIGENT_REPORTING_TRACE=1: spans of this upload, open results/trace.json in ui.perfetto.dev
+            tracing.export_jsonl(f"{RESULTS_DIR}/trace.jsonl")
+            tracing.export_chrome_trace(f"{RESULTS_DIR}/trace.json")
+            tracing.reset()
     except:
         return jsonify({"message": "Something went wrong"}), 409
 
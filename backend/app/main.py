@@ -1,8 +1,16 @@
-from fastapi import FastAPI
+import os
+import sys
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse
 from api.routes import router as api_router
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 
+# the request profiler is shared with the intelligent_reporting package at the repository root
+# (the Docker image copies it next to the backend)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from intelligent_reporting.core.profiler import PROFILE_URL_HEADER, RequestProfiler, requested_mode, is_enabled as profiling_enabled
+
 app = FastAPI(title="Agentic Backend")
 
 app.add_middleware(
@@ -11,8 +19,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PROFILE_URL_HEADER],
 )
 
+# profiles of the requests sent with an X-Profile header or ?profile=1, next to the sandbox outputs
+PROFILES_DIR = os.path.join("sandbox", "profiles")
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Profile a request on demand, the link to its profile is returned in the X-Profile-Url header"""
+    mode = requested_mode(request.headers, request.query_params)
+    if mode is None:
+        return await call_next(request)
+
+    profiler = RequestProfiler(PROFILES_DIR, mode=mode, name=request.url.path)
+    with profiler:
+        response = await call_next(request)
+    if profiler.filename:
+        response.headers[PROFILE_URL_HEADER] = str(request.url_for("get_profile", filename=profiler.filename))
+    return response
+
 app.include_router(api_router)
 load_dotenv()
 
@@ -20,3 +47,11 @@ load_dotenv()
 @app.get("/")
 async def root():
     return {"message": "Agentic Backend is running"}
+
+
+@app.get("/profiles/{filename}")
+async def get_profile(filename: str):
+    path = os.path.join(PROFILES_DIR, os.path.basename(filename))
+    if not profiling_enabled() or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Profile not found: {filename}")
+    return FileResponse(path, filename=os.path.basename(path))
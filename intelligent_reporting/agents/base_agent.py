@@ -1,12 +1,20 @@
 from abc import ABC, abstractmethod
 from typing import Any, Dict, Optional
 
+from ..core.tracing import traced
+
 
 class Agent(ABC):
     """
     Abstract base class for all agents.
     """
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # every agent run is recorded as a span (core.tracing)
+        if "run" in cls.__dict__:
+            cls.run = traced(f"agent.{cls.__name__}.run")(cls.__dict__["run"])
+
     @abstractmethod
     def run(self, *args, **kwargs) -> Any:
         """
@@ -0,0 +1,326 @@
+"""
+Batch mode: profile every file matching a glob on a pool of worker processes.
+
+    python -m intelligent_reporting.batch "drops/*.csv" --output batch_results --workers 4
+
+Every file is loaded, inferred and downcasted (Pipeline.run) then profiled in its own output
+directory. Workers import the package once and run many files. Jobs are only started while the
+memory they are expected to need fits in the budget, and a manifest records the status, stage
+timings and peak memory of every file.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from .core.memory import peak_rss_mb, reset_peak_rss
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+# in-memory size of a frame relative to its file, until a file of the same type has been measured
+EXPANSION = {".csv": 3.0, ".json": 4.0, ".xml": 6.0, ".parquet": 6.0, ".pq": 6.0, ".xls": 8.0, ".xlsx": 8.0}
+DEFAULT_EXPANSION = 4.0
+# memory reserved per job on top of its data: interpreter, polars, matplotlib
+JOB_BASE_MB = 300
+# only files above this size teach the expansion ratio, the fixed costs dominate below
+LEARN_MIN_MB = 16
+
+
+def _available_memory_mb() -> float | None:
+    """Memory available to new processes"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024**2 / 2
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _init_worker(polars_threads: int):
+    # the workers share the CPUs, set before the first job imports polars
+    os.environ.setdefault("POLARS_MAX_THREADS", str(polars_threads))
+
+
+def job_directory(output: str, path: str) -> str:
+    """Output directory of one file, unique even for files with the same name"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output, f"{stem}-{digest}")
+
+
+def profile_file(path: str, output_dir: str, *, max_rows: int = 5, top_k_categories: int = 5) -> dict:
+    """Run load -> infer -> downcast -> profile for one file in a worker, return its manifest record"""
+    from .pipeline import Pipeline
+    from .profiling import DataCorrelater, DataSampler, DataSummarizer, DataVisualizer, DatasetProfile, FigureRenderer
+
+    # the mark of a worker is restarted for every job
+    reset_peak_rss()
+    baseline = peak_rss_mb()
+    record = {
+        "file": path,
+        "output_dir": output_dir,
+        "file_mb": os.path.getsize(path) / 1024**2,
+        "status": "ok",
+        "error": None,
+        "rows": None,
+        "columns": None,
+        "timings": {},
+        "pid": os.getpid(),
+    }
+    timings = record["timings"]
+    start = time.perf_counter()
+
+    def timed(stage, func):
+        t0 = time.perf_counter()
+        try:
+            return func()
+        finally:
+            timings[stage] = time.perf_counter() - t0
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        result = timed("pipeline", lambda: Pipeline(file=path).run(
+            schema_dir=os.path.join(output_dir, "schema"), keep_encoding=True, batch_size=100_000, engine="streaming",
+            raise_errors=True,
+        ))
+        record["rows"], record["columns"] = result.data.shape
+
+        def build_profile():
+            profile = DatasetProfile(result.data)
+            profile.stats
+            return profile
+
+        profile = timed("stats", build_profile)
+        renderer = FigureRenderer(max_workers=0)
+        timed("sample", lambda: DataSampler(df=profile, max_rows=max_rows, sample_dir=output_dir).run_sample())
+        timed("summary", lambda: DataSummarizer(df=profile, summary_dir=output_dir, figures_dir="figures", renderer=renderer).summary())
+        timed("plots", lambda: DataVisualizer(df=profile, summary_dir=output_dir, top_k_categories=top_k_categories, renderer=renderer).run_viz())
+        timed("correlations", lambda: DataCorrelater(df=profile, renderer=renderer, output_dir=output_dir).run())
+        record["figures"] = renderer.metrics()
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = f"{type(e).__name__}: {e}"
+        with open(os.path.join(output_dir, "error.txt"), "w", encoding="utf-8") as f:
+            f.write(traceback.format_exc())
+
+    timings["total"] = time.perf_counter() - start
+    peak = peak_rss_mb()
+    record["peak_rss_mb"] = peak
+    record["peak_rss_increase_mb"] = peak - baseline if peak is not None and baseline is not None else None
+    return record
+
+
+class BatchRunner:
+    """
+    Profiles many files on a process pool. A job is started only when a worker is free and the
+    memory estimated for it (file size times the expansion of its type, plus JOB_BASE_MB) fits in
+    what the running jobs leave of the budget, a file too large for the budget runs alone.
+    The expansion ratios are corrected with the peak memory measured on finished jobs.
+    When a worker dies, every job lost with the pool is retried once, alone, and only a job
+    that kills a worker again is recorded as failed.
+    """
+
+    def __init__(self, output: str, *, workers: int | None = None, memory_budget_mb: float | None = None,
+                 manifest_format: str = "json", max_rows: int = 5):
+        if manifest_format not in ("json", "parquet"):
+            raise ValueError(f"manifest_format must be 'json' or 'parquet', got '{manifest_format}'")
+        self.output = output
+        self.workers = workers or os.cpu_count() or 1
+        available = _available_memory_mb()
+        self.memory_budget_mb = memory_budget_mb or (available * 0.8 if available else None)
+        self.manifest_format = manifest_format
+        self.max_rows = max_rows
+        self.expansion = dict(EXPANSION)
+        self.records = []
+
+    def estimate_mb(self, path: str) -> float:
+        ext = os.path.splitext(path)[1].lower()
+        return JOB_BASE_MB + os.path.getsize(path) / 1024**2 * self.expansion.get(ext, DEFAULT_EXPANSION)
+
+    def _learn(self, record: dict):
+        increase = record.get("peak_rss_increase_mb")
+        if record["status"] != "ok" or increase is None or record["file_mb"] < LEARN_MIN_MB:
+            return
+        ext = os.path.splitext(record["file"])[1].lower()
+        ratio = max(0.0, increase - JOB_BASE_MB) / record["file_mb"]
+        self.expansion[ext] = max(self.expansion.get(ext, DEFAULT_EXPANSION), ratio)
+
+    def _next_fitting(self, pending: list[str], reserved: float, busy: bool) -> int | None:
+        """Index of the first pending file whose estimate fits next to the running jobs"""
+        for index, path in enumerate(pending):
+            if not busy or not self.memory_budget_mb or reserved + self.estimate_mb(path) <= self.memory_budget_mb:
+                return index
+        return None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # spawned workers, forking a process that runs the polars thread pool can deadlock
+        context = multiprocessing.get_context("spawn")
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        return ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker, initargs=(threads,))
+
+    def run(self, paths: list[str]) -> list[dict]:
+        """Profile every path, return the manifest records (also written to the output directory)"""
+        os.makedirs(self.output, exist_ok=True)
+        # largest files first, the small ones fill the gaps they leave
+        pending = sorted(set(paths), key=os.path.getsize, reverse=True)
+        started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+        logger.info("Batch | files=%d | workers=%d | memory budget=%s MB", len(pending), self.workers,
+                    round(self.memory_budget_mb) if self.memory_budget_mb else None)
+
+        pool = self._pool()
+        running = {}
+        # jobs lost with a broken pool, each is retried once running alone on a fresh pool
+        suspects, retried = [], set()
+        try:
+            while pending or suspects or running:
+                if suspects:
+                    if not running:
+                        path = suspects.pop(0)
+                        retried.add(path)
+                        running[self._submit(pool, path)] = (path, self.estimate_mb(path))
+                else:
+                    reserved = sum(estimate for _, estimate in running.values())
+                    while pending and len(running) < self.workers:
+                        index = self._next_fitting(pending, reserved, bool(running))
+                        if index is None:
+                            break
+                        path = pending.pop(index)
+                        estimate = self.estimate_mb(path)
+                        running[self._submit(pool, path)] = (path, estimate)
+                        reserved += estimate
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    path, estimate = running.pop(future)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        if path not in retried:
+                            # any of the jobs sharing the pool may have killed it
+                            suspects.append(path)
+                            continue
+                        record = self._failed(path, "worker process died running it alone (out of memory?)")
+                    except Exception as e:
+                        record = self._failed(path, f"{type(e).__name__}: {e}")
+                    self._finish(record, estimate, started_at, start)
+
+                if broken:
+                    # the jobs still running on the broken pool are lost as well
+                    suspects.extend(path for path, _ in running.values())
+                    running = {}
+                    logger.warning("Batch | a worker died, retrying %s one at a time", suspects)
+                    pool.shutdown(cancel_futures=True)
+                    pool = self._pool()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        self.write_manifest(started_at, time.perf_counter() - start)
+        return self.records
+
+    def _submit(self, pool: ProcessPoolExecutor, path: str):
+        return pool.submit(profile_file, path, job_directory(self.output, path), max_rows=self.max_rows)
+
+    def _finish(self, record: dict, estimate: float, started_at: str, start: float):
+        record["estimated_mb"] = estimate
+        self._learn(record)
+        self.records.append(record)
+        logger.info("Batch | %s | %s | %.2fs | peak=%s MB", record["status"], record["file"],
+                    record["timings"].get("total", 0.0), record.get("peak_rss_mb"))
+        self.write_manifest(started_at, time.perf_counter() - start)
+
+    def _failed(self, path: str, error: str) -> dict:
+        return {
+            "file": path,
+            "output_dir": job_directory(self.output, path),
+            "file_mb": os.path.getsize(path) / 1024**2,
+            "status": "failed",
+            "error": error,
+            "rows": None,
+            "columns": None,
+            "timings": {},
+            "pid": None,
+            "peak_rss_mb": None,
+            "peak_rss_increase_mb": None,
+        }
+
+    def write_manifest(self, started_at: str, wall_time: float) -> str:
+        """Write the records so far, the manifest of an interrupted run is still usable"""
+        if self.manifest_format == "parquet":
+            import polars as pl
+
+            rows = [
+                {
+                    **{k: v for k, v in record.items() if k not in ("timings", "figures")},
+                    **{f"time_{stage}": seconds for stage, seconds in record["timings"].items()},
+                }
+                for record in self.records
+            ]
+            path = os.path.join(self.output, "manifest.parquet")
+            pl.DataFrame(rows, infer_schema_length=None).write_parquet(path)
+            return path
+
+        path = os.path.join(self.output, "manifest.json")
+        manifest = {
+            "started_at": started_at,
+            "wall_time": wall_time,
+            "workers": self.workers,
+            "memory_budget_mb": self.memory_budget_mb,
+            "ok": sum(r["status"] == "ok" for r in self.records),
+            "failed": sum(r["status"] != "ok" for r in self.records),
+            "jobs": self.records,
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4, default=str)
+        return path
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m intelligent_reporting.batch",
+        description="Profile every file matching the glob patterns on a pool of worker processes",
+    )
+    parser.add_argument("patterns", nargs="+", help='files or glob patterns, e.g. "drops/**/*.csv"')
+    parser.add_argument("--output", default="batch_results", help="one sub-directory per file and the manifest")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, the number of CPUs by default")
+    parser.add_argument("--memory-budget-mb", type=float, default=None,
+                        help="memory the running jobs may use together, 80%% of the available memory by default")
+    parser.add_argument("--manifest-format", choices=["json", "parquet"], default="json")
+    parser.add_argument("--max-rows", type=int, default=5, help="rows of the sample of every file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    paths = [path for pattern in args.patterns for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)]
+    if not paths:
+        logger.error("No file matches %s", args.patterns)
+        return 1
+
+    runner = BatchRunner(args.output, workers=args.workers, memory_budget_mb=args.memory_budget_mb,
+                         manifest_format=args.manifest_format, max_rows=args.max_rows)
+    records = runner.run(paths)
+    failed = [r for r in records if r["status"] != "ok"]
+    logger.info("Batch done | ok=%d | failed=%d | manifest in %s", len(records) - len(failed), len(failed), args.output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,67 @@
 from abc import ABC, abstractmethod
+from typing import Iterator
 import polars as pl
 
+from ..core.sketches import ReservoirSample
+from ..core.tracing import traced
+
+# entry points of the connectors recorded as spans (core.tracing)
+TRACED_METHODS = ("load", "scan", "sample")
+
 class BaseConnector(ABC):
     """
     Generic interface for any data source
     """
     allowed_options: set[str] = set()
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for attr in TRACED_METHODS:
+            method = cls.__dict__.get(attr)
+            if method is not None and not getattr(method, "__traced__", False):
+                setattr(cls, attr, traced(f"connector.{cls.__name__}.{attr}")(method))
+
     @abstractmethod
     def load(self) -> pl.DataFrame:
-        pass
\ No newline at end of file
+        pass
+
+    def iter_batches(self, batch_size: int = 100_000, **options) -> Iterator[pl.DataFrame]:
+        """
+        Read the source as a stream of pl.DataFrame batches.
+        Sources that cannot be streamed are loaded once and sliced
+        """
+        return self.load(**options).iter_slices(n_rows=batch_size)
+
+    @traced("connector.scan")
+    def scan(self, **options) -> pl.LazyFrame:
+        """
+        The source as a lazy query, null-likes normalized, so that later steps
+        are appended to the same plan. Sources that cannot be scanned are loaded once
+        """
+        return self.load(**options).lazy()
+
+    @traced("connector.sample")
+    def sample(self, n_rows: int, *, seed: int = 42, **options) -> pl.DataFrame:
+        """
+        Random rows of the source, drawn as close to the source as the format allows.
+        By default a reservoir over iter_batches: one pass, bounded memory
+        """
+        reservoir = ReservoirSample(n_rows, seed=seed)
+        for batch in self.iter_batches(**options):
+            reservoir.update(batch)
+        return reservoir.sample
+
+    @staticmethod
+    def collect_batches(lf: pl.LazyFrame, batch_size: int) -> Iterator[pl.DataFrame]:
+        """Execute a lazy scan batch by batch"""
+        if hasattr(lf, "collect_batches"):
+            yield from lf.collect_batches(chunk_size=batch_size)
+            return
+        # older polars versions: read the scan slice by slice
+        offset = 0
+        while True:
+            batch = lf.slice(offset, batch_size).collect()
+            if batch.is_empty():
+                return
+            yield batch
+            offset += batch.height
@@ -3,6 +3,9 @@ import numpy as np
 import math
 import csv
 import re
+import io
+from itertools import islice
+from typing import Iterable
 from .base_connector import BaseConnector
 from .registry import register_file
 from ..expection import *
@@ -17,6 +20,13 @@ logger.addHandler(logging.NullHandler())
 @register_file([".csv", ".tsv", ".txt"])
 class CSVConnector(BaseConnector):
 
+    # below this size a sample is drawn from the loaded file
+    SAMPLE_FULL_READ_BYTES = 8 * 1024 * 1024
+    # records that must parse with the header's field count to accept a line start
+    RESYNC_RECORDS = 5
+    # chunks read at extra offsets, per stratum, to top up a short sample
+    TOP_UP_CHUNKS = 4
+
     def __init__(self, path: str):
         self.params = {}
         self.path = path
@@ -166,9 +176,9 @@ class CSVConnector(BaseConnector):
             delimiter = dialect.delimiter
         return delimiter
 
-    def _detect_null_likes(self, df: pl.DataFrame):
+    def _null_like_exprs(self, columns: list[str]) -> list[pl.Expr]:
         """
-        A method to detect null likes and convert them to polars.none values
+        Expressions turning the null likes of every column into polars.none values
         """
         NULL_LIKES = {
             None,
@@ -195,8 +205,9 @@ class CSVConnector(BaseConnector):
 
         string_nulls = {str(v).lower() for v in NULL_LIKES if v is not None}
 
-        for column in df.columns:
-            col_data = df[column]
+        exprs = []
+        for column in columns:
+            col_data = pl.col(column)
 
             # convert everything to str for comparison
             col_as_str = col_data.cast(pl.Utf8).str.strip_chars().str.to_lowercase()
@@ -204,11 +215,15 @@ class CSVConnector(BaseConnector):
             # build mask: match normalized string nulls OR real NaNs
             mask = col_as_str.is_in(string_nulls) | col_data.is_null()
 
-            df = df.with_columns(
-                pl.when(mask).then(None).otherwise(col_data).alias(column)
-            )
+            exprs.append(pl.when(mask).then(None).otherwise(col_data).alias(column))
+
+        return exprs
 
-        return df
+    def _detect_null_likes(self, df: pl.DataFrame):
+        """
+        A method to detect null likes and convert them to polars.none values
+        """
+        return df.with_columns(self._null_like_exprs(df.columns))
 
     def _detect_quotes(self):
         """
@@ -228,12 +243,63 @@ class CSVConnector(BaseConnector):
 
         return False
 
-    def load(self, **options):
+    def _resolve_options(self, options: dict) -> dict:
         """
-        Load the CSVConnector instance into a Polars DataFrame object
+        Complete the user options with the auto-detected reading parameters
         """
-        logger.info("Loader initialized | path=%s", self.path)
+        has_header = self._detect_header()
+        delimiter = self._detect_delimiter()
+
+        if "has_header" not in options and has_header is not None:
+            options["has_header"] = has_header
+            logger.info(
+                "auto-detected parameter: has_header=%s",
+                has_header,
+            )
+        elif "has_header" in options:
+            logger.info(
+                "user-provided parameter: has_header=%s",
+                options["has_header"],
+            )
+
+        options["separator"] = delimiter
+        logger.info(
+            "auto-detected parameter: separator='%s'",
+            delimiter,
+        )
+        options["infer_schema_length"] = 0
+        logger.debug(
+            "internal parameter set: infer_schema_length=0",
+        )
+
+        quote = self._detect_quotes()
+        if "quote_char" not in options:
+            options["quote_char"] = quote
+            logger.info(
+                "auto-detected parameter: quote_char='%s'",
+                quote,
+            )
+        else:
+            logger.info(
+                "user-provided parameter: quote_char='%s'",
+                options["quote_char"],
+            )
+
+        if "encoding" in options:
+            logger.info(
+                "CSV loader | user-provided parameter: encoding='%s'",
+                options["encoding"],
+            )
+
+        # Re-applying robustness options (Essential for messy CSVs)
+        options["truncate_ragged_lines"] = True
+        options["ignore_errors"] = True
+        return options
 
+    def _sanity_check(self, options: dict):
+        """
+        Check the file can be read and the user options are supported
+        """
         if not os.path.exists(self.path):
             raise DataLoadingError(f"File not found: {self.path}")
 
@@ -261,55 +327,16 @@ class CSVConnector(BaseConnector):
                     f"{sorted(allowed_keys)} but got '{key}'"
                 )
 
-        try:
-            has_header = self._detect_header()
-            delimiter = self._detect_delimiter()
-
-            if "has_header" not in options and has_header is not None:
-                options["has_header"] = has_header
-                logger.info(
-                    "auto-detected parameter: has_header=%s",
-                    has_header,
-                )
-            elif "has_header" in options:
-                logger.info(
-                    "user-provided parameter: has_header=%s",
-                    options["has_header"],
-                )
-
-            options["separator"] = delimiter
-            logger.info(
-                "auto-detected parameter: separator='%s'",
-                delimiter,
-            )
-            options["infer_schema_length"] = 0
-            logger.debug(
-                "internal parameter set: infer_schema_length=0",
-            )
-
-            quote = self._detect_quotes()
-            if "quote_char" not in options:
-                options["quote_char"] = quote
-                logger.info(
-                    "auto-detected parameter: quote_char='%s'",
-                    quote,
-                )
-            else:
-                logger.info(
-                    "user-provided parameter: quote_char='%s'",
-                    options["quote_char"],
-                )
-
-            if "encoding" in options:
-                logger.info(
-                    "CSV loader | user-provided parameter: encoding='%s'",
-                    options["encoding"],
-                )
+    def load(self, **options):
+        """
+        Load the CSVConnector instance into a Polars DataFrame object
+        """
+        logger.info("Loader initialized | path=%s", self.path)
 
-            # Re-applying robustness options (Essential for messy CSVs)
-            options["truncate_ragged_lines"] = True
-            options["ignore_errors"] = True
+        self._sanity_check(options)
 
+        try:
+            options = self._resolve_options(options)
             df = pl.read_csv(self.path, **options)
             df = self._detect_null_likes(df=df)
             return df
@@ -319,3 +346,173 @@ class CSVConnector(BaseConnector):
 
         except Exception as e:
             raise DataLoadingError(f"Failed to fully load CSV file: {self.path}") from e
+
+    def scan(self, **options):
+        """
+        The CSVConnector instance as a Polars LazyFrame, null likes normalized in the plan
+        """
+        logger.info("Lazy loader initialized | path=%s", self.path)
+
+        self._sanity_check(options)
+
+        try:
+            options = self._resolve_options(options)
+            lf = pl.scan_csv(self.path, **options)
+            return lf.with_columns(self._null_like_exprs(lf.collect_schema().names()))
+        except ConfigurationError:
+            raise
+        except Exception as e:
+            raise DataLoadingError(f"Failed to scan CSV file: {self.path}") from e
+
+    def iter_batches(self, batch_size: int = 100_000, **options):
+        """
+        Read the CSVConnector instance as a stream of Polars DataFrame batches
+        of batch_size rows, the whole file is never held in memory
+        """
+        logger.info("Batched loader initialized | path=%s | batch_size=%d", self.path, batch_size)
+        return self.collect_batches(self.scan(**options), batch_size)
+
+    def _csv_reader(self, text: str | Iterable[str], options: dict):
+        quote = options.get("quote_char")
+        return csv.reader(
+            io.StringIO(text, newline="") if isinstance(text, str) else text,
+            delimiter=options["separator"],
+            quotechar=quote or '"',
+            quoting=csv.QUOTE_MINIMAL if quote else csv.QUOTE_NONE,
+            strict=True,
+        )
+
+    def _text_encoding(self, options: dict) -> str:
+        """Python codec of the encoding option, polars' utf8 and utf8-lossy are utf-8"""
+        encoding = options.get("encoding") or "utf-8"
+        return "utf-8" if encoding.lower() in ("utf8", "utf8-lossy") else encoding
+
+    def _resync(self, chunk: bytes, n_fields: int, options: dict) -> int:
+        """
+        Offset of the first record start of a chunk read at an arbitrary byte offset, -1 if none.
+        A newline may sit inside a quoted field, so a line start is only accepted when
+        the next RESYNC_RECORDS records parse with n_fields fields each
+        """
+        encoding = self._text_encoding(options)
+        pos = chunk.find(b"\n")
+        while pos != -1:
+            start = pos + 1
+            text = chunk[start:].decode(encoding, errors="ignore")
+            try:
+                records = list(islice(self._csv_reader(text, options), self.RESYNC_RECORDS + 1))
+            except csv.Error:
+                records = []
+            # the last record read may be cut by the end of the chunk
+            if len(records) > self.RESYNC_RECORDS and all(len(r) == n_fields for r in records[:-1]):
+                return start
+            pos = chunk.find(b"\n", start)
+        return -1
+
+    def _record_end(self, chunk: bytes, start: int, options: dict) -> int:
+        """
+        Offset just past the last complete record of chunk[start:], -1 if none.
+        Lines are fed to the csv reader one by one, a record still open in a quoted field
+        at the end of the chunk fails to parse and is cut off
+        """
+        encoding = self._text_encoding(options)
+        # the bytes after the last newline are a cut line
+        lines = [line + b"\n" for line in chunk[start:chunk.rfind(b"\n")].split(b"\n")]
+        ends = np.cumsum([len(line) for line in lines])
+        reader = self._csv_reader((line.decode(encoding, errors="ignore") for line in lines), options)
+        end = -1
+        try:
+            for _ in reader:
+                end = start + int(ends[reader.line_num - 1])
+        except csv.Error:
+            pass
+        return end
+
+    def _read_chunk(self, f, offset: int, chunk_bytes: int, size: int, header: bytes, n_fields: int, options: dict):
+        """Complete records of the chunk read at offset, None when none parse"""
+        f.seek(offset)
+        chunk = f.read(chunk_bytes)
+        start = self._resync(chunk, n_fields, options)
+        if start == -1:
+            return None
+        end = len(chunk) if f.tell() >= size else self._record_end(chunk, start, options)
+        if end <= start:
+            return None
+        try:
+            return pl.read_csv(io.BytesIO(header + chunk[start:end]), **options)
+        except Exception as e:
+            logger.debug("Skipping CSV chunk at byte %d: %s", offset, e)
+            return None
+
+    def sample(self, n_rows: int, *, seed: int = 42, n_slices: int = 8, **options):
+        """
+        Random rows read straight from the file: the body is cut into n_slices strata, each read
+        at one random byte offset so chunks never overlap and no row is drawn twice. Each chunk is
+        resynchronized on a record boundary (quoted newlines respected) and parsed on its own,
+        only a few chunks of the file are read. Chunks short of rows are topped up from extra
+        offsets clear of the chunks already read.
+        Rows of a chunk are neighbours in the file, this is a cluster sample.
+        """
+        logger.info("Sampler initialized | path=%s | n_rows=%d", self.path, n_rows)
+
+        self._sanity_check(options)
+
+        try:
+            options = self._resolve_options(options)
+        except Exception as e:
+            raise DataLoadingError(f"Failed to sample CSV file: {self.path}") from e
+
+        size = os.path.getsize(self.path)
+        if size <= self.SAMPLE_FULL_READ_BYTES:
+            df = self.load(**{k: v for k, v in options.items() if k in self.allowed_options})
+            return df.sample(min(n_rows, df.height), seed=seed)
+
+        with open(self.path, "rb") as f:
+            head = f.read(64 * 1024)
+            header_end = head.find(b"\n") + 1
+            first = next(self._csv_reader(head[:header_end].decode(self._text_encoding(options), errors="ignore"), options), [])
+            header = head[:header_end] if options.get("has_header") else b""
+
+            # chunk size from the average record size of the head
+            body = head[header_end:head.rfind(b"\n") + 1]
+            row_bytes = max(len(body) / max(body.count(b"\n"), 1), 1.0)
+            per_slice = -(-n_rows // n_slices)
+            chunk_bytes = max(int(per_slice * row_bytes * 2), 64 * 1024)
+            if header_end + n_slices * chunk_bytes >= size:
+                df = self.load(**{k: v for k, v in options.items() if k in self.allowed_options})
+                return df.sample(min(n_rows, df.height), seed=seed)
+
+            rng = np.random.default_rng(seed)
+            # one chunk per stratum, a chunk ends before the next stratum starts
+            stratum = (size - header_end) // n_slices
+            offsets = header_end + stratum * np.arange(n_slices) + rng.integers(0, stratum - chunk_bytes + 1, size=n_slices)
+            read = []
+            slices = []
+            n_collected = 0
+            for offset in offsets:
+                read.append(int(offset))
+                part = self._read_chunk(f, int(offset), chunk_bytes, size, header, len(first), options)
+                if part is not None:
+                    slices.append(part.head(per_slice))
+                    n_collected += slices[-1].height
+
+            # top up from random offsets whose chunks overlap none read so far
+            for _ in range(self.TOP_UP_CHUNKS * n_slices):
+                if n_collected >= n_rows:
+                    break
+                offset = int(rng.integers(header_end, size - chunk_bytes + 1))
+                if any(abs(offset - other) < chunk_bytes for other in read):
+                    continue
+                read.append(offset)
+                part = self._read_chunk(f, offset, chunk_bytes, size, header, len(first), options)
+                if part is not None:
+                    slices.append(part.head(min(per_slice, n_rows - n_collected)))
+                    n_collected += slices[-1].height
+
+        if not slices:
+            raise DataLoadingError(f"Failed to sample CSV file: {self.path}")
+        logger.info("CSV sample | chunks=%d | bytes read=%d/%d", len(slices), len(read) * chunk_bytes, size)
+        if n_collected < n_rows:
+            logger.warning("CSV sample short of rows | path=%s | rows=%d/%d", self.path, n_collected, n_rows)
+
+        df = pl.concat(slices, how="diagonal_relaxed").head(n_rows)
+        return self._detect_null_likes(df=df)
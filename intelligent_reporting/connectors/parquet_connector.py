@@ -1,5 +1,6 @@
 import polars as pl
 import numpy as np
+import pyarrow.parquet as pq
 from .base_connector import BaseConnector
 from .registry import register_file
 from ..expection import *
@@ -16,14 +17,14 @@ class ParquetConnector(BaseConnector):
         self.path = path
         self.allowed_options = {}
 
-    def _standerdize_null_likes(self, *, df: pl.DataFrame):
+    def _null_like_exprs(self, columns: list[str]) -> list[pl.Expr]:
         NULL_LIKES = {
             " ", "", "null", "none", "nan", "n/a", "na",
             "#n/a", "#na", "--", "?", "unknown", "missing",
             "undefined", ".", "blank", "empty"
         }
 
-        return df.with_columns([
+        return [
             pl.when(
                 pl.col(col).is_null() |
                 pl.col(col).cast(str).is_in(NULL_LIKES)
@@ -31,8 +32,11 @@ class ParquetConnector(BaseConnector):
             .then(None)
             .otherwise(pl.col(col))
             .alias(col)
-            for col in df.columns
-        ])
+            for col in columns
+        ]
+
+    def _standerdize_null_likes(self, *, df: pl.DataFrame):
+        return df.with_columns(self._null_like_exprs(df.columns))
 
     def load(self):
         """
@@ -72,4 +76,80 @@ class ParquetConnector(BaseConnector):
         except Exception as e:
             raise DataLoadingError(
                 f"Failed to fully load Parquet file: {self.path}"
-            ) from e
\ No newline at end of file
+            ) from e
+
+    def scan(self):
+        """
+        The Parquet file as a pl.LazyFrame, null likes normalized in the plan
+        """
+        if not os.path.exists(self.path):
+            raise DataLoadingError(
+                f"File not found: {self.path}"
+            )
+        try:
+            lf = pl.scan_parquet(self.path)
+            columns = lf.collect_schema().names()
+        except Exception as e:
+            raise DataLoadingError(
+                f"Invalid or corrupted Parquet file: {self.path}"
+            ) from e
+
+        return lf.with_columns(self._null_like_exprs(columns))
+
+    def iter_batches(self, batch_size: int = 100_000):
+        """
+        Read the Parquet file as a stream of pl.DataFrame batches of batch_size rows
+        """
+        return self.collect_batches(self.scan(), batch_size)
+
+    def sample(self, n_rows: int, *, seed: int = 42, n_slices: int = 8):
+        """
+        Random rows read straight from the file: row groups are drawn (weighted by their size)
+        and a contiguous slice at a random offset is read from each, only the pages holding
+        those rows are touched. A slice holds at most n_rows / n_slices rows, groups are drawn
+        until n_rows are covered, the whole file is sampled when the groups can not cover them.
+        Rows of a slice are neighbours in the file, this is a cluster sample.
+        """
+        if not os.path.exists(self.path):
+            raise DataLoadingError(
+                f"File not found: {self.path}"
+            )
+        try:
+            metadata = pq.ParquetFile(self.path).metadata
+        except Exception as e:
+            raise DataLoadingError(
+                f"Invalid or corrupted Parquet file: {self.path}"
+            ) from e
+
+        group_rows = np.array([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)], dtype=np.int64)
+        total = int(group_rows.sum())
+        if total <= n_rows:
+            return self.load()
+
+        rng = np.random.default_rng(seed)
+        non_empty = np.flatnonzero(group_rows)
+        order = rng.choice(non_empty, size=non_empty.size, replace=False, p=group_rows[non_empty] / total)
+        group_start = np.concatenate([[0], np.cumsum(group_rows)[:-1]])
+        per_slice = -(-n_rows // n_slices)
+
+        # (offset, length) of one slice per drawn group until n_rows are covered
+        ranges = []
+        remaining = n_rows
+        for group in order:
+            if remaining == 0:
+                break
+            length = min(per_slice, int(group_rows[group]), remaining)
+            offset = int(group_start[group]) + int(rng.integers(0, group_rows[group] - length + 1))
+            ranges.append((offset, length))
+            remaining -= length
+
+        if remaining:
+            logger.info("Parquet sample | slices can not cover %d rows, sampling the whole file", n_rows)
+            return self.load().sample(n_rows, seed=seed)
+
+        lf = pl.scan_parquet(self.path)
+        slices = [lf.slice(offset, length).collect() for offset, length in sorted(ranges)]
+        logger.info("Parquet sample | row groups=%d/%d | rows=%d", len(ranges), group_rows.size, sum(s.height for s in slices))
+
+        df = pl.concat(slices)
+        return self._standerdize_null_likes(df=df)
@@ -153,4 +153,32 @@ class SQLConnector(BaseConnector):
         except Exception as e:
             raise DataLoadingError(
                 f"Failed to fully load table '{table}'"
-            ) from e
\ No newline at end of file
+            ) from e
+
+    def iter_batches(self, batch_size: int = 100_000, *, table: str | None = None):
+        """
+        Read the table as a stream of pl.DataFrame batches of batch_size rows
+        """
+        if not table:
+            raise ConfigurationError(
+                "Please provide the source table name"
+            )
+
+        engine = self._get_engine()
+
+        # sanity checks
+        self._sanity_check_connection(engine)
+        self._sanity_check_table(engine, table)
+
+        try:
+            sql = f"SELECT * FROM {table}"
+            return pl.read_database(
+                sql,
+                connection=engine,
+                iter_batches=True,
+                batch_size=batch_size,
+            )
+        except Exception as e:
+            raise DataLoadingError(
+                f"Failed to read table '{table}' in batches"
+            ) from e
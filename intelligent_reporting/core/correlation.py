@@ -0,0 +1,147 @@
+"""
+Correlation matrices computed with matrix products on standardized columns.
+"""
+import heapq
+import numpy as np
+import polars as pl
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def _standardize(X: np.ndarray, dtype=np.float32):
+    """Standardized columns (missing values as 0), their validity mask (None when complete) and std"""
+    X = np.asarray(X, dtype=np.float64)
+    valid = ~np.isnan(X)
+    counts = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(counts > 0, np.nansum(X, axis=0) / np.maximum(counts, 1), 0.0)
+        std = np.sqrt(np.nansum((X - mean) ** 2, axis=0) / np.maximum(counts, 1))
+        Z = np.where(valid, (X - mean) / np.where(std > 0, std, 1.0), 0.0).astype(dtype)
+    return Z, (None if valid.all() else valid.astype(dtype)), std
+
+
+def _cross_correlation(a, b) -> np.ndarray:
+    """Pearson correlation between the columns of two standardized blocks"""
+    Za, Ma, std_a = a
+    Zb, Mb, std_b = b
+    if Ma is None and Mb is None:
+        corr = (Za.T @ Zb).astype(np.float64) / Za.shape[0]
+    else:
+        # pairwise complete rows: sums of z, z^2 and n restricted to the rows both columns hold
+        Ma = Ma if Ma is not None else np.ones_like(Za)
+        Mb = Mb if Mb is not None else np.ones_like(Zb)
+        n = (Ma.T @ Mb).astype(np.float64)
+        sum_a = (Za.T @ Mb).astype(np.float64)
+        sum_b = (Ma.T @ Zb).astype(np.float64)
+        sum_aa = ((Za * Za).T @ Mb).astype(np.float64)
+        sum_bb = (Ma.T @ (Zb * Zb)).astype(np.float64)
+        sum_cross = (Za.T @ Zb).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = sum_cross - sum_a * sum_b / n
+            corr = cov / np.sqrt((sum_aa - sum_a ** 2 / n) * (sum_bb - sum_b ** 2 / n))
+        corr[n < 2] = np.nan
+
+    # constant columns have no correlation
+    corr[std_a == 0, :] = np.nan
+    corr[:, std_b == 0] = np.nan
+    return np.clip(corr, -1.0, 1.0, out=corr)
+
+
+def pearson_matrix(X: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """
+    Pearson correlation of the columns of a 2D array, NaN marks a missing value.
+    Columns are standardized once, the matrix is then a product of the standardized array
+    with itself. With missing values every pair uses its complete rows only (like pandas).
+    """
+    block = _standardize(X, dtype)
+    corr = _cross_correlation(block, block)
+    diagonal = np.arange(corr.shape[0])
+    corr[diagonal, diagonal] = np.where(block[2] > 0, 1.0, np.nan)
+    return corr
+
+
+def rank_columns(X: np.ndarray) -> np.ndarray:
+    """Average ranks of every column over its non-missing values, NaN stays NaN"""
+    if X.size == 0:
+        return np.asarray(X, dtype=np.float64)
+    frame = pl.from_numpy(np.asarray(X, dtype=np.float64)).fill_nan(None)
+    ranks = frame.select(pl.all().rank("average"))
+    return ranks.to_numpy().astype(np.float64, copy=False)
+
+
+def spearman_matrix(X: np.ndarray, dtype=np.float32) -> np.ndarray:
+    """
+    Spearman correlation, the Pearson correlation of the ranks.
+    Columns are ranked once over their own non-missing values, so with missing values
+    it can slightly differ from pandas which re-ranks every pair on its complete rows.
+    """
+    return pearson_matrix(rank_columns(X), dtype=dtype)
+
+
+def top_pairs(corr: np.ndarray, k: int | None = None, min_abs: float | None = None) -> list[tuple[int, int, float]]:
+    """
+    Pairs (i, j, value) with i < j of a correlation matrix, strongest absolute value first.
+    k: keep the k strongest only (selected with argpartition), all of them by default
+    min_abs: drop the pairs weaker than this absolute value
+    """
+    rows, cols = np.triu_indices(corr.shape[0], k=1)
+    values = corr[rows, cols]
+    strength = np.abs(values)
+    candidates = np.flatnonzero(~np.isnan(strength))
+    if min_abs is not None:
+        candidates = candidates[strength[candidates] >= min_abs]
+    if k is not None and k < candidates.size:
+        if k <= 0:
+            return []
+        candidates = candidates[np.argpartition(-strength[candidates], k - 1)[:k]]
+    candidates = candidates[np.argsort(-strength[candidates], kind="stable")]
+    return [(int(rows[p]), int(cols[p]), float(values[p])) for p in candidates]
+
+
+def blocked_top_pairs(load_block, n_cols: int, *, k: int = 100, min_abs: float | None = None,
+                      block_size: int = 512, method: str = "pearson", dtype=np.float32) -> list[tuple[int, int, float]]:
+    """
+    Strongest k pairs (i, j, value), i < j, of a correlation matrix too large to build.
+    The matrix is computed tile by tile (block_size x block_size) and only a heap of the k
+    strongest pairs is kept, memory is O(block_size^2 + k) on top of two column blocks.
+    load_block(start, stop): 2D float array of the columns start..stop-1, NaN marks a missing value
+    method: "pearson" or "spearman"
+    """
+    if method not in ("pearson", "spearman"):
+        raise ValueError("method must be either 'pearson' or 'spearman'")
+    if k <= 0:
+        return []
+
+    def standardized(start, stop):
+        X = load_block(start, stop)
+        return _standardize(rank_columns(X) if method == "spearman" else X, dtype)
+
+    heap = []  # (|r|, i, j, r), the weakest of the top-k on top
+    for i0 in range(0, n_cols, block_size):
+        i1 = min(i0 + block_size, n_cols)
+        a = standardized(i0, i1)
+        for j0 in range(i0, n_cols, block_size):
+            j1 = min(j0 + block_size, n_cols)
+            b = a if j0 == i0 else standardized(j0, j1)
+            tile = _cross_correlation(a, b)
+            if j0 == i0:
+                # diagonal tile: each pair once, without the column itself
+                tile[np.tril_indices(tile.shape[0], m=tile.shape[1])] = np.nan
+
+            strength = np.abs(tile).ravel()
+            floors = [f for f in (min_abs, heap[0][0] if len(heap) == k else None) if f is not None]
+            candidates = np.flatnonzero(strength >= max(floors)) if floors else np.flatnonzero(~np.isnan(strength))
+            if candidates.size > k:
+                candidates = candidates[np.argpartition(-strength[candidates], k - 1)[:k]]
+            for p in candidates:
+                r, c = divmod(int(p), tile.shape[1])
+                item = (float(strength[p]), i0 + r, j0 + c, float(tile[r, c]))
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[0] > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+        logger.debug("Blocked correlation | columns %d-%d done", i0, i1)
+
+    return [(i, j, r) for _, i, j, r in sorted(heap, key=lambda item: (-item[0], item[1], item[2]))]
@@ -0,0 +1,41 @@
+"""
+Peak resident memory of the process.
+
+The kernel keeps one RSS high-water mark for the whole process, shared by all its threads, so in a
+long-running process a run smaller than an earlier one does not raise it.
+reset_peak_rss() restarts the mark at the current RSS (Linux). It also restarts it for every run
+and span measuring it at the same time, so it is only called where the process runs one job at a
+time (batch workers). Elsewhere a run reports how much it raised the mark, peak - baseline.
+"""
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def reset_peak_rss() -> bool:
+    """Restart the RSS high-water mark of the whole process at the current RSS, False where it can not be reset"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float | None:
+    """RSS high-water mark of the process since the last reset (since it started where there is none)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
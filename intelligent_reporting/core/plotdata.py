@@ -0,0 +1,259 @@
+"""
+Reduced inputs of the figures: histogram bins, KDE curves on a grid, box statistics,
+capped scatter samples and time series bucketed to a point budget. Figures are drawn from these instead of the raw columns,
+so drawing one costs the same for a thousand or ten million rows.
+"""
+import math
+from datetime import timedelta
+import numpy as np
+import polars as pl
+from scipy import stats as sps
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+# points of a KDE curve, bins of the histogram the KDE is convolved on
+KDE_GRID = 200
+KDE_BINS = 2048
+MAX_FLIERS = 200
+MAX_POINTS = 5000
+SCATTER_METHODS = ("stratified", "binned")
+MAX_TIME_POINTS = 1000
+# bucket widths of a time series (polars durations), the narrowest one within the point budget is used
+TIME_BUCKETS = tuple(
+    (every, timedelta(microseconds=us)) for every, us in (
+        ("1us", 1), ("10us", 10), ("100us", 100), ("1ms", 10**3), ("10ms", 10**4), ("100ms", 10**5),
+        ("1s", 10**6), ("5s", 5 * 10**6), ("15s", 15 * 10**6), ("30s", 30 * 10**6),
+        ("1m", 60 * 10**6), ("5m", 300 * 10**6), ("15m", 900 * 10**6), ("30m", 1800 * 10**6),
+        ("1h", 3600 * 10**6), ("3h", 3 * 3600 * 10**6), ("6h", 6 * 3600 * 10**6), ("12h", 12 * 3600 * 10**6),
+        ("1d", 86400 * 10**6), ("2d", 2 * 86400 * 10**6), ("1w", 7 * 86400 * 10**6), ("2w", 14 * 86400 * 10**6),
+        ("1mo", 31 * 86400 * 10**6), ("3mo", 92 * 86400 * 10**6), ("6mo", 184 * 86400 * 10**6),
+        ("1y", 366 * 86400 * 10**6), ("5y", 5 * 366 * 86400 * 10**6), ("10y", 10 * 366 * 86400 * 10**6),
+        ("100y", 100 * 366 * 86400 * 10**6),
+    )
+)
+
+
+def _values(data) -> np.ndarray:
+    """Finite float64 values of a pl.Series or array-like"""
+    if isinstance(data, pl.Series):
+        data = data.drop_nulls().cast(pl.Float64).to_numpy()
+    values = np.asarray(data, dtype=np.float64).ravel()
+    return values[np.isfinite(values)]
+
+
+def kde_curve(values: np.ndarray, *, grid_size: int = KDE_GRID, bins: int = KDE_BINS) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Gaussian KDE (Scott's bandwidth, like scipy.stats.gaussian_kde) on grid_size points
+    spanning the data range. The values are binned finely and the bins convolved with
+    the kernel, O(n + bins log bins) instead of O(n * grid_size). None for constant data
+    """
+    values = _values(values)
+    n = values.size
+    if n < 2:
+        return None
+    std = values.std(ddof=1)
+    if not std > 0:
+        return None
+
+    bandwidth = std * n ** (-1 / 5)
+    lo, hi = values.min() - 4 * bandwidth, values.max() + 4 * bandwidth
+    counts, edges = np.histogram(values, bins=bins, range=(lo, hi))
+    step = edges[1] - edges[0]
+    centers = edges[:-1] + step / 2
+
+    half = min(bins - 1, int(math.ceil(4 * bandwidth / step)))
+    offsets = np.arange(-half, half + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * math.sqrt(2 * math.pi))
+    density = np.convolve(counts, kernel, mode="same") / n
+
+    x = np.linspace(values.min(), values.max(), grid_size)
+    return x, np.interp(x, centers, density)
+
+
+def histogram(data, bins: int = 25, *, kde: bool = True, grid_size: int = KDE_GRID) -> dict:
+    """
+    Bin edges and counts of a column, with its KDE scaled to the counts (as sns.histplot(kde=True))
+    """
+    values = _values(data)
+    if values.size == 0:
+        return {"edges": np.array([0.0, 1.0]), "counts": np.zeros(1, dtype=np.int64), "n": 0, "kde": None}
+    counts, edges = np.histogram(values, bins=bins)
+    curve = kde_curve(values, grid_size=grid_size) if kde else None
+    if curve is not None:
+        x, density = curve
+        curve = (x, density * values.size * (edges[1] - edges[0]))
+    return {"edges": edges, "counts": counts, "n": int(values.size), "kde": curve}
+
+
+def box_stats(data, *, whis: float = 1.5, max_fliers: int = MAX_FLIERS, label=None, seed: int = 42) -> dict | None:
+    """
+    Box plot statistics in the matplotlib Axes.bxp format: quartiles, whiskers at the most extreme
+    values within whis * IQR, and at most max_fliers of the values beyond them
+    """
+    values = _values(data)
+    if values.size == 0:
+        return None
+    q1, med, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - whis * iqr) & (values <= q3 + whis * iqr)]
+    whislo, whishi = (inside.min(), inside.max()) if inside.size else (q1, q3)
+    fliers = values[(values < whislo) | (values > whishi)]
+    if fliers.size > max_fliers:
+        fliers = np.random.default_rng(seed).choice(fliers, size=max_fliers, replace=False)
+    return {"label": label, "med": med, "q1": q1, "q3": q3, "whislo": whislo, "whishi": whishi,
+            "fliers": fliers, "n": int(values.size)}
+
+
+def grouped_box_stats(df: pl.DataFrame | pl.LazyFrame, by: str, column: str, *, whis: float = 1.5,
+                      max_fliers: int = MAX_FLIERS, seed: int = 42, engine: str = "auto") -> list[dict]:
+    """box_stats of column per group of by (nulls of either dropped), in a single group_by query"""
+    v = pl.col(column).cast(pl.Float64)
+    q1, q3 = v.quantile(0.25, "linear"), v.quantile(0.75, "linear")
+    inside = (v >= q1 - whis * (q3 - q1)) & (v <= q3 + whis * (q3 - q1))
+    query = (
+        df.lazy()
+        .select(by, column)
+        .drop_nulls()
+        .group_by(by)
+        .agg(
+            q1.alias("q1"),
+            v.median().alias("med"),
+            q3.alias("q3"),
+            v.filter(inside).min().alias("whislo"),
+            v.filter(inside).max().alias("whishi"),
+            v.filter(~inside).shuffle(seed=seed).head(max_fliers).alias("fliers"),
+            pl.len().alias("n"),
+        )
+        .sort(by)
+    )
+    return [
+        {**row, "label": row[by], "fliers": np.asarray(row["fliers"], dtype=np.float64)}
+        for row in query.collect(engine=engine).iter_rows(named=True)
+    ]
+
+
+def scatter_sample(x, y, *, max_points: int = MAX_POINTS, method: str = "stratified",
+                   grid: int = 64, seed: int = 42) -> dict:
+    """
+    At most max_points points of a scatter plot, rows with a missing value dropped.
+    method "stratified": every occupied cell of a grid x grid partition keeps a share of its
+    points proportional to its count, at least one, so sparse regions and outliers stay visible.
+    method "binned": one point per occupied cell at the mean of its points, with its count as weight
+    """
+    if method not in SCATTER_METHODS:
+        raise ValueError(f"method must be one of {SCATTER_METHODS}, got '{method}'")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    complete = np.isfinite(x) & np.isfinite(y)
+    x, y = x[complete], y[complete]
+    n = x.size
+    if n <= max_points:
+        return {"x": x, "y": y, "weights": None, "n": n}
+
+    def cell(v):
+        lo, hi = v.min(), v.max()
+        width = (hi - lo) / grid or 1.0
+        return np.minimum(((v - lo) / width).astype(np.int64), grid - 1)
+
+    cells = cell(x) * grid + cell(y)
+    if method == "binned":
+        occupied, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+        cx = np.bincount(inverse, weights=x) / counts
+        cy = np.bincount(inverse, weights=y) / counts
+        keep = np.argsort(-counts, kind="stable")[:max_points]
+        return {"x": cx[keep], "y": cy[keep], "weights": counts[keep], "n": n}
+
+    # random order within each cell, a cell keeps its first quota points
+    order = np.lexsort((np.random.default_rng(seed).random(n), cells))
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+    quota = np.repeat(np.maximum(1, np.round(counts * max_points / n)), counts)
+
+    candidates = np.flatnonzero(rank < quota)
+    # over the cap (cells rounded up to one point): the least used quotas first
+    candidates = candidates[np.argsort(rank[candidates] / quota[candidates], kind="stable")[:max_points]]
+    keep = np.sort(order[candidates])
+    return {"x": x[keep], "y": y[keep], "weights": None, "n": n}
+
+
+def regression_line(x, y, *, ci: float | None = 95, grid_size: int = 100) -> dict | None:
+    """
+    Least squares line of y on x over all the complete rows, with the confidence band of its mean
+    (t interval, the analytic counterpart of the bootstrap of sns.regplot), on grid_size points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    complete = np.isfinite(x) & np.isfinite(y)
+    x, y = x[complete], y[complete]
+    n = x.size
+    if n < 2:
+        return None
+    x_mean, y_mean = x.mean(), y.mean()
+    sxx = ((x - x_mean) ** 2).sum()
+    if sxx == 0:
+        return None
+    slope = ((x - x_mean) * (y - y_mean)).sum() / sxx
+    intercept = y_mean - slope * x_mean
+
+    grid = np.linspace(x.min(), x.max(), grid_size)
+    fit = intercept + slope * grid
+    line = {"x": grid, "y": fit, "lower": None, "upper": None}
+    if ci is not None and n > 2:
+        residual = y - (intercept + slope * x)
+        s = math.sqrt((residual ** 2).sum() / (n - 2))
+        t = sps.t.ppf(0.5 + ci / 200, n - 2)
+        half = t * s * np.sqrt(1 / n + (grid - x_mean) ** 2 / sxx)
+        line["lower"], line["upper"] = fit - half, fit + half
+    return line
+
+
+def time_bucket(span: timedelta, max_points: int = MAX_TIME_POINTS) -> str:
+    """Narrowest bucket width of TIME_BUCKETS splitting span in at most max_points buckets"""
+    target = span / max(max_points, 1)
+    for every, width in TIME_BUCKETS:
+        if width >= target:
+            return every
+    return TIME_BUCKETS[-1][0]
+
+
+def time_series(df: pl.DataFrame | pl.LazyFrame, dt_col: str, value_col: str, *, max_points: int = MAX_TIME_POINTS,
+                envelope: bool = True, is_sorted: bool = False, span: timedelta | None = None,
+                n_unique: int | None = None, engine: str = "auto") -> dict:
+    """
+    Mean of value_col over time in at most about max_points points.
+    Timestamps are kept as they are when there are few enough of them (n_unique), otherwise
+    they are bucketed with group_by_dynamic, the bucket width chosen from the time span
+    and the budget. The frame is sorted by time first, unless is_sorted only flags it.
+    envelope: also the min and max of every bucket, so that spikes survive the downsampling
+    """
+    v = pl.col(value_col)
+    aggs = [v.mean().alias("mean")]
+    if envelope:
+        aggs += [v.min().alias("min"), v.max().alias("max")]
+
+    lf = df.lazy().select(dt_col, value_col).drop_nulls(dt_col)
+    every = None
+    if n_unique is not None and n_unique <= max_points:
+        query = lf.group_by(dt_col).agg(aggs).sort(dt_col)
+    else:
+        lf = lf.set_sorted(dt_col) if is_sorted else lf.sort(dt_col)
+        if span is None:
+            bounds = lf.select(pl.col(dt_col).min().alias("lo"), pl.col(dt_col).max().alias("hi")).collect(engine=engine)
+            span = bounds["hi"][0] - bounds["lo"][0]
+        every = time_bucket(span, max_points)
+        query = lf.group_by_dynamic(dt_col, every=every).agg(aggs)
+
+    out = query.collect(engine=engine)
+    logger.debug("Time series %s by %s | bucket=%s | points=%d", value_col, dt_col, every, out.height)
+    return {
+        "x": out[dt_col].to_numpy(),
+        "mean": out["mean"].cast(pl.Float64).to_numpy(),
+        "min": out["min"].cast(pl.Float64).to_numpy() if envelope else None,
+        "max": out["max"].cast(pl.Float64).to_numpy() if envelope else None,
+        "every": every,
+    }
@@ -0,0 +1,180 @@
+"""
+On-demand profiling of a single request.
+
+A request carrying the header `X-Profile: 1` (or the query parameter `?profile=1`) runs under a
+stack sampler, its collapsed stacks ("frame;frame;frame count" lines, the input of flamegraph.pl,
+speedscope or inferno) are written to the profiles directory. `X-Profile: cprofile` runs the request
+under cProfile instead and writes a .prof file (snakeviz, pstats) and its text summary.
+Requests without the flag only pay for the header lookup.
+
+Profiling is off unless INTELLIGENT_REPORTING_PROFILING=1 is set in the environment of the server,
+the flag of a request is ignored otherwise. A profiles directory keeps the last MAX_PROFILES profiles.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+ENV_VAR = "INTELLIGENT_REPORTING_PROFILING"
+PROFILE_HEADER = "X-Profile"
+PROFILE_PARAM = "profile"
+# response header holding the link to the profile
+PROFILE_URL_HEADER = "X-Profile-Url"
+MODES = ("sample", "cprofile")
+# profiles kept per directory, the oldest ones are deleted
+MAX_PROFILES = 50
+ARTIFACTS = (".collapsed", ".prof", ".txt")
+
+
+def is_enabled() -> bool:
+    """Whether the server lets requests ask for a profile"""
+    return os.environ.get(ENV_VAR, "") not in ("", "0")
+
+
+def requested_mode(headers, query) -> str | None:
+    """Profiling mode asked for by a request: None, "sample" or "cprofile" (always None while profiling is off)"""
+    if not is_enabled():
+        return None
+    flag = headers.get(PROFILE_HEADER) or query.get(PROFILE_PARAM)
+    if not flag or flag.lower() in ("0", "false", "no"):
+        return None
+    return "cprofile" if flag.lower() == "cprofile" else "sample"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread (the request may fan out to a thread pool)
+    every interval seconds from a background thread, identical stacks are counted
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _frame_label(self, frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: str) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class RequestProfiler:
+    """
+    Profiles the body of a with block and writes its artifact into directory:
+
+        with RequestProfiler("results/profiles", name="uploadfiles") as profiler:
+            ...
+        profiler.filename  # uploadfiles-20250101-120000-123456.collapsed
+    """
+
+    def __init__(self, directory: str, *, mode: str = "sample", name: str = "request", interval: float = 0.005,
+                 keep: int = MAX_PROFILES):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got '{mode}'")
+        self.directory = directory
+        self.mode = mode
+        self.name = re.sub(r"[^a-zA-Z0-9_\-]+", "_", name).strip("_") or "request"
+        self.interval = interval
+        self.keep = keep
+        self.filename = None
+        self.wall_time = None
+        self._profiler = None
+
+    @property
+    def path(self) -> str | None:
+        return os.path.join(self.directory, self.filename) if self.filename else None
+
+    def __enter__(self) -> "RequestProfiler":
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._profiler = StackSampler(self.interval)
+            self._profiler.start()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_time = time.perf_counter() - self._t0
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        try:
+            self._write()
+            self._prune()
+        except OSError as e:
+            logger.error("Failed to write the profile of %s: %s", self.name, e)
+        return False
+
+    def _write(self):
+        os.makedirs(self.directory, exist_ok=True)
+        base = f"{self.name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        if self.mode == "cprofile":
+            self.filename = f"{base}.prof"
+            self._profiler.dump_stats(self.path)
+            text = io.StringIO()
+            pstats.Stats(self._profiler, stream=text).sort_stats("cumulative").print_stats(50)
+            with open(os.path.join(self.directory, f"{base}.txt"), "w", encoding="utf-8") as f:
+                f.write(text.getvalue())
+        else:
+            self.filename = f"{base}.collapsed"
+            self._profiler.write_collapsed(self.path)
+        logger.info("Request profile | %s | wall=%.3fs | %s", self.name, self.wall_time, self.path)
+
+    def _prune(self):
+        """Delete the oldest profiles of the directory beyond keep (a cProfile run is a .prof and a .txt)"""
+        profiles = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(ARTIFACTS):
+                profiles.setdefault(os.path.splitext(entry.name)[0], []).append(entry)
+        if len(profiles) <= self.keep:
+            return
+        by_age = sorted(profiles.values(), key=lambda entries: max(e.stat().st_mtime for e in entries))
+        for entries in by_age[:len(profiles) - self.keep]:
+            for entry in entries:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
@@ -0,0 +1,404 @@
+"""
+Mergeable sketches used to summarize data batch by batch.
+"""
+import base64
+import numpy as np
+import polars as pl
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def _mix64(hashes: np.ndarray) -> np.ndarray:
+    """murmur3 64-bit finalizer, spreads poorly distributed hashes (e.g. polars row hashes) over all bits"""
+    h = hashes.astype(np.uint64, copy=True)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB9FE1A85EC53)
+    h ^= h >> np.uint64(33)
+    return h
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch.
+    Two sketches built with the same precision and seed can be merged,
+    the result is the sketch of the union of both inputs.
+    """
+    HASH_SEED = 1337
+
+    def __init__(self, precision: int = 14, registers: np.ndarray | None = None):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = (
+            registers.astype(np.uint8, copy=True)
+            if registers is not None
+            else np.zeros(self.m, dtype=np.uint8)
+        )
+
+    def update_hashes(self, hashes: np.ndarray):
+        """Add already hashed values (uint64) to the sketch"""
+        if hashes.size == 0:
+            return self
+        hashes = _mix64(hashes)
+        p = np.uint64(self.precision)
+        idx = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # keep the next 52 bits so the float conversion below stays exact
+        w = ((hashes << p) >> np.uint64(12)).astype(np.float64)
+        _, exponent = np.frexp(w)
+        rho = (53 - exponent).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rho)
+        return self
+
+    def update(self, series: pl.Series):
+        """Add the non-null values of a pl.Series object to the sketch"""
+        s = series.drop_nulls()
+        if s.is_empty():
+            return self
+        return self.update_hashes(s.hash(self.HASH_SEED).to_numpy())
+
+    def update_rows(self, df: pl.DataFrame):
+        """Add the rows of a pl.DataFrame object (hashed as a whole) to the sketch"""
+        if df.is_empty():
+            return self
+        return self.update_hashes(df.hash_rows(seed=self.HASH_SEED).to_numpy())
+
+    def merge(self, other: "HyperLogLog"):
+        """Merge another sketch into this one"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self) -> float:
+        """Estimated number of distinct values"""
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # linear counting for the small range
+            estimate = m * np.log(m / zeros)
+        return float(estimate)
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of the estimate"""
+        return 1.04 / np.sqrt(self.m)
+
+    def to_dict(self):
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8)
+        return cls(precision=data["precision"], registers=registers)
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch.
+    Values are kept in compactors of growing weight (2**level), a full compactor is
+    sorted and every other value is promoted to the next level. The normalized rank
+    error is about `rank_error`, whatever the number of values.
+    Sketches with the same k can be merged.
+    """
+
+    def __init__(self, k: int = 200, seed: int | None = None):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compact(self, level: int):
+        if level + 1 == len(self.compactors):
+            self.compactors.append(np.empty(0))
+        buf = np.sort(self.compactors[level])
+        # an odd value out stays at this level
+        even = len(buf) - len(buf) % 2
+        promoted = buf[:even][self._rng.integers(2)::2]
+        self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+        self.compactors[level] = buf[even:]
+
+    def _compress(self):
+        while True:
+            for level, buf in enumerate(self.compactors):
+                if len(buf) > self._capacity(level):
+                    self._compact(level)
+                    break
+            else:
+                return
+
+    def update_values(self, values: np.ndarray):
+        """Add an array of values to the sketch, NaN are ignored"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self.n += values.size
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+        return self
+
+    def update(self, series: pl.Series):
+        """Add the non-null values of a numeric pl.Series object to the sketch"""
+        return self.update_values(series.drop_nulls().cast(pl.Float64).to_numpy())
+
+    def merge(self, other: "KLLSketch"):
+        """Merge another sketch into this one"""
+        if other.k != self.k:
+            raise ValueError("Cannot merge KLL sketches with different k")
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, buf in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], buf])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        values = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(buf), 2 ** level, dtype=np.float64) for level, buf in enumerate(self.compactors)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def quantile(self, q: float) -> float | None:
+        """Estimated q-quantile, None when the sketch is empty"""
+        if self.n == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        values, cumulative = self._weighted()
+        idx = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+        return float(values[min(idx, len(values) - 1)])
+
+    def rank(self, value: float, inclusive: bool = True) -> float:
+        """Estimated fraction of the values lower than (or equal to) value"""
+        if self.n == 0:
+            return 0.0
+        values, cumulative = self._weighted()
+        idx = int(np.searchsorted(values, value, side="right" if inclusive else "left"))
+        return float(cumulative[idx - 1] / cumulative[-1]) if idx else 0.0
+
+    @property
+    def rank_error(self) -> float:
+        """Normalized rank error of the estimates (99% confidence)"""
+        return 2.296 / self.k ** 0.9723
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "compactors": [base64.b64encode(buf.tobytes()).decode("ascii") for buf in self.compactors],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        sketch = cls(k=data["k"])
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.compactors = [np.frombuffer(base64.b64decode(buf), dtype=np.float64).copy() for buf in data["compactors"]]
+        return sketch
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters sketch.
+    At most `capacity` counters are kept, a reported count overestimates the true
+    frequency by at most its error, and any unreported value occurs at most `floor` times.
+    Sketches with the same capacity can be merged.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = capacity
+        self.n = 0
+        self.floor = 0
+        self.counts = {}
+        self.errors = {}
+
+    def update(self, series: pl.Series):
+        """Add the values of a pl.Series object (nulls included) to the sketch"""
+        if series.is_empty():
+            return self
+        vc = series.value_counts(sort=True, name="__count")
+        value_col = vc.columns[0]
+        batch = SpaceSaving(self.capacity)
+        batch.n = series.len()
+        top = vc.head(self.capacity)
+        batch.counts = dict(zip(top[value_col].to_list(), top["__count"].to_list()))
+        batch.errors = dict.fromkeys(batch.counts, 0)
+        # counts of the batch are exact, the largest one left out bounds the others
+        batch.floor = int(vc["__count"][self.capacity]) if vc.height > self.capacity else 0
+        return self.merge(batch)
+
+    def merge(self, other: "SpaceSaving"):
+        """Merge another sketch into this one"""
+        if other.capacity != self.capacity:
+            raise ValueError("Cannot merge Space-Saving sketches with different capacities")
+        counts, errors = {}, {}
+        for value in self.counts.keys() | other.counts.keys():
+            counts[value] = self.counts.get(value, self.floor) + other.counts.get(value, other.floor)
+            errors[value] = self.errors.get(value, self.floor) + other.errors.get(value, other.floor)
+
+        ranked = sorted(counts, key=counts.get, reverse=True)
+        kept, dropped = ranked[:self.capacity], ranked[self.capacity:]
+        self.floor = max([self.floor + other.floor] + [counts[v] for v in dropped[:1]])
+        self.counts = {v: counts[v] for v in kept}
+        self.errors = {v: errors[v] for v in kept}
+        self.n += other.n
+        return self
+
+    def top(self, k: int | None = None) -> list[tuple]:
+        """Most frequent values as (value, estimated count, maximum overestimation)"""
+        ranked = sorted(self.counts, key=self.counts.get, reverse=True)[:k]
+        return [(v, self.counts[v], self.errors[v]) for v in ranked]
+
+
+class Moments:
+    """
+    Mergeable count, mean, central moments (up to the 4th), min and max of the values seen,
+    merged with the pairwise update formulas (Pebay, 2008).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.m3 = 0.0
+        self.m4 = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "Moments":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        moments = cls()
+        if values.size == 0:
+            return moments
+        moments.n = int(values.size)
+        moments.mean = float(values.mean())
+        centered = values - moments.mean
+        sq = centered * centered
+        moments.m2 = float(sq.sum())
+        moments.m3 = float((sq * centered).sum())
+        moments.m4 = float((sq * sq).sum())
+        moments.min = float(values.min())
+        moments.max = float(values.max())
+        return moments
+
+    def update(self, series: pl.Series):
+        """Add the non-null values of a numeric pl.Series object"""
+        return self.merge(Moments.from_values(series.drop_nulls().cast(pl.Float64).to_numpy()))
+
+    def merge(self, other: "Moments"):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        na, nb = self.n, other.n
+        n = na + nb
+        delta = other.mean - self.mean
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+        m3 = (
+            self.m3 + other.m3
+            + delta ** 3 * na * nb * (na - nb) / n ** 2
+            + 3 * delta * (na * other.m2 - nb * self.m2) / n
+        )
+        m4 = (
+            self.m4 + other.m4
+            + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / n ** 3
+            + 6 * delta ** 2 * (na * na * other.m2 + nb * nb * self.m2) / n ** 2
+            + 4 * delta * (na * other.m3 - nb * self.m3) / n
+        )
+        self.n, self.m2, self.m3, self.m4 = n, m2, m3, m4
+        self.mean += delta * nb / n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def var(self) -> float | None:
+        return self.m2 / (self.n - 1) if self.n > 1 else None
+
+    @property
+    def std(self) -> float | None:
+        return float(np.sqrt(self.var)) if self.var is not None else None
+
+    @property
+    def skew(self) -> float | None:
+        """Biased sample skewness (same as polars)"""
+        return float(np.sqrt(self.n) * self.m3 / self.m2 ** 1.5) if self.n and self.m2 else None
+
+    @property
+    def kurtosis(self) -> float | None:
+        """Biased excess kurtosis (same as polars)"""
+        return float(self.n * self.m4 / self.m2 ** 2 - 3) if self.n and self.m2 else None
+
+
+class ReservoirSample:
+    """
+    Uniform sample of at most `size` rows over all the batches seen.
+    Every row gets a random priority key and the rows with the largest keys are kept,
+    so two reservoirs merge by keeping the largest keys of both.
+    """
+    KEY = "__reservoir_key"
+
+    def __init__(self, size: int = 10_000, seed: int | None = None):
+        self.size = size
+        self.n = 0
+        self._rng = np.random.default_rng(seed)
+        self._rows = None
+
+    def update(self, df: pl.DataFrame):
+        """Offer the rows of a batch to the reservoir"""
+        if df.is_empty():
+            return self
+        self.n += df.height
+        keyed = df.with_columns(pl.Series(self.KEY, self._rng.random(df.height)))
+        if self._rows is not None and self._rows.height >= self.size:
+            # only the rows beating the smallest kept key can enter
+            keyed = keyed.filter(pl.col(self.KEY) > self._rows[self.KEY].min())
+        return self._keep(keyed)
+
+    def _keep(self, keyed: pl.DataFrame):
+        pool = keyed if self._rows is None else pl.concat([self._rows, keyed], how="vertical_relaxed")
+        self._rows = pool.top_k(self.size, by=self.KEY) if pool.height > self.size else pool
+        return self
+
+    def merge(self, other: "ReservoirSample"):
+        """Merge another reservoir into this one"""
+        self.n += other.n
+        if other._rows is not None:
+            self._keep(other._rows)
+        return self
+
+    @property
+    def sample(self) -> pl.DataFrame | None:
+        """The sampled rows, in no particular order"""
+        return self._rows.drop(self.KEY) if self._rows is not None else None
@@ -0,0 +1,265 @@
+import math
+import numpy as np
+import polars as pl
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+NUMERIC_DTYPES = (
+    pl.Int8, pl.Int16, pl.Int32, pl.Int64,
+    pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64,
+    pl.Float32, pl.Float64,
+)
+CATEGORICAL_DTYPES = (pl.Utf8, pl.Boolean, pl.Categorical, pl.Enum)
+INDEX_NAMES = {"id", "index", "idx", "row_id", "rowid"}
+
+
+class ColumnStats:
+    """
+    Per-column statistics computed in one lazy multi-column query:
+    nulls, distinct count, min/max, mean/var/std, quantiles, skew/kurtosis,
+    top-2 frequencies, mean string length and monotonicity.
+    Built once per frame and shared by the profilers and schema inferers.
+
+    With engine="streaming" the frame is never materialized: the aggregates that the
+    streaming engine cannot run in bounded memory are rewritten, top frequencies as one
+    group_by per column and quantiles by narrowing histograms until few values remain.
+    """
+
+    QUANTILES = (0.25, 0.5, 0.75)
+    TOP_K = 2
+    # streaming quantiles: bins per histogram pass, values collected once the range is this small
+    QUANTILE_BINS = 1024
+    EXACT_VALUES = 100_000
+
+    def __init__(self, df: pl.DataFrame | pl.LazyFrame, columns: list[str] | None = None, *,
+                 distribution: bool = True, engine: str = "auto"):
+        """
+        columns: subset of columns to describe, all of them by default
+        distribution: False keeps only the cheap counts (nulls, distinct, mean length),
+        without moments, quantiles, top frequencies and monotonicity
+        engine: polars engine the queries are collected with, "streaming" for out-of-core frames
+        """
+        self.distribution = distribution
+        self.engine = engine
+        self.streaming = engine == "streaming"
+        lf = df.lazy()
+        schema = lf.collect_schema()
+        self.schema = {col: schema[col] for col in (columns if columns is not None else schema.names())}
+        self.columns = self._compute(lf)
+
+    @staticmethod
+    def _label(q: float) -> str:
+        return f"{q * 100:g}%"
+
+    def _exprs(self, i: int, col: str, dtype) -> list[pl.Expr]:
+        c = pl.col(col)
+        # when streaming, distinct and top counts come from one group_by per column
+        streamed = self.streaming and self.distribution
+        exprs = [c.null_count().alias(f"{i}:null_count")]
+        if not streamed:
+            exprs.append(c.n_unique().alias(f"{i}:n_unique"))
+        if dtype == pl.Utf8:
+            exprs.append(c.str.len_chars().mean().alias(f"{i}:mean_length"))
+        if not self.distribution:
+            return exprs
+
+        if not streamed:
+            exprs.append(c.value_counts(sort=True, name="__count").head(self.TOP_K).implode().alias(f"{i}:top"))
+        if dtype in NUMERIC_DTYPES:
+            exprs += [
+                c.min().alias(f"{i}:min"),
+                c.max().alias(f"{i}:max"),
+                c.mean().alias(f"{i}:mean"),
+                c.std().alias(f"{i}:std"),
+                c.var().alias(f"{i}:var"),
+                c.skew().alias(f"{i}:skew"),
+                c.kurtosis().alias(f"{i}:kurtosis"),
+            ]
+            if not streamed:
+                exprs += [c.quantile(q).alias(f"{i}:{self._label(q)}") for q in self.QUANTILES]
+        if dtype in NUMERIC_DTYPES or dtype.is_temporal():
+            diff = c.to_physical().diff()
+            exprs += [
+                (diff >= 0).all().alias(f"{i}:is_increasing"),
+                (diff <= 0).all().alias(f"{i}:is_decreasing"),
+            ]
+            if dtype.is_temporal():
+                exprs += [c.min().alias(f"{i}:min"), c.max().alias(f"{i}:max")]
+        if dtype.is_integer():
+            exprs.append((c.diff() == 1).all().alias(f"{i}:is_consecutive"))
+        return exprs
+
+    def _compute(self, lf: pl.LazyFrame) -> dict:
+        exprs = [pl.len().alias("__height")]
+        names = list(self.schema)
+        for i, col in enumerate(names):
+            exprs += self._exprs(i, col, self.schema[col])
+        row = lf.select(exprs).collect(engine=self.engine).row(0, named=True)
+
+        self.height = int(row.pop("__height"))
+        columns = {col: {"dtype": self.schema[col]} for col in names}
+        for key, value in row.items():
+            i, stat = key.split(":", 1)
+            col = names[int(i)]
+            if stat == "top":
+                value = [(item[col], item["__count"]) for item in value]
+            columns[col][stat] = value
+
+        if self.streaming and self.distribution:
+            for col, stats in columns.items():
+                self._streaming_distribution(lf, col, stats)
+
+        for col, stats in columns.items():
+            stats["count"] = self.height - stats["null_count"]
+            # distinct non-null values, polars n_unique counts null as a value
+            stats["distinct_count"] = stats["n_unique"] - (1 if stats["null_count"] else 0)
+        logger.debug("Column stats computed | rows=%d | columns=%d", self.height, len(columns))
+        return columns
+
+    def _streaming_distribution(self, lf: pl.LazyFrame, col: str, stats: dict):
+        """Distinct count, top frequencies and quantiles of a column without materializing it"""
+        c = pl.col(col)
+        grouped = lf.group_by(col).agg(pl.len().alias("__count"))
+        top = grouped.select(
+            pl.len().alias("__groups"),
+            pl.struct(c, pl.col("__count")).top_k_by("__count", self.TOP_K).alias("__top"),
+        ).collect(engine=self.engine)
+        stats["n_unique"] = int(top["__groups"][0]) if top.height else 0
+        items = sorted(top["__top"].to_list(), key=lambda item: -item["__count"])
+        stats["top"] = [(item[col], item["__count"]) for item in items]
+
+        if stats["dtype"] in NUMERIC_DTYPES:
+            count = self.height - stats["null_count"]
+            stats.update(self._streaming_quantiles(lf, col, count, stats["min"], stats["max"]))
+
+    def _streaming_quantiles(self, lf: pl.LazyFrame, col: str, count: int, lo, hi) -> dict:
+        """
+        Exact quantiles (nearest rank, like polars) of a column from a few histogram passes.
+        Each pass bins the range still holding a target rank and keeps the bin it falls in,
+        the values of that bin are collected once there are at most EXACT_VALUES of them.
+        """
+        quantiles = {self._label(q): None for q in self.QUANTILES}
+        if count == 0:
+            return quantiles
+
+        c = pl.col(col)
+        ranks = {self._label(q): math.floor((count - 1) * q + 0.5) for q in self.QUANTILES}
+        # ranges [lo, hi] still to narrow, with the targets they hold and their value count
+        pending = [(lo, hi, ranks, count)]
+        while pending:
+            lo, hi, targets, n = pending.pop()
+            if lo == hi:
+                quantiles.update({label: float(lo) for label in targets})
+                continue
+
+            in_range = lf.select(c).filter(c.is_between(lo, hi))
+            width = (hi - lo) / self.QUANTILE_BINS
+            if n <= self.EXACT_VALUES or width == 0:
+                values = in_range.sort(col).collect(engine=self.engine)[col]
+                quantiles.update({label: float(values[rank]) for label, rank in targets.items()})
+                continue
+
+            # bins are contiguous value ranges, their min and max bound the next pass exactly
+            hist = (
+                in_range.group_by(((c - lo) / width).floor().alias("__bin"))
+                .agg(pl.len().alias("__count"), c.min().alias("__lo"), c.max().alias("__hi"))
+                .collect(engine=self.engine)
+                .sort("__bin")
+            )
+            below = 0
+            bins = {}
+            for bin_count, bin_lo, bin_hi in hist.select("__count", "__lo", "__hi").iter_rows():
+                for label, rank in targets.items():
+                    if below <= rank < below + bin_count:
+                        bins.setdefault((bin_lo, bin_hi, bin_count), {})[label] = rank - below
+                below += bin_count
+            pending += [(bin_lo, bin_hi, bin_targets, bin_count) for (bin_lo, bin_hi, bin_count), bin_targets in bins.items()]
+        return quantiles
+
+    def __getitem__(self, col: str) -> dict:
+        return self.columns[col]
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.columns
+
+    def get(self, col: str, stat: str, default=None):
+        return self.columns.get(col, {}).get(stat, default)
+
+    def describe(self, col: str) -> dict:
+        """Same statistics as pl.DataFrame.describe() for a numeric column"""
+        stats = self.columns[col]
+        described = {
+            "count": stats["count"],
+            "null_count": stats["null_count"],
+            "mean": stats.get("mean"),
+            "std": stats.get("std"),
+            "min": stats.get("min"),
+        }
+        for q in self.QUANTILES:
+            described[self._label(q)] = stats.get(self._label(q))
+        described["max"] = stats.get("max")
+        return {k: float(v) if v is not None else None for k, v in described.items()}
+
+    def index_columns(self) -> list[str]:
+        """Unique columns that are either consecutive integers or named like an index"""
+        index_cols = []
+        for col, stats in self.columns.items():
+            if stats["n_unique"] != self.height:
+                continue
+            if stats.get("is_consecutive"):
+                index_cols.append(col)
+                continue
+            if col.lower() in INDEX_NAMES:
+                index_cols.append(col)
+        return index_cols
+
+
+def kruskal_wallis(df: pl.DataFrame | pl.LazyFrame, by: str, columns: list[str], *, engine: str = "auto") -> dict:
+    """
+    Kruskal-Wallis H statistic (tie corrected) of every column against the groups of `by`,
+    from a single query: per column ranks and tie sizes, then one group_by for all columns.
+    Rows with a null in `by` or in any column are dropped, NaN values and groups holding
+    a single value are left out (like scipy.stats.kruskal on the groups of more than one value).
+    Columns with fewer than two groups or without any variation are not returned.
+    """
+    if not columns:
+        return {}
+    schema = df.lazy().collect_schema()
+    masked, exprs, aggs = [], [], []
+    for i, col in enumerate(columns):
+        v = pl.col(col).fill_nan(None) if schema[col].is_float() else pl.col(col)
+        masked.append(pl.when(v.count().over(by) > 1).then(v).alias(f"{i}:value"))
+        v = pl.col(f"{i}:value")
+        exprs += [
+            v.rank("average").alias(f"{i}:rank"),
+            # each tie of size t contributes t^3 - t, i.e. t^2 - 1 on each of its rows
+            pl.when(v.is_not_null()).then(v.count().over(v).cast(pl.Float64) ** 2 - 1).alias(f"{i}:tie"),
+        ]
+        aggs += [
+            pl.col(f"{i}:rank").sum().alias(f"{i}:rank_sum"),
+            pl.col(f"{i}:rank").count().alias(f"{i}:count"),
+            pl.col(f"{i}:tie").sum().alias(f"{i}:tie_sum"),
+        ]
+    grouped = (
+        df.lazy()
+        .drop_nulls([by, *columns])
+        .select(pl.col(by), *masked)
+        .select(pl.col(by), *exprs)
+        .group_by(by)
+        .agg(aggs)
+        .collect(engine=engine)
+    )
+
+    def matrix(stat):
+        return grouped.select([f"{i}:{stat}" for i in range(len(columns))]).to_numpy().astype(np.float64)
+
+    rank_sum, count, tie_sum = matrix("rank_sum"), matrix("count"), matrix("tie_sum")
+    n = count.sum(axis=0)
+    n_groups = (count > 0).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        h = 12.0 / (n * (n + 1)) * np.where(count > 0, rank_sum ** 2 / count, 0.0).sum(axis=0) - 3 * (n + 1)
+        h /= 1 - tie_sum.sum(axis=0) / (n ** 3 - n)
+    return {col: float(h[i]) for i, col in enumerate(columns) if n_groups[i] > 1 and np.isfinite(h[i])}
@@ -0,0 +1,289 @@
+"""
+Span-based instrumentation, off by default.
+
+    from intelligent_reporting.core import tracing
+
+    tracing.enable(memory=True)           # or INTELLIGENT_REPORTING_TRACE=1 (=memory) in the environment
+    with tracing.span("profiling.summary") as sp:
+        ...
+        sp.set(rows=df.height, bytes=df.estimated_size())
+    tracing.export_jsonl("results/trace.jsonl")
+    tracing.export_chrome_trace("results/trace.json")  # chrome://tracing or https://ui.perfetto.dev
+
+Spans nest within a thread. Each one records wall and CPU time, rows and bytes processed (rows/sec),
+the RSS high-water mark of the process and, with memory=True, the tracemalloc peak of its Python allocations.
+While disabled span() returns a shared no-op object and traced functions are called directly.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from functools import wraps
+
+from .memory import peak_rss_mb
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+ENV_VAR = "INTELLIGENT_REPORTING_TRACE"
+# finished spans kept until exported, the oldest are dropped beyond this (callers that never export or reset)
+MAX_SPANS = 100_000
+
+_enabled = False
+_memory = False
+_finished = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_current = contextvars.ContextVar("intelligent_reporting_span", default=None)
+_origin_ns = time.perf_counter_ns()
+
+
+def _size(obj) -> tuple[int | None, int | None]:
+    """Rows and bytes of a frame-like object, None when unknown (a LazyFrame is never counted)"""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    if not hasattr(obj, "shape"):
+        # PipelineResult, DatasetProfile
+        obj = getattr(obj, "data", None) if hasattr(obj, "data") else getattr(obj, "df", obj)
+    if hasattr(obj, "estimated_size") and hasattr(obj, "height"):
+        # polars
+        return obj.height, obj.estimated_size()
+    if hasattr(obj, "memory_usage") and hasattr(obj, "shape"):
+        # pandas
+        return len(obj), int(obj.memory_usage(index=True).sum())
+    if isinstance(obj, dict) and "num_rows" in obj:
+        # schema
+        return obj["num_rows"], None
+    return None, None
+
+
+class Span:
+    """One timed section, use it through span() or traced()"""
+
+    __slots__ = ("id", "parent", "name", "attrs", "thread", "start_ns", "wall_ns", "cpu_ns", "rows", "bytes",
+                 "rss_peak_mb", "rss_increase_mb", "py_peak_bytes", "error",
+                 "_token", "_cpu0", "_rss0", "_mem0", "_peak")
+
+    def __init__(self, name: str, attrs: dict):
+        self.id = next(_ids)
+        self.name = name
+        self.attrs = attrs
+        self.rows = None
+        self.bytes = None
+        self.error = None
+        self.py_peak_bytes = None
+
+    def __bool__(self):
+        return True
+
+    def set(self, *, rows: int | None = None, bytes: int | None = None, **attrs) -> "Span":
+        """Record the rows and bytes processed, and any other attribute"""
+        if rows is not None:
+            self.rows = int(rows)
+        if bytes is not None:
+            self.bytes = int(bytes)
+        self.attrs.update(attrs)
+        return self
+
+    def measure(self, obj) -> "Span":
+        """Record the rows and bytes of a frame (polars, pandas, a schema...), unknown ones are left unset"""
+        rows, size = _size(obj)
+        return self.set(rows=rows, bytes=size)
+
+    def __enter__(self) -> "Span":
+        parent = _current.get()
+        self.parent = parent.id if parent is not None else None
+        self.thread = threading.get_ident()
+        self._token = _current.set(self)
+        if _memory and tracemalloc.is_tracing():
+            # the peak is global: hand the peak seen so far to the parent before resetting it
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None and parent._peak is not None:
+                parent._peak = max(parent._peak, peak)
+            tracemalloc.reset_peak()
+            self._mem0 = self._peak = current
+        else:
+            self._mem0 = self._peak = None
+        self._rss0 = peak_rss_mb()
+        self._cpu0 = time.process_time_ns()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_ns = time.perf_counter_ns() - self.start_ns
+        self.cpu_ns = time.process_time_ns() - self._cpu0
+        self.rss_peak_mb = peak_rss_mb()
+        self.rss_increase_mb = self.rss_peak_mb - self._rss0 if self.rss_peak_mb is not None else None
+        if self._peak is not None and tracemalloc.is_tracing():
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self.py_peak_bytes = self._peak - self._mem0
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        parent = _current.get()
+        if parent is not None and self._peak is not None and parent._peak is not None:
+            parent._peak = max(parent._peak, self._peak)
+        with _lock:
+            _finished.append(self)
+        return False
+
+    def to_dict(self) -> dict:
+        wall = self.wall_ns / 1e9
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "thread": self.thread,
+            "start": (self.start_ns - _origin_ns) / 1e9,
+            "wall_s": wall,
+            "cpu_s": self.cpu_ns / 1e9,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "rows_per_s": self.rows / wall if self.rows is not None and wall > 0 else None,
+            "rss_peak_mb": self.rss_peak_mb,
+            "rss_increase_mb": self.rss_increase_mb,
+            "py_peak_bytes": self.py_peak_bytes,
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    """Returned while tracing is disabled, every call is a no-op"""
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def set(self, **attrs):
+        return self
+
+    def measure(self, obj):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def enable(*, memory: bool = False):
+    """Start recording spans, memory=True also traces Python allocations (slower)"""
+    global _enabled, _memory
+    _enabled = True
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _enabled, _memory
+    _enabled = False
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attrs):
+    """Context manager timing a section, a no-op while tracing is disabled"""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current():
+    """The innermost open span of the calling thread (a no-op one if there is none)"""
+    return (_current.get() if _enabled else None) or _NOOP
+
+
+def traced(name: str | None = None, *, measure=None):
+    """
+    Decorator running the function in a span named name (its qualified name by default).
+    The rows and bytes are taken from the result, or from measure(*args, **kwargs) when given
+    (e.g. measure=lambda self, *a, **k: self.profile)
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(label, {}) as sp:
+                result = func(*args, **kwargs)
+                sp.measure(result if measure is None else measure(*args, **kwargs))
+                return result
+        wrapper.__traced__ = True
+        return wrapper
+
+    if callable(name):
+        # used as @traced
+        func, name = name, None
+        return decorator(func)
+    return decorator
+
+
+def spans() -> list[dict]:
+    """Finished spans, in the order they ended (the last MAX_SPANS)"""
+    with _lock:
+        return [s.to_dict() for s in _finished]
+
+
+def reset():
+    with _lock:
+        _finished.clear()
+
+
+def export_jsonl(path: str) -> str:
+    """One JSON object per finished span"""
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for record in spans():
+            f.write(json.dumps(record, default=str) + "\n")
+    return path
+
+
+def export_chrome_trace(path: str) -> str:
+    """Spans as complete events of the Chrome trace event format, one track per thread"""
+    pid = os.getpid()
+    events = []
+    for record in spans():
+        args = {k: v for k, v in record.items() if k not in ("name", "start", "wall_s", "thread", "attrs") and v is not None}
+        args.update(record["attrs"])
+        events.append({
+            "name": record["name"],
+            "cat": record["name"].split(".")[0],
+            "ph": "X",
+            "ts": record["start"] * 1e6,
+            "dur": record["wall_s"] * 1e6,
+            "pid": pid,
+            "tid": record["thread"],
+            "args": args,
+        })
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+    return path
+
+
+if os.environ.get(ENV_VAR, "") not in ("", "0"):
+    enable(memory=os.environ[ENV_VAR] == "memory")
@@ -1,5 +1,6 @@
 from .downCaster import DownCaster
 from .schemaInfererFlatFiles import SchemaInfererFlatFiles
 from .schemaInfererDB import SchemaInfererDB
+from .columnSchema import ColumnSchema, SchemaTable
 
-__all__ = ["DownCaster", "SchemaInfererFlatFiles", "SchemaInfererDB"]
\ No newline at end of file
+__all__ = ["DownCaster", "SchemaInfererFlatFiles", "SchemaInfererDB", "ColumnSchema", "SchemaTable"]
\ No newline at end of file
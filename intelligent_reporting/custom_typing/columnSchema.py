@@ -0,0 +1,134 @@
+from dataclasses import dataclass, fields, asdict
+from typing import Iterable
+import polars as pl
+
+
+@dataclass(slots=True)
+class ColumnSchema:
+    """
+    Typed schema record of a single column.
+    Ratios are kept as numbers in [0, 1], they are only formatted as
+    percentages at the JSON/report boundary (see `to_report`).
+    """
+    name: str
+    inferred_type: str
+    confidence: float
+    invalid_conversions: int
+    null_values: int
+    distinct_count: int
+    unique_ratio: float
+    missing_ratio: float
+    mean_length: float | None
+    is_constant: bool
+    is_identifier: bool
+
+    def to_dict(self) -> dict:
+        """Numeric representation, suitable for persistence"""
+        return asdict(self)
+
+    def to_report(self) -> dict:
+        """Human readable representation used in the schema json report"""
+        return {
+            "name": self.name,
+            "inferred_type": self.inferred_type,
+            "confidence": f"{self.confidence * 100:.2f}%",
+            "invalid_conversions": self.invalid_conversions,
+            "null_values": self.null_values,
+            "distinct_count": self.distinct_count,
+            "unique_ratio": f"{self.unique_ratio * 100:.2f}%",
+            "missing_ratio": f"{self.missing_ratio * 100:.2f}%",
+            "mean_length": f"{self.mean_length:.2f}" if self.mean_length is not None else None,
+            "is_constant": self.is_constant,
+            "is_identifier": self.is_identifier,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ColumnSchema":
+        """Build a record from `to_dict` or `to_report` output"""
+        def ratio(value):
+            if isinstance(value, str):
+                return float(value.rstrip("%")) / 100
+            return float(value)
+
+        return cls(
+            name=data["name"],
+            inferred_type=str(data["inferred_type"]),
+            confidence=ratio(data["confidence"]),
+            invalid_conversions=int(data["invalid_conversions"]),
+            null_values=int(data["null_values"]),
+            distinct_count=int(data["distinct_count"]),
+            unique_ratio=ratio(data["unique_ratio"]),
+            missing_ratio=ratio(data["missing_ratio"]),
+            mean_length=float(data["mean_length"]) if data.get("mean_length") is not None else None,
+            is_constant=bool(data["is_constant"]),
+            is_identifier=bool(data["is_identifier"]),
+        )
+
+
+def schema_report(schema: dict) -> dict:
+    """Format a schema dictionary (metadata + ColumnSchema records) for the json report"""
+    report = {k: v for k, v in schema.items() if k != "columns"}
+    report["columns"] = {
+        col: entry.to_report() for col, entry in schema.get("columns", {}).items()
+    }
+    return report
+
+
+class SchemaTable:
+    """
+    Columnar, Arrow-backed view of the column records: one row per column,
+    one typed column per field. Cheap to build, filter and serialize for very wide tables.
+    """
+    DTYPES = {
+        "name": pl.Utf8,
+        "inferred_type": pl.Utf8,
+        "confidence": pl.Float64,
+        "invalid_conversions": pl.Int64,
+        "null_values": pl.Int64,
+        "distinct_count": pl.Int64,
+        "unique_ratio": pl.Float64,
+        "missing_ratio": pl.Float64,
+        "mean_length": pl.Float64,
+        "is_constant": pl.Boolean,
+        "is_identifier": pl.Boolean,
+    }
+
+    def __init__(self, frame: pl.DataFrame):
+        self.frame = frame
+
+    @classmethod
+    def from_columns(cls, columns: Iterable[ColumnSchema]) -> "SchemaTable":
+        columns = list(columns)
+        data = {
+            f.name: [getattr(c, f.name) for c in columns]
+            for f in fields(ColumnSchema)
+        }
+        return cls(pl.DataFrame(data, schema=cls.DTYPES))
+
+    @classmethod
+    def from_schema(cls, schema: dict) -> "SchemaTable":
+        return cls.from_columns(schema.get("columns", {}).values())
+
+    def to_columns(self) -> list[ColumnSchema]:
+        return [ColumnSchema(**row) for row in self.frame.iter_rows(named=True)]
+
+    def to_arrow(self):
+        return self.frame.to_arrow()
+
+    def write_ipc(self, path: str):
+        """Serialize as an Arrow IPC file"""
+        self.frame.write_ipc(path)
+        return path
+
+    @classmethod
+    def read_ipc(cls, path: str) -> "SchemaTable":
+        return cls(pl.read_ipc(path))
+
+    def __len__(self):
+        return self.frame.height
+
+    def __getitem__(self, name: str) -> ColumnSchema:
+        row = self.frame.filter(pl.col("name") == name)
+        if row.is_empty():
+            raise KeyError(name)
+        return ColumnSchema(**row.row(0, named=True))
@@ -1,44 +1,208 @@
 import polars as pl
+import warnings
+from .columnSchema import ColumnSchema
+from ..core.tracing import traced
 
 import logging
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+def _enable_string_cache():
+    """Categoricals built by the downcaster share one global string cache so frames stay comparable"""
+    with warnings.catch_warnings():
+        # recent polars versions always use global categories
+        warnings.simplefilter("ignore", DeprecationWarning)
+        pl.enable_string_cache()
+
+
 class DownCaster :
     """This class should be responsible of downcasting type columns of a pl.DataFrame object"""
 
+    INT_TYPES = [(pl.Int8, -128, 127), (pl.Int16, -32768, 32767), (pl.Int32, -2**31, 2**31 - 1)]
+    UINT_TYPES = [(pl.UInt8, 0, 255), (pl.UInt16, 0, 65535), (pl.UInt32, 0, 2**32 - 1)]
+    FLOAT32_MAX = 3.4e38
+    BYTE_WIDTH = {
+        pl.Int8: 1, pl.Int16: 2, pl.Int32: 4, pl.Int64: 8,
+        pl.UInt8: 1, pl.UInt16: 2, pl.UInt32: 4, pl.UInt64: 8,
+    }
+
+    def __init__(
+            self,
+            *,
+            float_tolerance: float = 0.0,
+            encode_strings: bool = True,
+            max_unique_ratio: float = 0.1,
+            string_encoding: str = "categorical",
+        ):
+        """
+        float_tolerance: maximum relative error accepted when a Float64 column is narrowed
+        to Float32, 0.0 means the values must round-trip exactly (lossless)
+        encode_strings: dictionary-encode low-cardinality string columns
+        max_unique_ratio: distinct ratio under which a string column is encoded
+        string_encoding: "categorical" (pl.Categorical) or "enum" (pl.Enum of the observed values)
+        """
+        if string_encoding not in ("categorical", "enum"):
+            raise ValueError("string_encoding must be either 'categorical' or 'enum'")
+        self.float_tolerance = float_tolerance
+        self.encode_strings = encode_strings
+        self.max_unique_ratio = max_unique_ratio
+        self.string_encoding = string_encoding
+        self.report = {}
+
+    @staticmethod
+    def _schema_unique_ratio(schema: dict | None, col: str):
+        """Distinct ratio of a column as computed by the schema inferers, None if unknown"""
+        if not schema:
+            return None
+        entry = schema.get("columns", {}).get(col)
+        if entry is None:
+            return None
+        if isinstance(entry, dict):
+            # schema loaded back from a json report
+            entry = ColumnSchema.from_dict(entry)
+        return entry.unique_ratio
+
+    def _int_target(self, min_value, max_value):
+        """Pick the narrowest integer type (unsigned when possible) holding [min_value, max_value]"""
+        candidates = self.UINT_TYPES if min_value >= 0 else self.INT_TYPES
+        for dtype, min_type, max_type in candidates:
+            if max_value <= max_type and min_value >= min_type:
+                return dtype
+        return None
+
+    def _float_lossless_expr(self, col: str) -> pl.Expr:
+        """True when every value of the column survives a Float64 -> Float32 round trip"""
+        c = pl.col(col)
+        roundtrip = c.cast(pl.Float32).cast(pl.Float64)
+        if self.float_tolerance > 0:
+            close = (roundtrip - c).abs() <= self.float_tolerance * c.abs()
+        else:
+            close = roundtrip == c
+        # NaN and infinities survive the round trip, nulls are ignored by all()
+        in_range = c.abs() <= self.FLOAT32_MAX
+        return ((close & in_range) | c.is_nan() | c.is_infinite()).all()
+
     def downcast_integer(self, serie: pl.Series):
         """Downcast a pl.Series object based on its minimum and maximum values to a more convienient pl.Int"""
-        INT_TYPES = [(pl.Int8, -128, 127), (pl.Int16, -32768, 32767), (pl.Int32, -2**31, 2**31 - 1)]
-        max_value = serie.max()
-        min_value = serie.min()
+        if serie.null_count() == serie.len():
+            return serie
+        dtype = self._int_target(serie.min(), serie.max())
+        return serie.cast(dtype) if dtype is not None else serie
 
-        for dtype, min_type, max_type in INT_TYPES:
-            if max_value <= max_type and min_value >= min_type:
-                return serie.cast(dtype)
-            
-        return serie
-    
     def downcast_float(self, serie: pl.Series):
-        """Downcast a pl.Series object based on its minimum and maximum values to a more convienient pl.Float"""
-        FLOAT_TYPES = [(pl.Float32,-3.4e38, 3.4e38)]
-        max_value = serie.max()
-        min_value = serie.min()
-
-        for dtype, min_type, max_type in FLOAT_TYPES:
-            if max_value <= max_type and min_value >= min_type:
-                return serie.cast(dtype)
-            
+        """Downcast a pl.Series object to pl.Float32 when no precision is lost"""
+        if serie.to_frame().select(self._float_lossless_expr(serie.name)).item():
+            return serie.cast(pl.Float32)
         return serie
-        
 
-    def optimize(self, df: pl.DataFrame) -> pl.DataFrame:
+    @staticmethod
+    def _collect(query: pl.DataFrame | pl.LazyFrame, engine: str) -> pl.DataFrame:
+        return query.collect(engine=engine) if isinstance(query, pl.LazyFrame) else query
+
+    def _plan(self, df: pl.DataFrame | pl.LazyFrame, schema: dict | None = None, *, engine: str = "streaming") -> dict:
         """
-        Downcast a pl.DataFrame dataframe into a more narrow type
+        Compute, in one aggregate pass over the frame, the target dtype of every
+        numeric column that can be narrowed and of every string column worth encoding.
+        A LazyFrame is only aggregated, with the given engine
         """
-        for col in df.columns:
-            if df[col].dtype in [pl.Int64]:
-                df = df.with_columns(self.downcast_integer(df[col]).alias(col))
-            elif df[col].dtype in [pl.Float64]:
-                df = df.with_columns(self.downcast_float(df[col]).alias(col))
-        return df
\ No newline at end of file
+        df_schema = df.collect_schema()
+        int_cols = [col for col, dt in df_schema.items() if dt in (pl.Int64, pl.Int32, pl.Int16, pl.UInt64, pl.UInt32, pl.UInt16)]
+        float_cols = [col for col, dt in df_schema.items() if dt == pl.Float64]
+        str_cols = [col for col, dt in df_schema.items() if dt == pl.Utf8] if self.encode_strings else []
+        if not int_cols and not float_cols and not str_cols:
+            return {}
+
+        # reuse the distinct ratios already computed by the schema inferers
+        unique_ratios = {col: self._schema_unique_ratio(schema, col) for col in str_cols}
+
+        aggs = []
+        for col in int_cols:
+            aggs.append(pl.col(col).min().alias(f"{col}__min"))
+            aggs.append(pl.col(col).max().alias(f"{col}__max"))
+        for col in float_cols:
+            aggs.append(self._float_lossless_expr(col).alias(f"{col}__lossless"))
+        for col in str_cols:
+            if unique_ratios[col] is None:
+                aggs.append(pl.col(col).n_unique().alias(f"{col}__n_unique"))
+        if any(ratio is None for ratio in unique_ratios.values()):
+            aggs.append(pl.len().alias("__height"))
+        stats = self._collect(df.select(aggs), engine).row(0, named=True) if aggs else {}
+
+        for col in str_cols:
+            if unique_ratios[col] is None:
+                unique_ratios[col] = stats[f"{col}__n_unique"] / stats["__height"] if stats["__height"] else 1.0
+
+        targets = {}
+        for col in int_cols:
+            min_value, max_value = stats[f"{col}__min"], stats[f"{col}__max"]
+            if min_value is None:
+                continue
+            dtype = self._int_target(min_value, max_value)
+            if dtype is not None and self.BYTE_WIDTH[dtype] < self.BYTE_WIDTH[df_schema[col]]:
+                targets[col] = dtype
+        for col in float_cols:
+            if stats[f"{col}__lossless"]:
+                targets[col] = pl.Float32
+        for col in str_cols:
+            if unique_ratios[col] > self.max_unique_ratio:
+                continue
+            if self.string_encoding == "enum":
+                values = self._collect(df.select(pl.col(col).drop_nulls().unique().sort()), engine)[col]
+                targets[col] = pl.Enum(values.to_list())
+            else:
+                targets[col] = pl.Categorical
+        return targets
+
+    def _bytes_report(self, before: pl.DataFrame, after: pl.DataFrame, targets: dict) -> dict:
+        """Bytes saved per downcasted column"""
+        report = {}
+        for col in targets:
+            bytes_before = before[col].estimated_size()
+            bytes_after = after[col].estimated_size()
+            report[col] = {
+                "from": str(before.schema[col]),
+                "to": str(after.schema[col]),
+                "bytes_before": bytes_before,
+                "bytes_after": bytes_after,
+                "bytes_saved": bytes_before - bytes_after,
+            }
+        return report
+
+    @staticmethod
+    def decode_strings(df: pl.DataFrame) -> pl.DataFrame:
+        """Turn dictionary-encoded (Categorical/Enum) columns back into plain strings"""
+        encoded = [col for col, dt in df.schema.items() if dt in (pl.Categorical, pl.Enum)]
+        if not encoded:
+            return df
+        return df.with_columns([pl.col(col).cast(pl.Utf8) for col in encoded])
+
+    @traced("downcast")
+    def optimize(self, df: pl.DataFrame | pl.LazyFrame, schema: dict | None = None, *, engine: str = "streaming"):
+        """
+        Downcast a pl.DataFrame dataframe into a more narrow type,
+        the bytes saved per column are kept in self.report
+        schema: optional schema from the inferers, its distinct ratios drive the string encoding
+        A pl.LazyFrame stays lazy: the target types are computed with aggregate queries (on engine)
+        and the casts are appended to the plan, the report then only holds the types
+        """
+        targets = self._plan(df, schema, engine=engine)
+        if not targets:
+            self.report = {}
+            return df
+
+        if any(dtype in (pl.Categorical, pl.Enum) for dtype in targets.values()):
+            _enable_string_cache()
+
+        optimized = df.with_columns([pl.col(col).cast(dtype) for col, dtype in targets.items()])
+        if isinstance(df, pl.LazyFrame):
+            self.report = {col: {"from": str(df.collect_schema()[col]), "to": str(dtype)} for col, dtype in targets.items()}
+            logger.info("Downcast planned for %d columns", len(self.report))
+            return optimized
+
+        self.report = self._bytes_report(df, optimized, targets)
+        logger.info(
+            "Downcasted %d columns | bytes saved=%d",
+            len(self.report),
+            sum(r["bytes_saved"] for r in self.report.values()),
+        )
+        return optimized
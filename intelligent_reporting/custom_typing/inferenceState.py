@@ -0,0 +1,89 @@
+from dataclasses import dataclass, field
+from ..core.sketches import HyperLogLog
+
+
+@dataclass
+class ColumnInferenceState:
+    """
+    Mergeable per-column inference state.
+    Holds the raw counts behind the type ratios so that the state of appended
+    rows can be computed alone and merged into the stored one.
+    """
+    rows: int = 0
+    nulls: int = 0
+    n_int: int = 0
+    n_float: int = 0
+    n_datetime: int = 0
+    n_boolean: int = 0
+    n_string: int = 0
+    length_sum: int = 0
+    length_count: int = 0
+    distinct_exact: int | None = None
+    distinct_sketch: HyperLogLog = field(default_factory=HyperLogLog)
+
+    @property
+    def non_null(self) -> int:
+        return self.rows - self.nulls
+
+    @property
+    def distinct_count(self) -> int:
+        """Exact distinct count for a single batch, sketch estimate once merged"""
+        if self.distinct_exact is not None:
+            return self.distinct_exact
+        return min(int(round(self.distinct_sketch.count())), self.non_null)
+
+    @property
+    def mean_length(self) -> float | None:
+        return self.length_sum / self.length_count if self.length_count else None
+
+    def ratios(self) -> dict:
+        """Type ratios in the format expected by `SchemaInfererFlatFiles._decide_type`"""
+        total = self.non_null
+        if total == 0:
+            return {
+                "int": 0.0,
+                "float": 0.0,
+                "datetime": 0.0,
+                "boolean": 0.0,
+                "category": 0.0,
+                "string": 1.0,
+            }
+        return {
+            "int": self.n_int / total,
+            "float": self.n_float / total,
+            "datetime": self.n_datetime / total,
+            "boolean": self.n_boolean / total,
+            "category": 1 - self.distinct_count / total,
+            "string": self.n_string / total,
+        }
+
+    def merge(self, other: "ColumnInferenceState") -> "ColumnInferenceState":
+        """Return the state of both batches combined"""
+        sketch = HyperLogLog(
+            precision=self.distinct_sketch.precision,
+            registers=self.distinct_sketch.registers,
+        ).merge(other.distinct_sketch)
+        return ColumnInferenceState(
+            rows=self.rows + other.rows,
+            nulls=self.nulls + other.nulls,
+            n_int=self.n_int + other.n_int,
+            n_float=self.n_float + other.n_float,
+            n_datetime=self.n_datetime + other.n_datetime,
+            n_boolean=self.n_boolean + other.n_boolean,
+            n_string=self.n_string + other.n_string,
+            length_sum=self.length_sum + other.length_sum,
+            length_count=self.length_count + other.length_count,
+            distinct_exact=None,
+            distinct_sketch=sketch,
+        )
+
+    def to_dict(self):
+        data = {k: v for k, v in self.__dict__.items() if k != "distinct_sketch"}
+        data["distinct_sketch"] = self.distinct_sketch.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        data = dict(data)
+        data["distinct_sketch"] = HyperLogLog.from_dict(data["distinct_sketch"])
+        return cls(**data)
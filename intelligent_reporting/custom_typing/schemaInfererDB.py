@@ -1,4 +1,7 @@
 from ..connectors.registry import register_db_schema_inferer
+from .columnSchema import ColumnSchema, SchemaTable, schema_report
+from ..core.stats import ColumnStats
+from ..core.tracing import traced
 import polars as pl
 import os
 from datetime import datetime
@@ -13,27 +16,19 @@ class SchemaInfererDB:
     def __init__(self):
         self.schema = {}
 
-    def _compute_stats(self, s: pl.Series):
-        """generate a dict containing the general stats of a column"""
-        cleaned = s.drop_nulls()
-
-        null_values = s.null_count()
-        distinct_count = cleaned.n_unique()
-
-        mean_length = (
-            cleaned.str.len_chars().mean()
-            if s.dtype == pl.Utf8
-            else None
-        )
+    def _compute_stats(self, col_stats: dict, n_rows: int):
+        """generate a dict containing the general stats of a column from its ColumnStats entry"""
+        null_values = col_stats["null_count"]
+        distinct_count = col_stats["distinct_count"]
 
         return {
             "null_values": null_values,
             "distinct_count": distinct_count,
-            "unique_ratio": distinct_count / len(s) if len(s) else 0,
-            "missing_ratio": null_values / len(s) if len(s) else 0,
-            "mean_length": mean_length,
+            "unique_ratio": distinct_count / n_rows if n_rows else 0,
+            "missing_ratio": null_values / n_rows if n_rows else 0,
+            "mean_length": col_stats.get("mean_length"),
             "is_constant": distinct_count == 1,
-            "is_identifier": distinct_count == len(s),
+            "is_identifier": distinct_count == n_rows,
         }
     
     @staticmethod
@@ -47,6 +42,7 @@ class SchemaInfererDB:
             return list(obj)
         return str(obj)
     
+    @traced("infer.db")
     def infer_schema(self, df: pl.DataFrame, schema_dir: str):
         """
         Take the polars Dataframe and dumps its schema in a schema_dir
@@ -58,29 +54,35 @@ class SchemaInfererDB:
         self.schema.setdefault("num_cols", df.width)
         self.schema.setdefault("memory_usage_mb", float(round(df.estimated_size() / 1024**2, 2)))
         self.schema.setdefault("columns", {})
+        # one pass over the frame for every column
+        column_stats = ColumnStats(df, distribution=False)
         for col in df.columns:
-            stats = self._compute_stats(df[col])
-            self.schema["columns"][col] = {
-                    "name": col,
-                    "inferred_type": df[col].dtype,
-                    "confidence": "100%",
-                    "invalid_conversions": 0,
-                    "null_values": stats['null_values'],
-                    "distinct_count": stats['distinct_count'],
-                    "unique_ratio": f"{ stats['unique_ratio'] * 100:.2f}%",
-                    "missing_ratio": f"{stats['missing_ratio'] * 100:.2f}%",
-                    "mean_length": (
-                        f"{stats['mean_length']:.2f}" if stats["mean_length"] is not None else None
+            stats = self._compute_stats(column_stats[col], df.height)
+            self.schema["columns"][col] = ColumnSchema(
+                    name=col,
+                    inferred_type=str(df[col].dtype),
+                    confidence=1.0,
+                    invalid_conversions=0,
+                    null_values=int(stats['null_values']),
+                    distinct_count=int(stats['distinct_count']),
+                    unique_ratio=float(stats['unique_ratio']),
+                    missing_ratio=float(stats['missing_ratio']),
+                    mean_length=(
+                        float(stats['mean_length']) if stats["mean_length"] is not None else None
                     ),
-                    "is_constant": stats["is_constant"],
-                    "is_identifier": stats["is_identifier"]
-                }
+                    is_constant=bool(stats["is_constant"]),
+                    is_identifier=bool(stats["is_identifier"])
+                )
         # extract base filename without extension
         base_name = "schema-"+ datetime.now().strftime("%Y-%m-%d %H-%M-%S")
         # make full schema file path
         schema_file = os.path.join(schema_dir, f"{base_name}.json")
         # write the json file
         with open(schema_file, "w", encoding="utf-8") as f:
-            json.dump(self.schema, f, indent=4, default=self._to_serializable, ensure_ascii=False)
+            json.dump(schema_report(self.schema), f, indent=4, default=self._to_serializable, ensure_ascii=False)
         print(f"Schema saved to: {schema_file}")
-        return df, self.schema
\ No newline at end of file
+        return df, self.schema
+
+    def schema_table(self) -> SchemaTable:
+        """Columnar view of the inferred column records"""
+        return SchemaTable.from_schema(self.schema)
\ No newline at end of file
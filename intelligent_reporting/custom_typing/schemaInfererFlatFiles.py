@@ -1,4 +1,8 @@
 from ..connectors.registry import register_file_schema_inferer
+from .inferenceState import ColumnInferenceState
+from .columnSchema import ColumnSchema, SchemaTable, schema_report
+from ..core.stats import ColumnStats
+from ..core.tracing import traced
 import polars as pl
 from datetime import datetime
 import os
@@ -12,26 +16,39 @@ logger.addHandler(logging.NullHandler())
 class SchemaInfererFlatFiles():
     """This class should be responsible of infering the pl.DataFrame object's schema, apply it and generate the schema report."""
 
+    # Define thresholds
+    THRESH_BOOLEAN = 0.98
+    THRESH_CATEGORY = 0.95
+    THRESH_INT = 0.9
+    THRESH_FLOAT = 0.9
+    THRESH_DATETIME = 0.7
+
+    # Int -> Float -> String, every other type widens straight to String
+    WIDENING = {"Int": "Float", "Float": "String"}
+
     def __init__(self):
        """Constructor"""
        self.schema = {}
        self.nulls = {}
+       self.states = {}
+       self.widened = {}
 
 
     def _infer_column_type(self, series: pl.Series):
         """Determine the column's data type ratios,
         returns a dictionary with each type and the probability that the column in in that type"""
+        return self._column_state(series).ratios()
+
+
+    def _column_state(self, series: pl.Series) -> ColumnInferenceState:
+        """Count, for the given column, the values matching each candidate type.
+        The returned state is mergeable with the state of other rows of the same column"""
         s = series.drop_nulls()
         total = len(s)
+        state = ColumnInferenceState(rows=len(series), nulls=series.null_count())
         if total == 0:
-           return {
-                "int": 0.0,
-                "float": 0.0,
-                "datetime": 0.0,
-                "boolean": 0.0,
-                "category": 0.0,
-                "string": 1.0,
-            }
+            state.distinct_exact = 0
+            return state
         def is_integer_dtype(dtype) -> bool:
             return dtype in [pl.Int8, pl.Int16, pl.Int32, pl.Int64]
 
@@ -73,10 +90,8 @@ class SchemaInfererFlatFiles():
 
 
         # category detection
-        def category_ratio_calc(s: pl.Series) -> float:
-            unique_ratio = s.n_unique() / len(s)
-            return unique_ratio
-        category_ratio = category_ratio_calc(s)
+        state.distinct_exact = s.n_unique()
+        state.distinct_sketch.update(s)
                 
         
         
@@ -94,7 +109,6 @@ class SchemaInfererFlatFiles():
                 numeric_cast = s.cast(pl.Float64, strict=False)
                 return (numeric_cast % 1 == 0) & numeric_cast.is_not_null()
         int_mask = int_mask_calc(s)
-        int_ratio = int_mask.mean()
 
         # float
         
@@ -114,7 +128,6 @@ class SchemaInfererFlatFiles():
             float_mask = numeric_mask & (~int_mask)
             return float_mask
         float_mask = float_mask_calc(s, int_mask)
-        float_ratio = float_mask.mean()
 
 
         def parse_datetime_generic(s: pl.Series) -> pl.Series:
@@ -146,22 +159,23 @@ class SchemaInfererFlatFiles():
         # datetime detection
         datetime_cast = parse_datetime_generic(s)
         datetime_mask = datetime_cast.is_not_null()
-        datetime_ratio = datetime_mask.mean()
 
 
         # everything else then string
         non_string_mask = bool_mask | int_mask | datetime_mask | float_mask
         string_mask = ~non_string_mask
-        string_ratio = string_mask.mean()
-        
-        return {
-            "int": float(int_ratio),
-            "float": float(float_ratio),
-            "datetime": float(datetime_ratio),
-            "boolean": float(bool_ratio),
-            "category": 1 - float(category_ratio),
-            "string": float(string_ratio)
-        }
+
+        state.n_int = int(int_mask.sum())
+        state.n_float = int(float_mask.sum())
+        state.n_datetime = int(datetime_mask.sum())
+        state.n_boolean = int(round(bool_ratio * total))
+        state.n_string = int(string_mask.sum())
+
+        if s.dtype == pl.Utf8:
+            state.length_sum = int(s.str.len_chars().sum())
+            state.length_count = total
+
+        return state
 
 
     def _decide_type(self, ratios: dict):
@@ -179,45 +193,77 @@ class SchemaInfererFlatFiles():
         Return:
             the infered type and the confidence
         """
-        # Define thresholds
-        THRESH_BOOLEAN = 0.98
-        THRESH_CATEGORY = 0.95
-        THRESH_INT = 0.9
-        THRESH_FLOAT = 0.9
-        THRESH_DATETIME = 0.7
-
         # Priority order: bool -> category -> int -> float -> datetime -> string -> object
         
-        if ratios["boolean"] >= THRESH_BOOLEAN:
+        if ratios["boolean"] >= self.THRESH_BOOLEAN:
             return "Boolean", ratios["boolean"] / (ratios["boolean"] + ratios["string"])
 
-        if ratios["int"] >= THRESH_INT:
+        if ratios["int"] >= self.THRESH_INT:
             return "Int", ratios["int"]
 
-        if ratios["float"] >= THRESH_FLOAT:
+        if ratios["float"] >= self.THRESH_FLOAT:
             return "Float", ratios["float"]
 
-        if ratios["datetime"] >= THRESH_DATETIME:
+        if ratios["datetime"] >= self.THRESH_DATETIME:
             return "Datetime", ratios["datetime"] / (ratios["datetime"] + ratios["string"])
 
         # category based on unique-ratio (separately computed)
-        if ratios["category"] >= THRESH_CATEGORY:
+        if ratios["category"] >= self.THRESH_CATEGORY:
             return "Category", ratios["category"]# / (ratios["category"] + ratios["string"])
 
         # fallback
         return "String", ratios["string"]
 
 
-    def _convert_column(self, col_data: pl.Series, inferred_type: str):
-        """Actually converts the column into the infered type, drops the invalids"""
+    def _type_holds(self, inferred_type: str, ratios: dict):
+        """Check whether the merged ratios still support an already inferred type,
+        returns whether it holds and the confidence"""
+        if inferred_type == "Boolean":
+            confidence = ratios["boolean"] / ((ratios["boolean"] + ratios["string"]) or 1)
+            return ratios["boolean"] >= self.THRESH_BOOLEAN, confidence
+        if inferred_type == "Int":
+            return ratios["int"] >= self.THRESH_INT, ratios["int"]
+        if inferred_type == "Float":
+            # integer-like values are valid floats once the column is a Float
+            numeric = ratios["int"] + ratios["float"]
+            return numeric >= self.THRESH_FLOAT, numeric
+        if inferred_type == "Datetime":
+            confidence = ratios["datetime"] / ((ratios["datetime"] + ratios["string"]) or 1)
+            return ratios["datetime"] >= self.THRESH_DATETIME, confidence
+        if inferred_type == "Category":
+            return ratios["category"] >= self.THRESH_CATEGORY, ratios["category"]
+        # String accepts everything
+        return True, ratios["string"]
+
+
+    def _widen_type(self, previous_type: str | None, ratios: dict):
+        """
+        Decide the type of a column whose rows have been appended.
+        The previous type is kept as long as the merged ratios support it,
+        otherwise it is widened along Int -> Float -> String; it is never narrowed.
+        """
+        if previous_type is None:
+            return self._decide_type(ratios)
+
+        current = previous_type
+        while True:
+            holds, confidence = self._type_holds(current, ratios)
+            if holds:
+                return current, confidence
+            current = self.WIDENING.get(current, "String")
+
+
+    def _convert_expr(self, col: str, inferred_type: str) -> pl.Expr:
+        """Expression converting the column into the infered type, invalids become null"""
+        col_data = pl.col(col)
         if inferred_type == "Int":
-            converted = col_data.cast(pl.Float64).round(0).cast(pl.Int64)
+            return col_data.cast(pl.Float64).round(0).cast(pl.Int64)
 
         elif inferred_type == "Float":
-            converted = col_data.cast(pl.Float64, strict=False)
+            return col_data.cast(pl.Float64, strict=False)
 
         elif inferred_type == "Datetime":
-            converted = col_data.str.strptime(
+            return col_data.str.strptime(
                 pl.Datetime,
                 format="%Y-%m-%d %H:%M:%S",
                 strict=False
@@ -228,44 +274,47 @@ class SchemaInfererFlatFiles():
                 "true": True, "1": True, "yes": True,
                 "false": False, "0": False, "no": False
             }
+            # Ensure it's string and lowercase, map values in a single vectorized pass, unknown values become null
+            return col_data.cast(pl.Utf8).str.to_lowercase().replace_strict(bool_map, default=None, return_dtype=pl.Boolean)
 
-            # Convert a Series safely
-            def series_to_boolean(col: pl.Series) -> pl.Series:
-                # Ensure it's string and lowercase
-                s = col.cast(pl.Utf8).str.to_lowercase()
-
-                # Map values using list comprehension (works in any version)
-                return pl.Series([bool_map.get(v, None) for v in s])
-            converted = series_to_boolean(col_data)
+        # String or any unhandled
+        return col_data
 
-        else:  # String or any unhandled
-            converted = col_data.clone()
 
+    def _convert_column(self, col_data: pl.Series, inferred_type: str):
+        """Actually converts the column into the infered type, drops the invalids"""
+        converted = col_data.to_frame().select(self._convert_expr(col_data.name, inferred_type)).to_series()
         invalid_count = converted.is_null().sum() - col_data.is_null().sum()
         return converted, invalid_count
 
 
-    def _compute_stats(self, original: pl.Series, converted: pl.Series):
-        """generate a dict containing the general stats of a column"""
-        cleaned = converted.drop_nulls()
+    def apply_schema(self, lf: pl.LazyFrame, schema: dict | None = None) -> pl.LazyFrame:
+        """
+        Append the conversion of every column to its inferred type to a lazy query,
+        e.g. after infer_schema_from_batches, nothing is computed until the query is collected
+        """
+        schema = schema or self.schema
+        return lf.with_columns([
+            self._convert_expr(col, entry.inferred_type).alias(col)
+            for col, entry in schema["columns"].items()
+        ])
 
-        null_values = original.null_count()
-        distinct_count = cleaned.n_unique()
 
-        mean_length = (
-            cleaned.str.len_chars().mean()
-            if converted.dtype == pl.Utf8
-            else None
-        )
+    def _compute_stats(self, null_values: int, col_stats: dict, n_rows: int):
+        """
+        generate a dict containing the general stats of a column
+        null_values: nulls of the original column, col_stats: ColumnStats entry of the converted one
+        """
+        distinct_count = col_stats["distinct_count"]
 
         return {
             "null_values": null_values,
             "distinct_count": distinct_count,
-            "unique_ratio": distinct_count / len(original) if len(original) else 0,
-            "missing_ratio": null_values / len(original) if len(original) else 0,
-            "mean_length": mean_length,
+            "unique_ratio": distinct_count / n_rows if n_rows else 0,
+            "missing_ratio": null_values / n_rows if n_rows else 0,
+            "mean_length": col_stats.get("mean_length"),
             "is_constant": distinct_count == 1,
-            "is_identifier": distinct_count == len(original),
+            "is_identifier": distinct_count == n_rows,
         }
 
 
@@ -286,22 +335,21 @@ class SchemaInfererFlatFiles():
             stats: dict,
         ):
             """Build schema entry"""
-            return {
-                "name": col,
-                "inferred_type": inferred_type,
-                "confidence": f"{confidence * 100:.2f}%",
-                "invalid_conversions": invalid_count,
-
-                "null_values": stats["null_values"],
-                "distinct_count": stats["distinct_count"],
-                "unique_ratio": f"{stats['unique_ratio'] * 100:.2f}%",
-                "missing_ratio": f"{stats['missing_ratio'] * 100:.2f}%",
-                "mean_length": (
-                    f"{stats['mean_length']:.2f}" if stats["mean_length"] is not None else None
+            return ColumnSchema(
+                name=col,
+                inferred_type=inferred_type,
+                confidence=float(confidence),
+                invalid_conversions=int(invalid_count),
+                null_values=int(stats["null_values"]),
+                distinct_count=int(stats["distinct_count"]),
+                unique_ratio=float(stats["unique_ratio"]),
+                missing_ratio=float(stats["missing_ratio"]),
+                mean_length=(
+                    float(stats["mean_length"]) if stats["mean_length"] is not None else None
                 ),
-                "is_constant": stats["is_constant"],
-                "is_identifier": stats["is_identifier"],
-            }
+                is_constant=bool(stats["is_constant"]),
+                is_identifier=bool(stats["is_identifier"]),
+            )
 
 
     def _apply_conversions(self, df: pl.DataFrame, converted_cols: dict):
@@ -321,31 +369,41 @@ class SchemaInfererFlatFiles():
         return str(obj)
 
 
+    @traced("infer.flat_files")
     def infer_schema(self, df: pl.DataFrame, schema_dir: str):
         """
         Infers column types, uniqueness, and missing ratio for each column.
         Inforce the schema infered to the pl.DataFrame df.
-        Returns the actual pl.DataFrame and a structured schema dictionary.
+        Returns the actual pl.DataFrame and a structured schema dictionary,
+        its "columns" entry maps each column to a ColumnSchema record.
         """
         self._init_schema_metadata(df)
 
         converted_cols = {}
+        inferred = {}
 
         for col in df.columns:
             col_data = df[col]
 
             # 1. infer type
-            ratios = self._infer_column_type(col_data)
-            inferred_type, confidence = self._decide_type(ratios)
+            state = self._column_state(col_data)
+            self.states[col] = state
+            inferred_type, confidence = self._decide_type(state.ratios())
 
             # 2. convert column
             converted, invalid_count = self._convert_column(col_data, inferred_type)
             converted_cols[col] = converted.alias(col)
+            inferred[col] = (inferred_type, confidence, invalid_count)
+
+        # 3. apply conversions
+        cleaned_df = self._apply_conversions(df, converted_cols)
 
-            # 3. compute stats
-            stats = self._compute_stats(col_data, converted)
+        # 4. compute the stats of every converted column in one pass
+        column_stats = ColumnStats(cleaned_df, distribution=False)
 
-            # 4. add schema entry
+        # 5. add schema entries
+        for col, (inferred_type, confidence, invalid_count) in inferred.items():
+            stats = self._compute_stats(self.states[col].nulls, column_stats[col], df.height)
             self.schema["columns"][col] = self._build_schema_entry(
                 col,
                 inferred_type,
@@ -354,18 +412,204 @@ class SchemaInfererFlatFiles():
                 stats
             )
 
-        # 5. apply conversions
-        cleaned_df = self._apply_conversions(df, converted_cols)
+        self._write_schema(schema_dir)
+
+        return cleaned_df, self.schema
+
 
-        # ---
+    def _write_schema(self, schema_dir: str):
+        """Dump the current schema as a timestamped json file in schema_dir"""
         os.makedirs(schema_dir, exist_ok=True)
         base_name = "schema-"+ datetime.now().strftime("%Y-%m-%d %H-%M-%S")
         schema_file = os.path.join(schema_dir, f"{base_name}.json")
 
-        # write the json file
+        # write the json file, percentages are only formatted here
         with open(schema_file, "w", encoding="utf-8") as f:
-            json.dump(self.schema, f, indent=4, default=self._to_serializable, ensure_ascii=False)
+            json.dump(schema_report(self.schema), f, indent=4, default=self._to_serializable, ensure_ascii=False)
 
         print(f"Schema saved to: {schema_file}")
+        return schema_file
+
+
+    def schema_table(self) -> SchemaTable:
+        """Columnar view of the inferred column records"""
+        return SchemaTable.from_schema(self.schema)
 
-        return cleaned_df, self.schema
\ No newline at end of file
+
+    def _state_stats(self, state: ColumnInferenceState, inferred_type: str):
+        """generate the general stats of a column from its (merged) inference state"""
+        distinct_count = state.distinct_count
+        if state.distinct_exact is not None:
+            is_identifier = distinct_count == state.rows
+        else:
+            # unique within the error of the merged sketch (3 standard errors), as SketchSummarizer.index_cols
+            tolerance = 3 * state.distinct_sketch.relative_error
+            is_identifier = state.rows > 0 and state.nulls == 0 and distinct_count >= state.rows * (1 - tolerance)
+        return {
+            "null_values": state.nulls,
+            "distinct_count": distinct_count,
+            "unique_ratio": distinct_count / state.rows if state.rows else 0,
+            "missing_ratio": state.nulls / state.rows if state.rows else 0,
+            "mean_length": state.mean_length if inferred_type in ("String", "Category") else None,
+            "is_constant": distinct_count == 1,
+            "is_identifier": is_identifier,
+        }
+
+
+    def _state_invalid(self, state: ColumnInferenceState, inferred_type: str) -> int:
+        """Values of the column that would not convert to the inferred type, from its counts"""
+        if inferred_type == "Int":
+            return state.non_null - state.n_int
+        if inferred_type == "Float":
+            return state.non_null - state.n_int - state.n_float
+        if inferred_type == "Datetime":
+            return state.non_null - state.n_datetime
+        if inferred_type == "Boolean":
+            return state.non_null - state.n_boolean
+        return 0
+
+
+    @traced("infer.flat_files_batches")
+    def infer_schema_from_batches(self, batches, schema_dir: str):
+        """
+        Infers the schema of a stream of pl.DataFrame batches (e.g. connector.iter_batches())
+        in one pass with bounded memory: only the mergeable per-column states are kept,
+        distinct counts are HyperLogLog estimates and invalid conversions are derived from the type counts.
+        Returns the schema, the batches are not converted.
+        """
+        self.schema = {}
+        self.states = {}
+        num_rows, memory_usage = 0, 0.0
+
+        for batch in batches:
+            num_rows += batch.height
+            memory_usage += batch.estimated_size() / 1024**2
+            for col in batch.columns:
+                state = self._column_state(batch[col])
+                self.states[col] = self.states[col].merge(state) if col in self.states else state
+
+        self.schema["num_rows"] = num_rows
+        self.schema["num_cols"] = len(self.states)
+        self.schema["memory_usage_mb"] = float(round(memory_usage, 2))
+        self.schema["columns"] = {}
+
+        for col, state in self.states.items():
+            inferred_type, confidence = self._decide_type(state.ratios())
+            self.schema["columns"][col] = self._build_schema_entry(
+                col,
+                inferred_type,
+                confidence,
+                self._state_invalid(state, inferred_type),
+                self._state_stats(state, inferred_type),
+            )
+
+        self._write_schema(schema_dir)
+
+        return self.schema
+
+
+    @traced("infer.flat_files_update")
+    def update_schema(self, df: pl.DataFrame, schema_dir: str):
+        """
+        Infers only the appended rows in df and merges their inference state
+        into the stored one, types are widened when the merged ratios cross the thresholds.
+        Returns the appended rows converted to the (possibly widened) schema and the schema.
+        Columns listed in self.widened changed type, previously converted rows must be recast.
+        """
+        if not self.states:
+            return self.infer_schema(df, schema_dir)
+
+        self.widened = {}
+        self.schema["num_rows"] = self.schema.get("num_rows", 0) + df.height
+        self.schema["memory_usage_mb"] = float(round(
+            self.schema.get("memory_usage_mb", 0) + df.estimated_size() / 1024**2, 2
+        ))
+        self.schema.setdefault("columns", {})
+
+        converted_cols = {}
+
+        for col in df.columns:
+            col_data = df[col]
+            previous = self.schema["columns"].get(col)
+            previous_type = previous.inferred_type if previous else None
+
+            # 1. infer the new rows alone and merge
+            state = self._column_state(col_data)
+            if col in self.states:
+                state = self.states[col].merge(state)
+            self.states[col] = state
+
+            # 2. widen only if needed
+            inferred_type, confidence = self._widen_type(previous_type, state.ratios())
+            if previous_type is not None and inferred_type != previous_type:
+                self.widened[col] = (previous_type, inferred_type)
+                logger.info("Column widened | column=%s | %s -> %s", col, previous_type, inferred_type)
+
+            # 3. convert the new rows
+            converted, invalid_count = self._convert_column(col_data, inferred_type)
+            converted_cols[col] = converted.alias(col)
+            if previous:
+                invalid_count += previous.invalid_conversions
+
+            # 4. update schema entry
+            self.schema["columns"][col] = self._build_schema_entry(
+                col,
+                inferred_type,
+                confidence,
+                invalid_count,
+                self._state_stats(state, inferred_type),
+            )
+
+        # columns missing from the appended rows are null there
+        for col in [c for c in self.states if c not in df.columns]:
+            state = self.states[col].merge(ColumnInferenceState(rows=df.height, nulls=df.height, distinct_exact=0))
+            self.states[col] = state
+            previous = self.schema["columns"].get(col)
+            if previous:
+                self.schema["columns"][col] = self._build_schema_entry(
+                    col,
+                    previous.inferred_type,
+                    previous.confidence,
+                    previous.invalid_conversions,
+                    self._state_stats(state, previous.inferred_type),
+                )
+
+        self.schema["num_cols"] = len(self.schema["columns"])
+
+        cleaned_df = self._apply_conversions(df, converted_cols)
+
+        self._write_schema(schema_dir)
+
+        return cleaned_df, self.schema
+
+
+    def save_state(self, path: str):
+        """Persist the schema and the mergeable inference state of every column"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        schema = {k: v for k, v in self.schema.items() if k != "columns"}
+        schema["columns"] = {col: entry.to_dict() for col, entry in self.schema.get("columns", {}).items()}
+        payload = {
+            "schema": schema,
+            "states": {col: state.to_dict() for col, state in self.states.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, default=self._to_serializable, ensure_ascii=False)
+        return path
+
+
+    def load_state(self, path: str):
+        """Restore a state saved with `save_state` so appended rows can be merged into it"""
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        self.schema = payload["schema"]
+        self.schema["columns"] = {
+            col: ColumnSchema.from_dict(entry)
+            for col, entry in self.schema.get("columns", {}).items()
+        }
+        self.states = {
+            col: ColumnInferenceState.from_dict(state)
+            for col, state in payload["states"].items()
+        }
+        return self
\ No newline at end of file
@@ -0,0 +1,166 @@
+"""
+Tiny DAG scheduler: stages declare the stages they depend on and run on a thread pool
+as soon as their dependencies are done, independent stages run concurrently
+(polars releases the GIL). Every run reports per-stage and critical-path timings.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from ..expection import ConfigurationError
+from ..core.tracing import span
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable
+    deps: tuple = ()
+    # filled by a run, seconds since the start of the run
+    start: float | None = None
+    end: float | None = None
+    result: Any = field(default=None, repr=False)
+
+    @property
+    def duration(self) -> float | None:
+        return None if self.start is None or self.end is None else self.end - self.start
+
+
+class DAGScheduler:
+    """
+    Stages are added with their dependencies, func is called with the results
+    of its dependencies as positional arguments, in the order they are declared:
+
+        dag = DAGScheduler()
+        dag.add("load", pipeline.load)
+        dag.add("infer", lambda raw: pipeline.infer(data=raw), deps=["load"])
+        results = dag.run()
+
+    A failing stage stops the stages depending on it, the running ones are awaited
+    and the first error is raised again once the run is over.
+    """
+
+    def __init__(self, *, max_workers: int | None = None):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.stages: dict[str, Stage] = {}
+        self.wall_time = None
+
+    def add(self, name: str, func: Callable, *, deps=()) -> "DAGScheduler":
+        if name in self.stages:
+            raise ConfigurationError(f"Stage '{name}' is already declared")
+        self.stages[name] = Stage(name, func, tuple(deps))
+        return self
+
+    def _order(self) -> list[str]:
+        """Stages in a topological order, unknown dependencies and cycles are rejected"""
+        for stage in self.stages.values():
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise ConfigurationError(f"Stage '{stage.name}' depends on undeclared stages {unknown}")
+
+        order, state = [], {}
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ConfigurationError(f"Stage dependencies form a cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def run(self) -> dict[str, Any]:
+        """Run every stage, return their results by name"""
+        order = self._order()
+        pending = {name: set(self.stages[name].deps) for name in order}
+        done, failed = set(), {}
+        t0 = time.perf_counter()
+
+        def call(stage: Stage):
+            stage.start = time.perf_counter() - t0
+            try:
+                with span(f"stage.{stage.name}"):
+                    return stage.func(*(self.stages[dep].result for dep in stage.deps))
+            finally:
+                stage.end = time.perf_counter() - t0
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                for name in [n for n, deps in pending.items() if deps <= done]:
+                    del pending[name]
+                    running[pool.submit(call, self.stages[name])] = name
+
+                if not running:
+                    # what remains depends on a failed stage
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        self.stages[name].result = future.result()
+                        done.add(name)
+                    except Exception as e:
+                        logger.error("Stage %s failed: %s", name, e)
+                        failed[name] = e
+
+                if failed:
+                    # nothing new is started after a failure
+                    skipped = list(pending)
+                    pending = {}
+                    if skipped:
+                        logger.info("Skipping stages %s", skipped)
+
+        self.wall_time = time.perf_counter() - t0
+        logger.info("DAG run | stages=%d | wall=%.3fs", len(done), self.wall_time)
+        if failed:
+            raise next(iter(failed.values()))
+        return {name: self.stages[name].result for name in order}
+
+    def critical_path(self) -> list[str]:
+        """Chain of dependent stages with the largest total duration, the run can not be faster"""
+        finish, previous = {}, {}
+        for name in self._order():
+            stage = self.stages[name]
+            deps = [dep for dep in stage.deps if dep in finish]
+            best = max(deps, key=finish.get, default=None)
+            previous[name] = best
+            finish[name] = (stage.duration or 0.0) + (finish[best] if best else 0.0)
+
+        if not finish:
+            return []
+        path, name = [], max(finish, key=finish.get)
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1]
+
+    def timings(self) -> dict:
+        """Start, end and duration of every stage (seconds), the critical path and the wall time of the last run"""
+        path = self.critical_path()
+        return {
+            "wall_time": self.wall_time,
+            "critical_path": path,
+            "critical_path_time": sum(self.stages[name].duration or 0.0 for name in path),
+            "stages": {
+                name: {
+                    "start": stage.start,
+                    "end": stage.end,
+                    "duration": stage.duration,
+                    "deps": list(stage.deps),
+                    "critical": name in path,
+                }
+                for name, stage in self.stages.items()
+            },
+        }
@@ -60,6 +60,24 @@ class Selector:
                 f"{loader.__class__.__name__} does not support options: {sorted(invalid)}"
             )
         return loader.load(**options)
+
+    def _sample_file_mode(self, n_rows: int, **options) -> pl.DataFrame:
+        loader = registry.get_file_connector(self.file)
+        invalid = set(options) - set(loader.allowed_options)
+        if invalid:
+            raise ConfigurationError(
+                f"{loader.__class__.__name__} does not support options: {sorted(invalid)}"
+            )
+        return loader.sample(n_rows, **options)
+
+    def _scan_file_mode(self, **options) -> pl.LazyFrame:
+        loader = registry.get_file_connector(self.file)
+        invalid = set(options) - set(loader.allowed_options)
+        if invalid:
+            raise ConfigurationError(
+                f"{loader.__class__.__name__} does not support options: {sorted(invalid)}"
+            )
+        return loader.scan(**options)
     
 
     def get_data(self, **options) -> pl.DataFrame:
@@ -77,6 +95,39 @@ class Selector:
         )
     
     
+    def get_sample(self, n_rows: int, **options) -> pl.DataFrame:
+        """
+        Random rows of the source, read at the source when the connector supports it
+        (Parquet row groups, CSV byte ranges) instead of loading everything
+        """
+        if self.db_url:
+            table = options.get("table")
+            df = self._run_db_mode(table=table)
+            return df.sample(min(n_rows, df.height), seed=42)
+
+        if self.file:
+            return self._sample_file_mode(n_rows, **options)
+
+        raise ConfigurationError(
+            "You must provide either a file path or a database URL"
+        )
+
+    def get_lazy(self, **options) -> pl.LazyFrame:
+        """
+        The source as a pl.LazyFrame: files are scanned when the connector supports it,
+        databases tables are loaded
+        """
+        if self.db_url:
+            table = options.get("table")
+            return self._run_db_mode(table=table).lazy()
+
+        if self.file:
+            return self._scan_file_mode(**options)
+
+        raise ConfigurationError(
+            "You must provide either a file path or a database URL"
+        )
+
     # --- schema ---
     def _schema_db_mode(self, *, data: pl.DataFrame, schema_dir: str):
         inferer = SchemaInfererDB()
@@ -99,6 +150,6 @@ class Selector:
         )
     
     # --- downcast
-    def _get_downcaster(self, data: str):
-        downcaster = DownCaster()
-        return downcaster.optimize(df=data)
\ No newline at end of file
+    def _get_downcaster(self, data: str, schema: dict | None = None, encode_strings: bool = True):
+        downcaster = DownCaster(encode_strings=encode_strings)
+        return downcaster.optimize(df=data, schema=schema)
\ No newline at end of file
@@ -2,11 +2,27 @@
 High-level orchestration pipeline.
 """
 import polars as pl
+from dataclasses import dataclass, field
 from .orchestrator.selector import Selector
-from .core.decorator import measure_latency
+from .connectors.base_connector import BaseConnector
+from .custom_typing import DownCaster, SchemaInfererDB, SchemaInfererFlatFiles
+from .core.tracing import traced
+from .core.memory import peak_rss_mb
 from .expection import *
 import sys
 
+@dataclass
+class PipelineResult:
+    """Output of Pipeline.run: the downcasted frame, its schema and what the run cost in memory"""
+    data: pl.DataFrame
+    schema: dict
+    # columns narrowed by the downcaster, {col: {"from": ..., "to": ...}}
+    downcast: dict = field(default_factory=dict)
+    # peak_rss_mb: high-water mark of the whole process (every thread, every earlier run) at the end of the run,
+    # peak_rss_increase_mb: how much the run raised it, 0 when an earlier or concurrent run peaked higher,
+    # result_mb: estimated size of the frame
+    memory: dict = field(default_factory=dict)
+
 
 class Pipeline:
     """
@@ -43,16 +59,75 @@ class Pipeline:
         data, schema = selector.get_schema(data=data, schema_dir=schema_dir)
         return data, schema
     
-    def _get_downcaster(self, data: str):
+    def _get_downcaster(self, data: str, schema: dict | None = None, keep_encoding: bool = True):
         """Apply type downcasting to reduce memory usage"""
         selector = Selector(
             file=self.file,
             db_url=self.db_url,
         )
-        df = selector._get_downcaster(data=data)
+        df = selector._get_downcaster(data=data, schema=schema, encode_strings=keep_encoding)
         return df
 
-    @measure_latency
+    def _run_plan(self, *, schema_dir: str, keep_encoding: bool, batch_size: int, engine: str, **options) -> PipelineResult:
+        """Build load -> null normalization -> conversion -> downcast as one lazy query and collect it"""
+        selector = Selector(
+            file=self.file,
+            db_url=self.db_url,
+        )
+        lf = selector.get_lazy(**options)
+
+        if self.db_url:
+            # the table is already loaded and typed, only its schema report is built
+            _, schema = SchemaInfererDB().infer_schema(df=lf.collect(), schema_dir=schema_dir)
+        else:
+            # types are decided over a stream of batches, only the per-column counts are kept
+            inferer = SchemaInfererFlatFiles()
+            schema = inferer.infer_schema_from_batches(BaseConnector.collect_batches(lf, batch_size), schema_dir)
+            lf = inferer.apply_schema(lf, schema)
+
+        downcaster = DownCaster(encode_strings=keep_encoding)
+        lf = downcaster.optimize(lf, schema, engine=engine)
+        data = lf.collect(engine=engine)
+        return PipelineResult(data=data, schema=schema, downcast=downcaster.report)
+
+    @traced("pipeline.run")
+    def run(self, *, schema_dir: str = "schema", keep_encoding: bool = True, batch_size: int = 100_000,
+            engine: str = "streaming", raise_errors: bool = False, **options) -> PipelineResult:
+        """
+        load, infer and downcast fused in one lazy query: the source is scanned, null likes,
+        type conversions and casts are appended to the plan and the frame is materialized once,
+        no raw or typed intermediate copy is kept. The source is read once more to decide the
+        types (streamed batches) and once to plan the downcast (aggregates only).
+        raise_errors: raise the errors instead of exiting, for callers running many files
+        options: the load options, e.g. has_header for a CSV file or table for a database
+        """
+        # the mark is process-wide and not reset here, other runs may be measuring it
+        rss_before = peak_rss_mb()
+        try:
+            result = self._run_plan(schema_dir=schema_dir, keep_encoding=keep_encoding,
+                                    batch_size=batch_size, engine=engine, **options)
+        except ReportingException as e:
+            if raise_errors:
+                raise
+            print(f"[ERROR] {e}", file=sys.stderr)
+            sys.exit(1)
+        except Exception:
+            if raise_errors:
+                raise
+            import traceback
+            print("[FATAL] Unexpected error occurred", file=sys.stderr)
+            traceback.print_exc()
+            sys.exit(2)
+
+        peak = peak_rss_mb()
+        result.memory = {
+            "peak_rss_mb": peak,
+            "peak_rss_increase_mb": peak - rss_before if peak is not None and rss_before is not None else None,
+            "result_mb": result.data.estimated_size() / 1024**2,
+        }
+        return result
+
+    @traced("pipeline.load")
     def load(self, **options):
         """Public API to load data with error handling"""
         try:
@@ -66,7 +141,7 @@ class Pipeline:
             traceback.print_exc()
             sys.exit(2)
 
-    @measure_latency        
+    @traced("pipeline.infer")        
     def infer(self, **options):
         """Infer schema from an existing dataframe"""
         if "data" not in options.keys():
@@ -90,7 +165,7 @@ class Pipeline:
             traceback.print_exc()
             sys.exit(2)
 
-    @measure_latency
+    @traced("pipeline.downcast")
     def downcast(self, **options):
         """Downcast dataframe column types"""
         if "data" not in options.keys():
@@ -98,8 +173,12 @@ class Pipeline:
                 "The dataframe (data) must be provided"
             )
         data = options["data"]
+        # the schema distinct ratios decide which string columns get dictionary-encoded,
+        # keep_encoding=False hands plain strings to the profilers
+        schema = options.get("schema")
+        keep_encoding = options.get("keep_encoding", True)
         try:
-            return self._get_downcaster(data=data)
+            return self._get_downcaster(data=data, schema=schema, keep_encoding=keep_encoding)
         except ReportingException as e:
             print(f"[ERROR] {e}", file=sys.stderr)
             sys.exit(1)
@@ -1,36 +1,137 @@
 import os
+import numpy as np
+import pandas as pd
 import polars as pl
-import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
+from scipy.cluster.hierarchy import leaves_list, linkage
+from scipy.spatial.distance import squareform
+
+from ..core.stats import ColumnStats
+from ..core.tracing import traced
+from ..core.correlation import blocked_top_pairs, pearson_matrix, top_pairs
+from .DatasetProfile import DatasetProfile
+from .FigureRenderer import FigureRenderer, PlotSpec, draw_regression, rotate_xticks
+from ..core.plotdata import MAX_POINTS, regression_line, scatter_sample
 
 import logging
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
+def _draw_heatmap(fig, ax, *, corr_df, title, neutral_color):
+    mask = corr_df.isna()
+
+    sns.heatmap(corr_df,mask=mask, annot=corr_df.shape[0] <= 20,
+                 fmt=".2f", cmap=sns.diverging_palette(220, 20, as_cmap=True),
+    center=0, square=True, linewidths=0.7, linecolor=neutral_color,
+                 cbar_kws={"shrink": 0.8}, ax=ax
+    )
+    ax.set_title(title, fontsize=16, weight='bold')
+    rotate_xticks(ax, 45)
+
+
+def _draw_regression(fig, ax, *, points, line, x, y, title, scatter_kws, line_kws, neutral_color):
+    draw_regression(ax, points, line, scatter_kws=scatter_kws, line_kws=line_kws)
+    ax.set_title(title, fontsize=14, weight="bold")
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    ax.grid(alpha=0.25, linestyle="--", color=neutral_color)
+    sns.despine(ax=ax, left=True, bottom=True)
+
+
 class DataCorrelater:
 
-    def __init__(self, df: pl.DataFrame):
-        self.df = df
-        self.figures_dir = os.path.join('results', 'figures')
-        self.json_path = os.path.join('results', f"{datetime.now().strftime('%Y-%m-%d %H-%M-%S')}.json")
+    # above this many numeric columns the full matrices are not built (blocked mode)
+    WIDE_COLUMNS = 1000
+    # blocked mode: strongest pairs kept per method, columns shown on the clustered heatmap
+    MAX_PAIRS = 100
+    HEATMAP_COLUMNS = 40
+
+    def __init__(self, df: pl.DataFrame | DatasetProfile, stats: ColumnStats = None, *, blocked: bool | None = None, block_size: int = 512,
+                 renderer: FigureRenderer = None, max_points: int = MAX_POINTS, scatter_method: str = "stratified",
+                 output_dir: str = "results"):
+        """
+        blocked: search the strongest pairs tile by tile instead of building the full
+        correlation matrices, by default only above WIDE_COLUMNS numeric columns
+        block_size: columns per tile in blocked mode
+        renderer: renders the figures, shared with the other profilers to render them concurrently
+        (inline by default)
+        max_points, scatter_method: points drawn per scatter plot and how they are picked
+        ("stratified" or "binned", see core.plotdata.scatter_sample), the fitted line uses every row
+        output_dir: where the figures (output_dir/figures) and the json report are written
+        """
+        # the correlation matrices are memoized on the profile
+        self.profile = DatasetProfile.wrap(df, stats)
+        self.df = self.profile.df
+        self.stats = self.profile.stats
+        self.block_size = block_size
+        self._blocked = blocked
+        self._blocked_pairs = {}
+        self.renderer = renderer or FigureRenderer(max_workers=0)
+        self.max_points = max_points
+        self.scatter_method = scatter_method
+        self.output_dir = output_dir
+        self.figures_dir = os.path.join(output_dir, 'figures')
+        self.json_path = os.path.join(output_dir, f"{datetime.now().strftime('%Y-%m-%d %H-%M-%S')}.json")
 
         self.primary_color = "#2E4057"
         self.secondary_color = "#F5B041"
         self.neutral_color = "#B62B2B"
 
         os.makedirs(self.figures_dir, exist_ok=True)
-        os.makedirs('results', exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
 
-        logger.info("Correlater initialized | rows=%d | columns=%d",self.df.height,self.df.width,)
+        logger.info("Correlater initialized | rows=%d | columns=%d",self.profile.height,len(self.profile.schema),)
 
 
     def _numeric_columns(self):
-        return [
-            col for col, dt in zip(self.df.columns, self.df.dtypes)
-            if dt in (pl.Int8, pl.Int16, pl.Int32, pl.Int64, pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64, pl.Float32, pl.Float64)]
+        return self.profile.all_numeric_cols
+
+    def _varying_columns(self):
+        # constant (or single valued) columns have no correlation
+        cols = self._numeric_columns()
+        std = {col: self.stats[col]["std"] for col in cols}
+        # the std of a float column holding a NaN is NaN, it is recomputed without the NaN (like pandas)
+        with_nan = [col for col in cols if std[col] is not None and np.isnan(std[col])]
+        if with_nan:
+            std.update(self.profile.collect(self.df.select(pl.col(with_nan).fill_nan(None).std())).row(0, named=True))
+        return [col for col in cols if (std[col] or 0) > 0]
+
+    @property
+    def blocked(self) -> bool:
+        if self._blocked is None:
+            self._blocked = len(self._numeric_columns()) > self.WIDE_COLUMNS
+        return self._blocked
+
+    def _numeric_block(self, cols) -> np.ndarray:
+        """2D float64 array of some numeric columns, nulls as NaN"""
+        return self.profile.collect(self.df.select(pl.col(cols).cast(pl.Float64))).to_numpy()
+
+    def _pair_plot_data(self, col1, col2, ci=95):
+        """Capped scatter sample and regression line (fitted on every row) of a plotted pair"""
+        pair = self.profile.collect(self.df.select(col1, col2))
+        x = pair[col1].cast(pl.Float64).to_numpy()
+        y = pair[col2].cast(pl.Float64).to_numpy()
+        points = scatter_sample(x, y, max_points=self.max_points, method=self.scatter_method)
+        return {"points": points, "line": regression_line(x, y, ci=ci)}
+
+    def _pairs(self, method, top_n=None, min_abs=None):
+        """Strongest (col_a, col_b, value) pairs, from the full matrix or tile by tile in blocked mode"""
+        if not self.blocked:
+            return self._get_top_pairs(self.profile.correlation(method), top_n=top_n, min_abs=min_abs)
+
+        if method not in self._blocked_pairs:
+            cols = self._varying_columns()
+            pairs = blocked_top_pairs(
+                lambda start, stop: self._numeric_block(cols[start:stop]), len(cols),
+                k=self.MAX_PAIRS, block_size=self.block_size, method=method,
+            )
+            self._blocked_pairs[method] = [(cols[i], cols[j], v) for i, j, v in pairs]
+            logger.info("Blocked %s correlation | columns=%d | pairs kept=%d", method, len(cols), len(pairs))
 
+        pairs = [p for p in self._blocked_pairs[method] if min_abs is None or abs(p[2]) >= min_abs]
+        return pairs[:top_n] if top_n is not None else pairs
 
     def correlation_heatmap(self):
         ''''generate heatmap'''
@@ -38,45 +139,51 @@ class DataCorrelater:
         if not numeric_cols:
             logger.info("Skipping correlation heatmap: no numeric columns")
             return None, None
+        if self.blocked:
+            return self.clustered_heatmap()
 
-        df_np = self.df.select(numeric_cols).to_pandas()
-        df_np = df_np.loc[:, df_np.std(numeric_only=True) > 0]
-
-        corr_df = df_np.corr(method='pearson')
+        varying_cols = self._varying_columns()
+        corr_df = self.profile.correlation("pearson").loc[varying_cols, varying_cols]
         corr_df = corr_df.dropna(axis=0, how="all").dropna(axis=1, how="all")
+        return corr_df, self._plot_heatmap(corr_df, "Pearson Correlation Heatmap")
+
+    def clustered_heatmap(self):
+        """
+        Heatmap of the columns of the strongest pairs only (at most HEATMAP_COLUMNS),
+        ordered by hierarchical clustering on 1 - |r| so correlated groups sit together
+        """
+        cols = []
+        for a, b, _ in self._pairs("pearson"):
+            cols += [col for col in (a, b) if col not in cols]
+        cols = cols[:self.HEATMAP_COLUMNS]
+        if len(cols) < 2:
+            logger.info("Skipping clustered heatmap: no correlated pair")
+            return None, None
 
+        corr = pearson_matrix(self._numeric_block(cols))
+        distance = 1 - np.abs(np.nan_to_num(corr))
+        np.fill_diagonal(distance, 0)
+        order = leaves_list(linkage(squareform(distance, checks=False), method="average"))
+        ordered = [cols[i] for i in order]
+        corr_df = pd.DataFrame(corr[np.ix_(order, order)], index=ordered, columns=ordered)
 
-        with sns.axes_style("whitegrid"):
-
-            plt.figure(figsize=(14, 10))
-            mask = corr_df.isna()
-
-            sns.heatmap(corr_df,mask=mask, annot=corr_df.shape[0] <= 20,
-                         fmt=".2f", cmap=sns.diverging_palette(220, 20, as_cmap=True),
-    center=0, square=True, linewidths=0.7, linecolor=self.neutral_color,
-                         cbar_kws={"shrink": 0.8}
-            )
-            plt.title("Pearson Correlation Heatmap", fontsize=16, weight='bold')
-            plt.xticks(rotation=45, ha='right')
-            plt.tight_layout()
-
-            heatmap_path = os.path.join(self.figures_dir, "correlation_heatmap.png")
-            plt.savefig(heatmap_path, dpi=300)
-            plt.close()
+        title = f"Pearson Correlation Heatmap (top {len(cols)} of {len(self._numeric_columns())} columns, clustered)"
+        return corr_df, self._plot_heatmap(corr_df, title)
 
-        return corr_df, heatmap_path
+    def _plot_heatmap(self, corr_df, title):
+        spec = PlotSpec("correlation_heatmap", _draw_heatmap, figsize=(14, 10), params={
+            "corr_df": corr_df, "title": title, "neutral_color": self.neutral_color,
+        })
+        return self.renderer.submit(spec, self.figures_dir)
 
-    def _get_top_pairs(self, corr_df, top_n=5):
+    def _get_top_pairs(self, corr_df, top_n=5, min_abs=None):
+        """Strongest (col_a, col_b, value) pairs of a correlation matrix, each pair once"""
         if corr_df is None or corr_df.shape[0] < 2:
             logger.debug("No correlation matrix available for top pairs")
             return []
 
-        corr = corr_df.unstack()
-        corr = corr[corr.index.get_level_values(0) != corr.index.get_level_values(1)]
-        corr = corr.reindex(corr.abs().sort_values(ascending=False).index)
-
-        top = corr.head(top_n)
-        return [(a, b, float(v)) for (a, b), v in top.items()]
+        cols = corr_df.columns
+        return [(cols[i], cols[j], v) for i, j, v in top_pairs(corr_df.to_numpy(), k=top_n, min_abs=min_abs)]
 
 
     def plot_top_correlations(self, threshold=0.8, top_n=5):
@@ -85,38 +192,26 @@ class DataCorrelater:
             logger.info("Skipping correlation plots: no numeric columns")
             return []
 
-        df_numeric = self.df.select(numeric_cols).to_pandas()
-        corr = df_numeric.corr().unstack()
-        corr = corr[corr.index.get_level_values(0) != corr.index.get_level_values(1)]
-        corr = corr.reindex(corr.abs().sort_values(ascending=False).index)
-        corr = corr[~corr.index.map(lambda x: x[0] > x[1])]
-
-        strong_pairs = corr[abs(corr) > threshold].drop_duplicates().head(top_n)
+        # pairs above the threshold, one plot per distinct correlation value
+        strong_pairs, seen = [], set()
+        for a, b, value in self._pairs("pearson", min_abs=threshold):
+            if abs(value) <= threshold or value in seen:
+                continue
+            seen.add(value)
+            strong_pairs.append((min(a, b), max(a, b), value))
+            if len(strong_pairs) == top_n:
+                break
 
         results = []
-        for (col1, col2), value in strong_pairs.items():
-            fig, ax = plt.subplots(figsize=(7, 4))
-
-            with sns.axes_style("whitegrid"):
-
-                sns.regplot(
-                    x=col1, y=col2, data=df_numeric, ax=ax,
-                      scatter_kws={"s": 36, "alpha": 0.6,'facecolor':self.neutral_color,'edgecolor':'white','linewidths':0.6,},
-                    line_kws={"linewidth": 2.2, "alpha": 0.9, "color": self.primary_color})
-                ax.set_title(f"{col1} vs {col2}  |  r = {value:.2f}", fontsize=14, weight="bold")
-                ax.set_xlabel(col1)
-                ax.set_ylabel(col2)
-                fig.tight_layout()
-                ax.grid(alpha=0.25, linestyle="--", color=self.neutral_color)
-                sns.despine(left=True, bottom=True)
-
-                path = os.path.join(self.figures_dir, f"corr_{col1}_{col2}.png")
-                try:
-                    plt.savefig(path, dpi=300)
-                except Exception as e:
-                    logger.exception("Failed to save correlation plot %s: %s", path, e)
-                finally:
-                    plt.close(fig)
+        for col1, col2, value in strong_pairs:
+            spec = PlotSpec(f"corr_{col1}_{col2}", _draw_regression, figsize=(7, 4), params={
+                **self._pair_plot_data(col1, col2, ci=95), "x": col1, "y": col2,
+                "title": f"{col1} vs {col2}  |  r = {value:.2f}",
+                "scatter_kws": {"s": 36, "alpha": 0.6,'facecolor':self.neutral_color,'edgecolor':'white','linewidths':0.6,},
+                "line_kws": {"linewidth": 2.2, "alpha": 0.9, "color": self.primary_color},
+                "neutral_color": self.neutral_color,
+            })
+            self.renderer.submit(spec, self.figures_dir)
 
             results.append({"col1": col1, "col2": col2, "correlation": round(float(value), 2)})
         return results
@@ -127,64 +222,40 @@ class DataCorrelater:
             logger.info("Skipping Spearman correlation: no numeric columns")
             return None
 
-        df = self.df.select(numeric_cols).to_pandas()
-        spear_corr = df.corr(method='spearman')
-
-        # Convert to list of non duplicate pairs
-        pairs = []
-        for i, a in enumerate(spear_corr.columns):
-            for j, b in enumerate(spear_corr.columns):
-                if j <= i:
-                    continue
-                val = float(spear_corr.loc[a, b])
-                pairs.append((a, b, val))
-
-        # Sort by absolute Spearman correlation
-        pairs = sorted(pairs, key=lambda x: abs(x[2]), reverse=True)
+        # non duplicate pairs above the threshold, strongest Spearman correlation first
+        pairs = self._pairs("spearman", min_abs=threshold)
 
         # Remove pairs already plotted by Pearson
         pearson_set = {(a, b) for (a, b, _) in pearson_pairs}
         pearson_set |= {(b, a) for (a, b, _) in pearson_pairs}
 
         for a, b, spear_val in pairs:
-            if abs(spear_val) < threshold:
-                return None
             if (a, b) not in pearson_set:
                 break
         else:
             return None
         
-        if df[a].nunique() < 2 or df[b].nunique() < 2:
+        if self.stats[a]["distinct_count"] < 2 or self.stats[b]["distinct_count"] < 2:
             logger.info("Skipping Spearman plot: constant column detected (%s, %s)", a, b)
             return None
 
 
         # Plot it
-        with sns.axes_style("whitegrid"):
-
-            fig, ax = plt.subplots(figsize=(7, 4))
-            sns.regplot(
-                x=a, y=b, data=df, ax=ax,ci=None,
-                scatter_kws={"s": 35, "alpha": 0.7, "facecolor": self.primary_color,
+        spec = PlotSpec(f"spearman_{a}_{b}", _draw_regression, figsize=(7, 4), params={
+            **self._pair_plot_data(a, b, ci=None), "x": a, "y": b,
+            "title": f"Spearman: {a} vs {b} | ρ = {spear_val:.2f}",
+            "scatter_kws": {"s": 35, "alpha": 0.7, "facecolor": self.primary_color,
                             "edgecolor": "white",
                             "linewidths": 0.6,},
-                line_kws={"linewidth": 2.2, "alpha": 0.8, "color": self.neutral_color}
-            )
-            ax.set_title(f"Spearman: {a} vs {b} | ρ = {spear_val:.2f}", fontsize=14, weight="bold")
-            ax.set_xlabel(a)
-            ax.set_ylabel(b)
-            fig.tight_layout()
-
-            path = os.path.join(self.figures_dir, f"spearman_{a}_{b}.png")
-            ax.grid(alpha=0.25, linestyle="--", color=self.neutral_color)
-            sns.despine(left=True, bottom=True)
-
-            plt.savefig(path, dpi=300)
-            plt.close()
+            "line_kws": {"linewidth": 2.2, "alpha": 0.8, "color": self.neutral_color},
+            "neutral_color": self.neutral_color,
+        })
+        self.renderer.submit(spec, self.figures_dir)
 
         return {"x_column": a, "y_column": b,"spearman": round(spear_val, 2),}
 
 
+    @traced("profiling.correlations", measure=lambda self, *a, **k: self.profile)
     def run(self, threshold=0.8, top_n=5):
         logger.info("Starting correlation analysis")
         corr_df, heatmap_path = self.correlation_heatmap()
@@ -194,7 +265,7 @@ class DataCorrelater:
             pearson_pairs = []
         else:
 
-            pearson_pairs = self._get_top_pairs(corr_df, top_n=2)
+            pearson_pairs = self._pairs("pearson", top_n=2)
 
         # Generate Pearson scattes
         _ = self.plot_top_correlations(threshold=threshold, top_n=top_n)
@@ -3,7 +3,12 @@ import os
 from math import floor
 import warnings
 import json
-from datetime import datetime, date
+from typing import Iterable
+
+from ..core.stats import ColumnStats
+from ..core.tracing import traced
+from ..core.sketches import ReservoirSample
+from .DatasetProfile import DatasetProfile
 
 import logging
 
@@ -13,57 +18,79 @@ logger.addHandler(logging.NullHandler())
 warnings.filterwarnings("ignore")
 
 class DataSampler:
-    def __init__(self, *, df: pl.DataFrame, max_rows: int = 3, sample_dir: str = None):
+    SEED = 42
+
+    def __init__(self, *, df: pl.DataFrame | pl.LazyFrame | DatasetProfile, max_rows: int = 3, sample_dir: str = None, stats: ColumnStats = None):
         if sample_dir is None:
             raise ValueError("You must provide an sample_dir")
-        self.df = df
+        self.profile = DatasetProfile.wrap(df, stats)
+        self.df = self.profile.df
+        self.height = self.profile.height
         self.max_rows = max_rows
         self.sample_dir = sample_dir
-        self.frac = min(1.0, max_rows / df.height)
+        self.frac = min(1.0, max_rows / self.height) if self.height else 1.0
 
         # Ensure parent folder exists
         folder = os.path.dirname(self.sample_dir)
         if folder:
             os.makedirs(folder, exist_ok=True)
 
+    @property
+    def stats(self) -> ColumnStats:
+        """Column statistics, only computed when a strategy needs them"""
+        return self.profile.stats
+
     def no_sample(self):
         '''avoid sampling if the data is already small'''
 
-        if self.df.height <= self.max_rows:
+        if self.height <= self.max_rows:
             logger.info("No sampling applied due to small dataset: rows=%d <= max_rows=%d",
-            self.df.height,self.max_rows,)
-            return self.df
+            self.height,self.max_rows,)
+            return self.profile.collect(self.df)
         return None
 
     def systematic_sample(self):
         '''apply systematic sampling if there's any time related column'''
 
-        datetime_cols = [col for col, dtype in zip(self.df.columns, self.df.dtypes) if isinstance(dtype, (pl.Datetime, pl.Date))
+        datetime_cols = [col for col, dtype in self.profile.schema.items() if isinstance(dtype, (pl.Datetime, pl.Date))
         ]
         if datetime_cols:
-            step = max(1, self.df.height // self.max_rows)
-            return self.df.gather_every(step)
+            step = max(1, self.height // self.max_rows)
+            if not self.profile.is_lazy:
+                return self.df.gather_every(step)
+            # gather_every is not streamed, the row index is
+            every = self.df.with_row_index("__row").filter(pl.col("__row") % step == 0).drop("__row")
+            return self.profile.collect(every)
         return None
 
     def stratified_sample(self):
         '''apply stratified sampling if there's categorical column'''
 
-        categorical_cols = [col for col in self.df.columns if self.df[col].dtype == pl.Utf8 or self.df[col].n_unique() < 20]
-        categorical_cols = sorted(categorical_cols, key=lambda c: self.df[c].n_unique())
+        # the stratum column is chosen from the precomputed cardinalities (null included)
+        n_unique = {col: self.stats[col]["n_unique"] for col in self.profile.schema}
+        categorical_cols = [col for col, dtype in self.profile.schema.items() if dtype in (pl.Utf8, pl.Categorical, pl.Enum) or n_unique[col] < 20]
+        categorical_cols = sorted(categorical_cols, key=lambda c: n_unique[c])
 
         for col in categorical_cols:
-            unique_vals = self.df[col].unique().to_list()
-            per_group = max(1, floor(self.max_rows / len(unique_vals)))
-            sampled_groups = []
-
-            for value in unique_vals:
-                group = self.df.filter((pl.col(col).is_not_null()) & (pl.col(col) == value))
-                n = min(per_group, group.height)
-                if n > 0:
-                    sampled_groups.append(group.sample(n=n, seed=42))
-
-            if sampled_groups:
-                return pl.concat(sampled_groups).head(self.max_rows)
+            if self.stats[col]["null_count"] == self.height:
+                continue
+            per_group = max(1, floor(self.max_rows / n_unique[col]))
+
+            # one pass: rows are ranked by a seeded hash of their index (a shuffle), the indices
+            # of the per_group first rows of every stratum are kept and only those rows gathered
+            rows = self.profile.collect(
+                self.df.lazy()
+                .with_row_index("__row")
+                .filter(pl.col(col).is_not_null())
+                .group_by(col)
+                .agg(pl.col("__row").bottom_k_by(pl.col("__row").hash(self.SEED), per_group))
+                .select(pl.col("__row").explode())
+            )["__row"].sort().head(self.max_rows)
+
+            if not self.profile.is_lazy:
+                return self.df[rows]
+            picked = self.df.with_row_index("__row").filter(pl.col("__row").is_in(rows.implode())).drop("__row")
+            return self.profile.collect(picked)
 
         return None
 
@@ -71,22 +98,49 @@ class DataSampler:
     def random_sample(self):
         '''apply sample random sampling when each row have the same proba to be present the the sample'''
 
-        n = min(self.max_rows, self.df.height)
-        return self.df.sample(n=n, seed=42)
+        n = min(self.max_rows, self.height)
+        if self.profile.is_lazy:
+            return self.reservoir_sample(self.df, n, engine=self.profile.engine)
+        return self.df.sample(n=n, seed=self.SEED)
+
+    @classmethod
+    def reservoir_sample(cls, source: pl.LazyFrame | Iterable[pl.DataFrame], n: int, *,
+                         batch_size: int = 100_000, engine: str = "streaming") -> pl.DataFrame:
+        """
+        Uniform sample of n rows in one pass with bounded memory, over a LazyFrame
+        (collected batch by batch) or any iterable of batches (e.g. connector.iter_batches())
+        """
+        if isinstance(source, pl.LazyFrame):
+            source = source.collect_batches(chunk_size=batch_size, engine=engine)
+        reservoir = ReservoirSample(n, seed=cls.SEED)
+        for batch in source:
+            reservoir.update(batch)
+        return reservoir.sample if reservoir.sample is not None else pl.DataFrame()
     
-    def _json_safe(self, rows):
-        safe_rows = []
-        for row in rows:
-            safe_row = {}
-            for k, v in row.items():
-                if isinstance(v, (datetime, date)):
-                    safe_row[k] = v.isoformat()
-                else:
-                    safe_row[k] = v
-            safe_rows.append(safe_row)
-        return safe_rows
-
-
+    def _to_json(self, sample: pl.DataFrame) -> str:
+        """Serialize the sample rows as a json array, dates and datetimes as ISO 8601 strings"""
+        iso = []
+        for col, dtype in sample.schema.items():
+            if isinstance(dtype, pl.Datetime):
+                tz = "%:z" if dtype.time_zone is not None else ""
+                # same output as datetime.isoformat(): microseconds only when non zero
+                iso.append(
+                    pl.when(pl.col(col).dt.microsecond() == 0)
+                    .then(pl.col(col).dt.strftime("%Y-%m-%dT%H:%M:%S" + tz))
+                    .otherwise(pl.col(col).dt.strftime("%Y-%m-%dT%H:%M:%S%.6f" + tz))
+                    .alias(col)
+                )
+            elif dtype == pl.Date:
+                iso.append(pl.col(col).dt.strftime("%Y-%m-%d").alias(col))
+        if iso:
+            sample = sample.with_columns(iso)
+        return sample.write_json()
+
+    def _json_safe(self, sample: pl.DataFrame):
+        return json.loads(self._to_json(sample))
+
+
+    @traced("profiling.sample", measure=lambda self, *a, **k: self.profile)
     def run_sample(self):
         for strategy in [
             self.no_sample, self.systematic_sample, self.stratified_sample, self.random_sample]:
@@ -95,11 +149,11 @@ class DataSampler:
                 logger.info("Sampling strategy used: %s | rows=%d",strategy.__name__,sample.height,)
             
                 # make json serializable
-                sample_json = self._json_safe(sample.to_dicts())
+                payload = self._to_json(sample)
 
                 with open(f"{self.sample_dir}/sample.json", "w") as f:
-                    json.dump(sample_json, f, separators=(",", ":"))
-                return sample_json
+                    f.write(payload)
+                return json.loads(payload)
             
         logger.error("No sampling strategy produced a valid sample")
 
@@ -1,38 +1,111 @@
 import os
 import json
 import polars as pl
-import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 
-
-from sklearn.metrics import mutual_info_score
+from ..core.stats import ColumnStats
+from ..core.tracing import traced
+from .DatasetProfile import DatasetProfile
+from .MutualInfoEngine import MutualInfoEngine
+from ..core.sketches import HyperLogLog
+from .SketchSummarizer import SketchSummarizer
+from .FigureRenderer import FigureRenderer, PlotSpec, draw_boxes, draw_histogram, rotate_xticks
+from ..core.plotdata import box_stats, histogram
 
 import logging
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
+def _draw_outliers(fig, ax, *, cols, counts, primary_color, neutral_color):
+    bars = ax.bar(cols,counts,color=primary_color,edgecolor="white",linewidth=1.2,alpha=0.9)
+
+    ax.set_title(
+        "Outlier Count per Column",
+        fontsize=16,
+        fontweight="bold",
+        color=primary_color
+    )
+    ax.set_xlabel("Columns", fontsize=13)
+    ax.set_ylabel("Outlier Count", fontsize=13)
+
+    ax.grid(axis="y", alpha=0.25, linestyle="--", color=neutral_color)
+    rotate_xticks(ax, 45)
+
+    # value labels
+    max_count = max(counts)
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(
+            bar.get_x() + bar.get_width() / 2,
+            height + max_count * 0.02,
+            f"{int(height)}",
+            ha="center",
+            fontsize=11,
+            fontweight="bold",
+            color=primary_color
+        )
+
+    sns.despine(ax=ax, left=True, bottom=True)
+
+
+def _draw_extreme_column(fig, axs, *, box, hist, column, log_scale, primary_color, neutral_color):
+    draw_boxes(axs[0], [box], color=primary_color, width=0.5, linewidth=2, fliersize=3, orientation="horizontal")
+    axs[0].set_yticks([])
+    axs[0].set_title(
+        f"{'Log-transformed' if log_scale else 'Column'}: {column} (Boxplot)",
+        fontsize=14,fontweight='bold',color = primary_color
+    )
+    axs[0].grid(alpha=0.25, linestyle="--", color=neutral_color)
+    sns.despine(ax=axs[0], left=True, bottom=True)
+
+    draw_histogram(axs[1], hist, color=primary_color, alpha=0.65, edgecolor="white",
+                   line_kws={"color": primary_color})
+
+    axs[1].set_title(
+    f"{'Log-transformed' if log_scale else 'Column'}: {column} (Histogram)",
+    fontsize=15,
+    fontweight="bold",
+    color=primary_color
+)
+
+    axs[1].set_xlabel(column, fontsize=13)
+    axs[1].set_ylabel("Frequency", fontsize=13)
+
+    axs[1].grid(alpha=0.25, linestyle="--", color=neutral_color)
+    sns.despine(ax=axs[1], left=True, bottom=True)
+
 
 class DataSummarizer:
-    def __init__(self, *, df: pl.DataFrame, summary_dir: str, figures_dir=None, verbose=False):
+    # rows sampled from a LazyFrame for the figures and the mutual information
+    SAMPLE_ROWS = 100_000
+    # exact duplicate count of a LazyFrame: row hashes grouped per pass, the rows are split in hash partitions
+    HASHES_PER_PASS = 2_000_000
+
+    def __init__(self, *, df: pl.DataFrame | pl.LazyFrame | DatasetProfile, summary_dir: str, figures_dir=None, verbose=False, stats: ColumnStats = None,
+                 renderer: FigureRenderer = None):
+        """
+        df: a pl.LazyFrame (e.g. pl.scan_parquet) is profiled out-of-core, every aggregate
+        runs on the polars streaming engine and only stats and samples are materialized
+        renderer: renders the figures, shared with the other profilers to render them concurrently
+        (inline by default)
+        """
 
-        self.index_cols = set(self._detect_index_columns(df))
+        # profiling context shared with the other profilers, derived facts are computed once
+        self.profile = DatasetProfile.wrap(df, stats)
+        self.stats = self.profile.stats
+        self.index_cols = set(self.profile.index_cols)
         if self.index_cols:
             logger.info("Detected index columns and excluded from analysis: %s", sorted(self.index_cols))
-        
-        # extract num and cat cols
-        numeric_cols = [col for col, dt in zip(df.columns, df.dtypes) if dt in (
-                pl.Int8, pl.Int16, pl.Int32, pl.Int64,pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64,pl.Float32, pl.Float64) and col not in self.index_cols]
 
-        categorical_cols = [col for col, dt in zip(df.columns, df.dtypes) if (dt == pl.Utf8 or dt == pl.Boolean) and col not in self.index_cols]
-
-        self.df = df
-        self.numeric_cols = numeric_cols
-        self.categorical_cols = categorical_cols
+        self.df = self.profile.df
+        self.numeric_cols = self.profile.numeric_cols
+        self.categorical_cols = self.profile.categorical_cols
         self.summary_dir = summary_dir
         self.figures_dir = figures_dir if figures_dir and os.path.isabs(figures_dir) else os.path.join(self.summary_dir, figures_dir or "figures")
         self.verbose = verbose
+        self.renderer = renderer or FigureRenderer(max_workers=0)
 
         self.primary_color = "#2E4057"
         self.secondary_color = "#F5B041"
@@ -42,17 +115,44 @@ class DataSummarizer:
         os.makedirs(self.figures_dir, exist_ok=True)
 
 
-    def summary(self, analyze_outliers=True, analyze_skew=True, detect_constants=True):
-        '''extracting high level statistics'''
-
-        n_rows, n_cols = self.df.shape
-        summary_info = { "num_rows": n_rows, "num_columns": n_cols, "duplicated_rows": int(self.df.height - self.df.unique().height),}
+    @staticmethod
+    def summary_from_batches(batches, *, summary_dir: str, verbose=False, **sketch_options):
+        '''
+        Approximate summary of a stream of pl.DataFrame batches (e.g. connector.iter_batches()),
+        one pass with bounded memory, see SketchSummarizer for the options and error bounds
+        '''
+        summarizer = SketchSummarizer(summary_dir=summary_dir, verbose=verbose, **sketch_options)
+        return summarizer.update_many(batches).summary()
+
+    def _collect(self, query) -> pl.DataFrame:
+        return self.profile.collect(query)
+
+    def _sample(self, columns: list[str]) -> pl.DataFrame:
+        """The columns in memory, every k-th row only (at most SAMPLE_ROWS) for a LazyFrame"""
+        if not self.profile.is_lazy:
+            return self.df.select(columns)
+        step = max(1, -(-self.stats.height // self.SAMPLE_ROWS))
+        query = self.df.select(columns).with_row_index("__row").filter(pl.col("__row") % step == 0)
+        return self._collect(query.drop("__row"))
+
+    @traced("profiling.summary", measure=lambda self, *a, **k: self.profile)
+    def summary(self, analyze_outliers=True, analyze_skew=True, detect_constants=True, approximate_duplicates=None):
+        '''
+        extracting high level statistics
+        approximate_duplicates: estimate the duplicated rows, by default only for a LazyFrame
+        '''
+        if approximate_duplicates is None:
+            approximate_duplicates = self.profile.is_lazy
+
+        n_rows, n_cols = self.stats.height, len(self.profile.schema)
+        summary_info = { "num_rows": n_rows, "num_columns": n_cols, "duplicated_rows": self.count_duplicate_rows(approximate=approximate_duplicates),}
+        if approximate_duplicates:
+            summary_info["duplicated_rows_approximate"] = True
 
         # Missing values
-        nulls_df = self.df.null_count()
         summary_info["missing"] = {}
-        for col in self.df.columns:
-            missing_count = int(nulls_df[col][0]) if col in nulls_df.columns else 0
+        for col in self.profile.schema:
+            missing_count = int(self.stats.get(col, "null_count", 0))
             summary_info["missing"][col] = {"missing_count": missing_count, "missing_pct": round((missing_count / n_rows) * 100, 4), }
 
         # Outliers
@@ -63,11 +163,10 @@ class DataSummarizer:
 
         # Skew nd stats
         if analyze_skew and self.numeric_cols:
-            numeric_df = self.df.select(self.numeric_cols)
-            stats = self.describe_numeric(numeric_df)
+            stats = self.describe_numeric(self.df.select(self.numeric_cols))
             rounded_stats = {col: {s: round(v, 2) if isinstance(v, (int, float)) else v for s, v in col_stats.items()} for col, col_stats in stats.items()}
             summary_info["statistical_summary"] = rounded_stats
-            self.plot_most_extreme_column(numeric_df)
+            self.plot_most_extreme_column(self._sample(self.numeric_cols))
 
         # Constant columns
         if detect_constants:
@@ -86,42 +185,78 @@ class DataSummarizer:
 
         return summary_info
     
-    def _detect_index_columns(self, df):
-        index_cols = []
-
-        for col in df.columns:
-            s = df[col]
-
-            if s.n_unique() != df.height:
-                continue
-
-            if s.dtype in pl.INTEGER_DTYPES:
-                if (s.diff().drop_nulls() == 1).all():
-                    index_cols.append(col)
-                    continue
-
-            if col.lower() in {"id", "index", "idx", "row_id", "rowid"}:
-                index_cols.append(col)
+    def count_duplicate_rows(self, approximate=False):
+        '''
+        Count the rows equal to a previous row.
+        Rows are hashed with hash_rows, only the rows whose hash collides are compared exactly.
+        approximate: estimate the distinct rows with a HyperLogLog sketch of the row hashes
+        instead (no row comparison, bounded memory)
+        '''
+        n_rows = self.stats.height
+        if n_rows == 0:
+            return 0
+
+        if self.profile.is_lazy:
+            return self._count_duplicate_rows_lazy(n_rows, approximate)
+
+        if approximate:
+            # the error is relative to the distinct count, hence the high precision (~0.2%)
+            distinct = HyperLogLog(precision=18).update_rows(self.df).count()
+            return max(0, int(round(n_rows - distinct)))
+
+        colliding = self.df.hash_rows().is_duplicated()
+        if not colliding.any():
+            return 0
+
+        candidates = self.df.filter(colliding)
+        return int(candidates.height - candidates.unique().height)
+
+    def _count_duplicate_rows_lazy(self, n_rows: int, approximate: bool) -> int:
+        """
+        Streaming version of count_duplicate_rows, only hashes or colliding rows are materialized.
+        Exact mode groups the hashes of one partition (hash % passes) at a time, each pass holds at
+        most about HASHES_PER_PASS hashes and rescans the source
+        """
+        row_hash = pl.struct(pl.all()).hash(HyperLogLog.HASH_SEED)
+        if approximate:
+            sketch = HyperLogLog(precision=18)
+            for batch in self.df.select(row_hash).collect_batches(engine=self.profile.engine):
+                sketch.update_hashes(batch.to_series().to_numpy())
+            return max(0, int(round(n_rows - sketch.count())))
+
+        passes = max(1, -(-n_rows // self.HASHES_PER_PASS))
+        duplicates = 0
+        for part in range(passes):
+            # equal rows have equal hashes, they always fall in the same partition
+            colliding = self._collect(
+                self.df.filter(row_hash % passes == part)
+                .group_by(row_hash.alias("__hash")).len().filter(pl.col("len") > 1).select("__hash")
+            )
+            if colliding.is_empty():
                 continue
-
-        return index_cols
-
+            candidates = self._collect(self.df.filter(row_hash.is_in(colliding["__hash"].implode())))
+            duplicates += candidates.height - candidates.unique().height
+        return int(duplicates)
 
     def detect_outliers(self):
         '''detecting outliers'''
         outlier_counts = {}
+        exprs = []
         for col in self.numeric_cols:
-            series = self.df[col].drop_nulls()
-            if series.is_empty():
+            q1, q3 = self.stats[col]["25%"], self.stats[col]["75%"]
+            if q1 is None or q3 is None:
                 outlier_counts[col] = 0
                 continue
 
-            q1 = float(series.quantile(0.25))
-            q3 = float(series.quantile(0.75))
             iqr = q3 - q1
             lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
-            outlier_counts[col] = int(((series < lower) | (series > upper)).sum())
-        return outlier_counts
+            exprs.append(((pl.col(col) < lower) | (pl.col(col) > upper)).sum().alias(col))
+
+        # all the bounds are checked in a single pass
+        if exprs:
+            counts = self._collect(self.df.select(exprs)).row(0, named=True)
+            outlier_counts.update({col: int(count) for col, count in counts.items()})
+        return {col: outlier_counts[col] for col in self.numeric_cols}
 
     def plot_outliers(self, outlier_counts):
         """Plot outlier counts per numeric column (descending, branded)."""
@@ -134,60 +269,15 @@ class DataSummarizer:
         cols, counts = zip(
             *sorted(outlier_counts.items(), key=lambda x: x[1], reverse=True))
 
-        with sns.axes_style("whitegrid"):
-            fig, ax = plt.subplots(figsize=(10, 6))
-
-            bars = ax.bar(cols,counts,color=self.primary_color,edgecolor="white",linewidth=1.2,alpha=0.9)
-
-            ax.set_title(
-                "Outlier Count per Column",
-                fontsize=16,
-                fontweight="bold",
-                color=self.primary_color
-            )
-            ax.set_xlabel("Columns", fontsize=13)
-            ax.set_ylabel("Outlier Count", fontsize=13)
+        spec = PlotSpec("outliers_per_column", _draw_outliers, figsize=(10, 6), params={
+            "cols": list(cols), "counts": list(counts),
+            "primary_color": self.primary_color, "neutral_color": self.neutral_color,
+        })
+        return self.renderer.submit(spec, self.figures_dir)
 
-            ax.grid(axis="y", alpha=0.25, linestyle="--", color=self.neutral_color)
-            plt.xticks(rotation=45, ha="right")
 
-            # value labels
-            max_count = max(counts)
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(
-                    bar.get_x() + bar.get_width() / 2,
-                    height + max_count * 0.02,
-                    f"{int(height)}",
-                    ha="center",
-                    fontsize=11,
-                    fontweight="bold",
-                    color=self.primary_color
-                )
-
-            sns.despine(left=True, bottom=True)
-            fig.tight_layout()
-
-            path = os.path.join(self.figures_dir, "outliers_per_column.png")
-            plt.savefig(path, dpi=300)
-            plt.close(fig)
-
-        return path
-
-
-    def describe_numeric(self, numeric_df: pl.DataFrame):
-        desc = numeric_df.describe()
-        summary_dict = {}
-
-        for col in numeric_df.columns:
-            col_stats = {}
-            for row in desc.rows():
-                stat_name = row[0]
-                stat_value = row[desc.columns.index(col)]
-                col_stats[stat_name] = float(stat_value) if stat_value is not None else None
-            summary_dict[col] = col_stats
-
-        return summary_dict
+    def describe_numeric(self, numeric_df: pl.DataFrame | pl.LazyFrame):
+        return {col: self.stats.describe(col) for col in numeric_df.collect_schema().names()}
 
     def plot_most_extreme_column(self, numeric_df: pl.DataFrame):
         """Plot the most extreme numeric column based on skewness and kurtosis."""
@@ -195,18 +285,12 @@ class DataSummarizer:
         skew_kurt = {}
 
         for col in numeric_df.columns:
-            series = numeric_df[col].drop_nulls()
-            if series.is_empty():
-                continue                                            
-            try:
-                skew = float(series.skew())
-            except Exception:
-                skew = 0.0
-
-            try:
-                kurt = float(series.kurtosis())
-            except Exception:
-                kurt = 0.0
+            if self.stats[col]["count"] == 0:
+                continue
+            skew = self.stats[col].get("skew")
+            kurt = self.stats[col].get("kurtosis")
+            skew = float(skew) if skew is not None else 0.0
+            kurt = float(kurt) if kurt is not None else 0.0
 
             if np.isnan(skew) or np.isnan(kurt):
                 continue
@@ -232,15 +316,8 @@ class DataSummarizer:
         if data.size == 0 or np.all(np.isnan(data)):
             return None
 
-        try:
-            skew_val = float(series.skew())
-        except Exception:
-            skew_val = 0.0
-
-        try:
-            kurt_val = float(series.kurtosis())
-        except Exception:
-            kurt_val = 0.0
+        skew_val = float(self.stats[extreme_col].get("skew") or 0.0)
+        kurt_val = float(self.stats[extreme_col].get("kurtosis") or 0.0)
 
         log_scale = False
         if (abs(skew_val) > 1 or abs(kurt_val) > 5) and np.nanmin(data) >= 0:
@@ -250,60 +327,23 @@ class DataSummarizer:
             except Exception:
                 pass  
 
-        fig, axs = plt.subplots(1, 2, figsize=(12, 6))
-
-        sns.boxplot(x=data, ax=axs[0], width=0.5, linewidth=2,fliersize=3,color=self.primary_color)
-        axs[0].set_title(
-            f"{'Log-transformed' if log_scale else 'Column'}: {extreme_col} (Boxplot)",
-            fontsize=14,fontweight='bold',color = self.primary_color
-        )
-        axs[0].grid(alpha=0.25, linestyle="--", color=self.neutral_color)
-        sns.despine(ax=axs[0], left=True, bottom=True)
-
-        sns.histplot(
-        data,
-        bins=25,
-        kde=True,
-        color=self.primary_color,
-        alpha=0.65,
-        edgecolor="white",
-        
-        ax=axs[1],
-        
-        line_kws={"color": self.primary_color})
-
-        axs[1].set_title(
-        f"{'Log-transformed' if log_scale else 'Column'}: {extreme_col} (Histogram)",
-        fontsize=15,
-        fontweight="bold",
-        color=self.primary_color
-    )
-
-        axs[1].set_xlabel(extreme_col, fontsize=13)
-        axs[1].set_ylabel("Frequency", fontsize=13)
-
-        axs[1].grid(alpha=0.25, linestyle="--", color=self.neutral_color)
-        sns.despine(ax=axs[1], left=True, bottom=True)
-
-        plt.tight_layout()
-
-        path = os.path.join(self.figures_dir, "most_extreme_column.png")
-        try:
-            plt.savefig(path, dpi=300)
-        finally:
-            plt.close(fig)
+        spec = PlotSpec("most_extreme_column", _draw_extreme_column, figsize=(12, 6), ncols=2, params={
+            "box": box_stats(data), "hist": histogram(data, bins=25), "column": extreme_col, "log_scale": log_scale,
+            "primary_color": self.primary_color, "neutral_color": self.neutral_color,
+        })
+        return self.renderer.submit(spec, self.figures_dir)
 
     def detect_constants(self):
         '''highlighting constant columns'''
         constant_cols = {}
-        n = self.df.height
+        n = self.stats.height
 
-        for col in self.df.columns:
-            vc = self.df[col].value_counts()
-            if vc.is_empty():
+        for col in self.profile.schema:
+            top = self.stats[col]["top"]
+            if not top:
                 continue
 
-            top_count = vc["count"].max()
+            top_count = top[0][1]
             top_freq = top_count / n
             if top_freq >= 0.8:
                 constant_cols[col] = round(float(top_freq), 3)
@@ -317,79 +357,37 @@ class DataSummarizer:
         unique_cut: threshold for percentage of unique values relative to number of rows.
         """
         nzv_cols = {}
-        n = self.df.height
+        n = self.stats.height
         if n == 0:
             return nzv_cols
 
         for col in self.numeric_cols + self.categorical_cols:
-            vc = self.df[col].value_counts().sort("count", descending=True)
+            # value_counts height, the null group included
+            n_groups = self.stats[col]["n_unique"]
+            top = self.stats[col]["top"]
 
-            if vc.height < 2:
+            if n_groups < 2:
                 continue
 
-            most = vc["count"][0]
-            second = vc["count"][1]
+            most = top[0][1]
+            second = top[1][1]
             freq_ratio = most / second if second != 0 else float("inf")
 
-            percent_unique = (vc.height / n) * 100
+            percent_unique = (n_groups / n) * 100
 
             if freq_ratio > freq_cut or percent_unique < unique_cut:
-                value_col = [c for c in vc.columns if c != "count"][0]
-
                 nzv_cols[col] = {
                     "freq_ratio": round(freq_ratio, 3),
                     "percent_unique": round(percent_unique, 3),
-                    "most_common_value": vc[value_col][0],
+                    "most_common_value": top[0][0],
                 }
         return nzv_cols
     
-    def _mutual_info_column_pair(self, col_a, col_b, n_bins=20):
-        sub = self.df.select([col_a, col_b]).drop_nulls()
-        if sub.is_empty():
-            return 0.0
-
-        a = sub[col_a]
-        b = sub[col_b]
-
-        def to_labels(s):
-            if s.dtype in {pl.Float32, pl.Float64, *pl.INTEGER_DTYPES}:
-                arr = s.to_numpy()
-                if np.nanstd(arr) == 0:
-                    return np.zeros(len(arr), dtype=int)
-                bins = np.histogram_bin_edges(arr[~np.isnan(arr)], bins=n_bins)
-                labels = np.digitize(arr, bins, right=False)
-                return labels.astype(int)
-            else:
-                vals = s.to_list()
-                uniques = sorted({str(v) for v in vals})
-                mapping = {u: i for i, u in enumerate(uniques)}
-                return np.array([mapping[str(v)] for v in vals], dtype=int)
-
-        a_lbl = to_labels(a)
-        b_lbl = to_labels(b)
-
-        try:
-            return float(mutual_info_score(a_lbl, b_lbl))
-        except Exception as e:
-            logger.debug("MI failed for %s,%s: %s", col_a, col_b, e)
-            return 0.0
-    
-    def compute_top_mutual_info_pairs(self, top_k=3):
-        results = []
-        cols = [c for c in self.df.columns if c not in self.index_cols]
-
-        for i in range(len(cols)):
-            for j in range(i + 1, len(cols)):
-                a, b = cols[i], cols[j]
-                try:
-                    mi = self._mutual_info_column_pair(a, b)
-                    results.append({"col_a": a, "col_b": b, "mutual_info": round(mi, 5)})
-                except Exception as e:
-                    logger.debug("skipping pair %s-%s: %s", a, b, e)
-                    continue
-
-        results = sorted(results, key=lambda r: r["mutual_info"], reverse=True)
-        return results[:top_k]
+    def compute_top_mutual_info_pairs(self, top_k=3, n_bins=20):
+        cols = [c for c in self.profile.schema if c not in self.index_cols]
+        # computed on a sample of the rows for a LazyFrame
+        engine = MutualInfoEngine(self._sample(cols), cols, n_bins=n_bins)
+        return engine.top_pairs(top_k=top_k)
     
 
 
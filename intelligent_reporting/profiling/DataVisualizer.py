@@ -1,9 +1,14 @@
 import os
 import warnings
-import matplotlib.pyplot as plt
 import seaborn as sns
 import polars as pl
-from scipy.stats import kruskal
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+
+from ..core.stats import ColumnStats, kruskal_wallis
+from ..core.tracing import traced
+from .DatasetProfile import DatasetProfile
+from .FigureRenderer import FigureRenderer, PlotSpec, draw_boxes, draw_histogram, rotate_xticks
+from ..core.plotdata import grouped_box_stats, histogram, time_series
 
 import logging
 logger = logging.getLogger(__name__)
@@ -11,10 +16,87 @@ logger.addHandler(logging.NullHandler())
 
 warnings.filterwarnings("ignore")
 
+
+def _draw_histogram(fig, ax, *, hist, column, var, primary_color, neutral_color):
+    draw_histogram(ax, hist, color=primary_color, edgecolor='white', linewidth=1.2)
+    ax.set_title(f"{column} Distribution (Variance={var:.2f})", fontsize=16, fontweight="bold", color=primary_color)
+    ax.set_xlabel(column, fontsize=13)
+    ax.set_ylabel("Frequency", fontsize=13)
+    ax.grid(alpha=0.25, linestyle='--', color=neutral_color)
+    sns.despine(ax=ax, left=True, bottom=True)
+
+
+def _draw_top_categories(fig, ax, *, labels, counts, column, top_k, primary_color, secondary_color, neutral_color):
+    colors = [primary_color if i < top_k - 1 else secondary_color for i in range(len(labels))]
+    bars = ax.bar(labels, counts,color=colors,edgecolor= neutral_color, linewidth=1.2, alpha=0.9)
+
+    ax.set_title(
+        f"Top {top_k} Categories for {column}",fontsize=16,fontweight="bold",color=primary_color)
+    ax.set_xlabel(column, fontsize=13)
+    ax.set_ylabel("Count", fontsize=13)
+    rotate_xticks(ax, 45)
+    ax.grid(axis='y', alpha=0.2, linestyle='--', color=neutral_color)
+
+    max_count = int(max(counts))
+    for bar in bars:
+        height = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width() / 2,height + max_count * 0.02,f'{int(height)}',ha='center',fontsize=11,
+        fontweight='bold',
+        color=primary_color
+    )
+
+    sns.despine(ax=ax, left=True, bottom=True)
+
+
+def _draw_time_series(fig, ax, *, series, dt_col, num_col, primary_color, neutral_color):
+    x, y = series["x"], series["mean"]
+    ax.plot(x, y, marker='o' if len(x) <= 100 else None,
+            linewidth=2, color=primary_color)
+    if series["min"] is not None:
+        # min / max envelope of every bucket
+        ax.fill_between(x, series["min"], series["max"],
+                        color=primary_color, alpha=0.15, linewidth=0)
+    else:
+        ax.fill_between(x, y*0.97, y*1.03,
+                        color=primary_color, alpha=0.1)
+
+    locator = AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+
+    every = f", {series['every']} buckets" if series["every"] else ""
+    ax.set_title(f"{num_col} over time ({dt_col}{every})", fontsize=16, fontweight="bold", color=primary_color)
+    ax.set_xlabel(dt_col, fontsize=13)
+    ax.set_ylabel(num_col, fontsize=13)
+    ax.grid(alpha=0.25, linestyle='--', color=neutral_color)
+
+    sns.despine(ax=ax, left=True, bottom=True)
+
+
+def _draw_boxplot_by(fig, ax, *, boxes, cat, num, primary_color, neutral_color):
+    draw_boxes(ax, boxes, color=primary_color, fliersize=3, width=0.6)
+
+    ax.set_title(
+        f"{num} Distribution by {cat}",
+        fontsize=16, fontweight="bold", color=primary_color
+    )
+
+    ax.set_xlabel(cat, fontsize=13)
+    ax.set_ylabel(num, fontsize=13)
+    rotate_xticks(ax, 30)
+
+    ax.grid(axis="y", alpha=0.25, linestyle='--', color=neutral_color)
+    sns.despine(ax=ax, left=True, bottom=True)
+
 class DataVisualizer:
-    def __init__(self, *, df: pl.DataFrame, summary_dir="EDA_output",figures_dir = None, top_k_categories=5):
-        self.df = df
+    def __init__(self, *, df: pl.DataFrame | DatasetProfile, summary_dir="EDA_output",figures_dir = None, top_k_categories=5, stats: ColumnStats = None,
+                 renderer: FigureRenderer = None):
+        """renderer: renders the figures, shared with the other profilers to render them concurrently (inline by default)"""
+        self.profile = DatasetProfile.wrap(df, stats)
+        self.df = self.profile.df
+        self.stats = self.profile.stats
         self.top_k_categories = top_k_categories
+        self.renderer = renderer or FigureRenderer(max_workers=0)
 
         self.summary_dir = summary_dir 
         self.figures_dir = figures_dir if figures_dir and os.path.isabs(figures_dir) else os.path.join(self.summary_dir, "figures")
@@ -28,14 +110,11 @@ class DataVisualizer:
         os.makedirs(self.summary_dir, exist_ok=True)
         os.makedirs(self.figures_dir, exist_ok=True)
 
-        self.index_cols = self._detect_index_columns(df)
+        self.index_cols = self.profile.index_cols
 
-        self.numeric_cols = [col for col, dt in zip(df.columns, df.dtypes) if col not in self.index_cols and dt in ( pl.Int8, pl.Int16, pl.Int32, pl.Int64,
-    pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64, pl.Float32, pl.Float64)]
-
-        self.cat_cols = [col for col, dt in zip(df.columns, df.dtypes) if col not in self.index_cols and (dt == pl.Utf8 or dt == pl.Boolean)]
-
-        self.datetime_cols = [col for col, dt in zip(df.columns, df.dtypes) if col not in self.index_cols and dt == pl.Datetime]
+        self.numeric_cols = self.profile.numeric_cols
+        self.cat_cols = self.profile.categorical_cols
+        self.datetime_cols = self.profile.datetime_cols
 
         if self.index_cols:
             logger.info(
@@ -50,37 +129,12 @@ class DataVisualizer:
             len(self.datetime_cols),
         )
         
-    def _detect_index_columns(self, df):
-        index_cols = []
-
-        for col in df.columns:
-            s = df[col]
-
-            if s.n_unique() != df.height:
-                continue
-
-            if s.dtype in pl.INTEGER_DTYPES:
-                if (s.diff().drop_nulls() == 1).all():
-                    index_cols.append(col)
-                    continue
-            
-            if col.lower() in {"id", "index", "idx", "row_id", "rowid"}:
-                index_cols.append(col)
-                continue
-
-        return index_cols
-
-    def _save_plot(self, fig, name):
-        """Save figure in figures folder."""
-        path = os.path.join(self.figures_dir, f"{name}.png")
-        try:
-            fig.savefig(path, bbox_inches="tight", dpi=300)
-            plt.close(fig)
-            return path
-        except Exception as e:
-            logger.exception("Failed to save plot %s: %s", path, e)
-            plt.close(fig)
-            return None
+    def _save_plot(self, name, draw, figsize, **params):
+        """Render a figure in figures folder."""
+        spec = PlotSpec(name, draw, figsize=figsize, bbox_inches="tight", params={
+            "primary_color": self.primary_color, "neutral_color": self.neutral_color, **params,
+        })
+        return self.renderer.submit(spec, self.figures_dir)
 
 
     def plot_numeric_distributions(self, top_n=2):
@@ -90,23 +144,12 @@ class DataVisualizer:
             return
 
         # top variance columns
-        variances = {col: float(self.df[col].var() or 0.0) for col in self.numeric_cols}
+        variances = {col: float(self.stats[col]["var"] or 0.0) for col in self.numeric_cols}
         top_vars = dict(sorted(variances.items(), key=lambda x: x[1], reverse=True)[:top_n])
 
         for col, var in top_vars.items():
-            with sns.axes_style("whitegrid"):
-
-                fig, ax = plt.subplots(figsize=(8, 6))
-
-                sns.histplot(self.df[col].drop_nulls().to_numpy(), bins=25, kde=True, color=self.primary_color, edgecolor='white', linewidth=1.2, ax=ax)
-                ax.set_title(f"{col} Distribution (Variance={var:.2f})", fontsize=16, fontweight="bold", color=self.primary_color)
-                ax.set_xlabel(col, fontsize=13)
-                ax.set_ylabel("Frequency", fontsize=13)
-                ax.grid(alpha=0.25, linestyle='--', color=self.neutral_color)
-                sns.despine(left=True, bottom=True)
-                fig.tight_layout()
-
-                self._save_plot(fig, f"hist_{col}")
+            hist = histogram(self.profile.collect(self.df.select(col)).to_series(), bins=25)
+            self._save_plot(f"hist_{col}", _draw_histogram, (8, 6), hist=hist, column=col, var=var)
 
     def plot_categorical_columns(self, max_unique=50, max_label_len=40):
         """Safely plot categorical columns while skipping unusable ones silently."""
@@ -116,11 +159,11 @@ class DataVisualizer:
 
         for col in self.cat_cols[:2]: 
             # Cardinality filter
-            n_unique = self.df[col].n_unique()
+            n_unique = self.stats[col]["n_unique"]
             if n_unique == 0 or n_unique > max_unique:
                 continue
 
-            vc = self.df[col].value_counts()
+            vc = self.profile.value_counts(col)
             if vc.height == 0:
                 continue
 
@@ -142,34 +185,19 @@ class DataVisualizer:
             if counts.empty:
                 continue
 
-            with sns.axes_style("whitegrid"):
-                fig, ax = plt.subplots(figsize=(10, 6))
-
-                colors = [self.primary_color if i < self.top_k_categories - 1 else self.secondary_color for i in range(len(labels))]
-                bars = ax.bar(labels, counts,color=colors,edgecolor= self.neutral_color, linewidth=1.2, alpha=0.9)
-
-                ax.set_title(
-                    f"Top {self.top_k_categories} Categories for {col}",fontsize=16,fontweight="bold",color=self.primary_color)
-                ax.set_xlabel(col, fontsize=13)
-                ax.set_ylabel("Count", fontsize=13)
-                plt.xticks(rotation=45, ha="right")
-                ax.grid(axis='y', alpha=0.2, linestyle='--', color=self.neutral_color)
-
-                max_count = int(counts.max())
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width() / 2,height + max_count * 0.02,f'{int(height)}',ha='center',fontsize=11,
-                    fontweight='bold',
-                    color=self.primary_color
-                )
-
-                sns.despine(left=True, bottom=True)
-                fig.tight_layout()
-                self._save_plot(fig, f"bar_{col}")
+            self._save_plot(
+                f"bar_{col}", _draw_top_categories, (10, 6),
+                labels=labels.tolist(), counts=counts.tolist(), column=col,
+                top_k=self.top_k_categories, secondary_color=self.secondary_color,
+            )
 
 
-    def plot_time_series_columns(self):
-        '''plot time column'''
+    def plot_time_series_columns(self, max_points=1000, envelope=True):
+        '''
+        plot time column
+        max_points: point budget, high-frequency data is averaged in buckets sized from the time span
+        envelope: shade the min / max of every bucket so that spikes stay visible
+        '''
         if not self.datetime_cols or not self.numeric_cols:
             logger.info(
             "Skipping time series plots | datetime=%d | numeric=%d",len(self.datetime_cols),
@@ -177,50 +205,30 @@ class DataVisualizer:
             return
 
         # umeric column with highest variance
-        variances = {col: float(self.df[col].var() or 0.0) for col in self.numeric_cols}
+        variances = {col: float(self.stats[col]["var"] or 0.0) for col in self.numeric_cols}
         best_num = max(variances, key=variances.get)
 
         for dt_col in self.datetime_cols[:2]:
-            with sns.axes_style("whitegrid"):
-
-                time_df = self.df.group_by(dt_col).agg(pl.col(best_num).mean()).sort(dt_col).to_pandas()
-                fig, ax = plt.subplots(figsize=(10, 5))
-
-                ax.plot(time_df[dt_col], time_df[best_num], marker='o',
-                        linewidth=2, color=self.primary_color)
-                ax.fill_between(time_df[dt_col], time_df[best_num]*0.97, time_df[best_num]*1.03,
-                                color=self.primary_color, alpha=0.1)
-
-                ax.set_title(f"{best_num} over time ({dt_col})", fontsize=16, fontweight="bold", color=self.primary_color)
-                ax.set_xlabel(dt_col, fontsize=13)
-                ax.set_ylabel(best_num, fontsize=13)
-                ax.grid(alpha=0.25, linestyle='--', color=self.neutral_color)
-
-                sns.despine(left=True, bottom=True)
-                fig.tight_layout()
-                self._save_plot(fig, f"time_series_{dt_col}")
+            dt_stats = self.stats[dt_col]
+            if dt_stats["min"] is None:
+                continue
+            series = time_series(
+                self.df, dt_col, best_num, max_points=max_points, envelope=envelope,
+                is_sorted=bool(dt_stats.get("is_increasing")), span=dt_stats["max"] - dt_stats["min"],
+                n_unique=dt_stats["n_unique"], engine=self.profile.engine,
+            )
+            self._save_plot(
+                f"time_series_{dt_col}", _draw_time_series, (10, 5),
+                series=series, dt_col=dt_col, num_col=best_num,
+            )
 
     def _rank_numeric_by_kruskal(self, cat_col, numeric_cols, top_n=2):
         """Return the top_n numeric columns most associated with the categorical column."""
-        pdf = self.df.select([cat_col] + numeric_cols).drop_nulls().to_pandas()
-        results = []
-
-        # group by categorical column
-        groups = dict(tuple(pdf.groupby(cat_col)))
-
-        for num in numeric_cols:
-            num_groups = [g[num].dropna().values for _, g in groups.items() if len(g[num].dropna()) > 1
-            ]
-
-            if len(num_groups) <= 1:
-                continue
-
-            stat, pval = kruskal(*num_groups)
-            results.append((num, stat, pval))
+        # H statistics of all the numeric columns in a single query
+        h_stats = kruskal_wallis(self.df, cat_col, numeric_cols, engine=self.profile.engine)
 
         # sort by highest H-stat
-        results.sort(key=lambda x: x[1], reverse=True)
-        return [r[0] for r in results[:top_n]]
+        return sorted(h_stats, key=h_stats.get, reverse=True)[:top_n]
 
 
     def plot_categorical_numeric_interactions(self, max_categories=10):
@@ -233,42 +241,25 @@ class DataVisualizer:
             return
 
         for cat in self.cat_cols[:2]:
-            if self.df[cat].n_unique() > max_categories:
+            if self.stats[cat]["n_unique"] > max_categories:
                 continue
 
             # Select numeric cols based on Kruskal ranking
             best_numeric = self._rank_numeric_by_kruskal(cat, self.numeric_cols, top_n=2)
 
             for num in best_numeric:
-                df_pd = (
-                    self.df.select([cat, num]).drop_nulls().to_pandas())
+                # quartiles, whiskers and a capped set of fliers per category, in one group_by
+                boxes = grouped_box_stats(self.df, cat, num, engine=self.profile.engine)
 
-                if df_pd.empty:
+                if not boxes:
                     continue
 
-                with sns.axes_style("whitegrid"):
-                    fig, ax = plt.subplots(figsize=(10, 6))
-
-                    sns.boxplot(data=df_pd,x=cat,y=num,ax=ax,color=self.primary_color,fliersize=3, width=0.6)
-
-                    ax.set_title(
-                        f"{num} Distribution by {cat}",
-                        fontsize=16, fontweight="bold", color=self.primary_color
-                    )
-
-                    ax.set_xlabel(cat, fontsize=13)
-                    ax.set_ylabel(num, fontsize=13)
-                    plt.xticks(rotation=30, ha="right")
-
-                    ax.grid(axis="y", alpha=0.25, linestyle='--', color=self.neutral_color)
-                    sns.despine(left=True, bottom=True)
-
-                    fig.tight_layout()
-                    name = f"box_{num}_by_{cat}".replace(" ", "_")
-                    self._save_plot(fig, name)
+                name = f"box_{num}_by_{cat}".replace(" ", "_")
+                self._save_plot(name, _draw_boxplot_by, (10, 6), boxes=boxes, cat=cat, num=num)
 
 
 
+    @traced("profiling.plots", measure=lambda self, *a, **k: self.profile)
     def run_viz(self):
         logger.info("Starting visualization module")
 
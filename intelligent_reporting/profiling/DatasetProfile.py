@@ -0,0 +1,149 @@
+from functools import cached_property
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from ..core.stats import CATEGORICAL_DTYPES, NUMERIC_DTYPES, ColumnStats
+from ..core.correlation import pearson_matrix, spearman_matrix
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+CORRELATION_MATRICES = {"pearson": pearson_matrix, "spearman": spearman_matrix}
+
+
+class DatasetProfile:
+    """
+    Profiling context shared by the sampler, summarizer, visualizer and correlater.
+    Wraps the frame and exposes lazily computed, memoized facts about it
+    (column roles, index columns, statistics, pandas/NumPy views, correlations, value counts).
+    Everything is computed at most once per frame and dropped when the frame is replaced.
+    A pl.LazyFrame is profiled out-of-core: its queries run on the streaming engine
+    and only their (small) results are materialized.
+    """
+
+    def __init__(self, df: pl.DataFrame | pl.LazyFrame, stats: ColumnStats = None, *, engine: str | None = None):
+        """engine: polars engine of the queries, "streaming" by default for a LazyFrame"""
+        self._df = df
+        self._stats = stats
+        self.engine = engine or ("streaming" if isinstance(df, pl.LazyFrame) else "auto")
+        self._correlations = {}
+        self._value_counts = {}
+
+    @classmethod
+    def wrap(cls, df, stats: ColumnStats = None) -> "DatasetProfile":
+        """Return df itself when it is already a profile, a new profile of df otherwise"""
+        if isinstance(df, cls):
+            if stats is not None and df._stats is None:
+                df._stats = stats
+            return df
+        return cls(df, stats=stats)
+
+    @property
+    def df(self) -> pl.DataFrame | pl.LazyFrame:
+        return self._df
+
+    @df.setter
+    def df(self, df: pl.DataFrame | pl.LazyFrame):
+        if df is not self._df:
+            self._df = df
+            self._stats = None
+            self.invalidate()
+
+    def invalidate(self):
+        """Forget every memoized fact, they are recomputed on next access"""
+        for name in [k for k, v in vars(type(self)).items() if isinstance(v, cached_property)]:
+            self.__dict__.pop(name, None)
+        self._correlations = {}
+        self._value_counts = {}
+
+    @property
+    def is_lazy(self) -> bool:
+        return isinstance(self._df, pl.LazyFrame)
+
+    def collect(self, query: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+        """Materialize the result of a query on the frame, with the profile's engine"""
+        if isinstance(query, pl.LazyFrame):
+            return query.collect(engine=self.engine)
+        return query
+
+    @property
+    def stats(self) -> ColumnStats:
+        if self._stats is None:
+            self._stats = ColumnStats(self._df, engine=self.engine)
+        return self._stats
+
+    @cached_property
+    def schema(self) -> dict:
+        return dict(self._df.collect_schema())
+
+    @cached_property
+    def height(self) -> int:
+        if not self.is_lazy:
+            return self._df.height
+        if self._stats is not None:
+            return self._stats.height
+        return self.collect(self._df.select(pl.len())).item()
+
+    @cached_property
+    def index_cols(self) -> list[str]:
+        return [col for col in self.stats.index_columns() if col in self.schema]
+
+    def _role(self, dtypes) -> list[str]:
+        index_cols = set(self.index_cols)
+        return [col for col, dt in self.schema.items() if dt in dtypes and col not in index_cols]
+
+    @cached_property
+    def numeric_cols(self) -> list[str]:
+        return self._role(NUMERIC_DTYPES)
+
+    @cached_property
+    def categorical_cols(self) -> list[str]:
+        return self._role(CATEGORICAL_DTYPES)
+
+    @cached_property
+    def datetime_cols(self) -> list[str]:
+        return self._role((pl.Datetime,))
+
+    @cached_property
+    def all_numeric_cols(self) -> list[str]:
+        """Numeric columns, index columns included"""
+        return [col for col, dt in self.schema.items() if dt in NUMERIC_DTYPES]
+
+    @cached_property
+    def numeric_pandas(self):
+        """pandas view of the numeric columns (index columns included)"""
+        return self.collect(self._df.select(self.all_numeric_cols)).to_pandas()
+
+    @cached_property
+    def numeric_numpy(self) -> np.ndarray:
+        """2D float64 array of the numeric columns, nulls as NaN"""
+        if not self.all_numeric_cols:
+            return np.empty((self.height, 0))
+        return self.collect(self._df.select(self.all_numeric_cols)).to_numpy().astype(np.float64, copy=False)
+
+    def correlation(self, method: str = "pearson") -> pd.DataFrame:
+        """
+        Correlation matrix of the numeric columns, memoized per method.
+        pearson and spearman are computed natively from numeric_numpy, other methods by pandas
+        """
+        if method not in self._correlations:
+            if method in CORRELATION_MATRICES:
+                cols = self.all_numeric_cols
+                matrix = CORRELATION_MATRICES[method](self.numeric_numpy)
+                self._correlations[method] = pd.DataFrame(matrix, index=cols, columns=cols)
+            else:
+                self._correlations[method] = self.numeric_pandas.corr(method=method)
+        return self._correlations[method]
+
+    def value_counts(self, col: str) -> pl.DataFrame:
+        """value_counts of a column sorted by descending count, memoized per column"""
+        if col not in self._value_counts:
+            if self.is_lazy:
+                query = self._df.group_by(col).len(name="count").sort("count", descending=True)
+                self._value_counts[col] = self.collect(query)
+            else:
+                self._value_counts[col] = self._df[col].value_counts(sort=True)
+        return self._value_counts[col]
@@ -0,0 +1,140 @@
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import matplotlib
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+# bump to invalidate every cached figure when the rendering changes in a way the key can not see
+RENDER_VERSION = 1
+# the drawing helpers (draw_histogram, draw_boxes, style_axes...) live there
+RENDERER_MODULE = f"{__package__}.FigureRenderer"
+
+
+@lru_cache(maxsize=None)
+def _module_source_hash(name: str) -> str:
+    """Hash of the source file of a loaded module, empty when it has none"""
+    path = getattr(sys.modules.get(name), "__file__", None)
+    if not path:
+        return ""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return ""
+
+
+def _digest(h, obj):
+    """Feed a deterministic encoding of a plot parameter into a hash"""
+    if isinstance(obj, np.ndarray):
+        h.update(f"ndarray{obj.dtype.str}{obj.shape}".encode())
+        h.update(repr(obj.tolist()).encode() if obj.dtype == object else np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        _digest(h, list(obj.index))
+        _digest(h, list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name)
+        _digest(h, obj.to_numpy())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for k in sorted(obj, key=str):
+            _digest(h, k)
+            _digest(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _digest(h, item)
+    elif callable(obj) and hasattr(obj, "__code__"):
+        # the drawing code is part of the key, editing it invalidates its figures
+        code = obj.__code__
+        h.update(f"{obj.__module__}.{obj.__qualname__}".encode())
+        h.update(code.co_code)
+        _digest(h, [c for c in code.co_consts if not hasattr(c, "co_code")])
+    else:
+        h.update(f"{type(obj).__name__}:{obj!r}".encode())
+
+
+class FigureCache:
+    """
+    Content-addressed store of rendered figures. A figure is keyed by a hash of its reduced
+    plot inputs (bins, quantiles, correlation submatrix...), its drawing function and the source of
+    the drawing helpers, style, size, DPI and format, so re-profiling the same data reuses the image bytes without
+    touching Matplotlib. Files are evicted least recently used first beyond max_bytes.
+    """
+
+    def __init__(self, directory: str, *, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        # key -> size, least recently used first (the mtime is refreshed on every hit)
+        entries = sorted((e for e in os.scandir(self.directory) if e.is_file()), key=lambda e: e.stat().st_mtime)
+        self._entries = OrderedDict((e.name, e.stat().st_size) for e in entries)
+        self._bytes = sum(self._entries.values())
+
+    @staticmethod
+    def key(spec, *, dpi: int, fmt: str) -> str:
+        h = hashlib.blake2b(digest_size=20)
+        # the helpers a draw function calls are not in its bytecode: the sources of its module and of
+        # the renderer module are hashed instead, with the matplotlib version
+        versions = [RENDER_VERSION, matplotlib.__version__,
+                    _module_source_hash(RENDERER_MODULE), _module_source_hash(spec.draw.__module__)]
+        _digest(h, [versions, spec.draw, spec.params, spec.figsize, spec.ncols, spec.style, spec.bbox_inches, dpi, fmt])
+        return f"{h.hexdigest()}.{fmt}"
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = os.path.join(self.directory, key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                self._bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            with open(os.path.join(self.directory, key), "wb") as f:
+                f.write(data)
+            self._bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            while self._bytes > self.max_bytes:
+                old, size = self._entries.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,292 @@
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+import numpy as np
+import seaborn as sns
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .FigureCache import FigureCache
+from ..core.tracing import span
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+FORMATS = ("png", "webp", "svg")
+
+
+@dataclass
+class PlotSpec:
+    """
+    A figure to render: draw(fig, axes, **params) fills the axes of a new Figure
+    (one Axes, or an array of ncols Axes). draw must be a module-level function and params
+    picklable, so that a spec can be rendered in a worker process.
+    """
+    name: str
+    draw: Callable
+    params: dict = field(default_factory=dict)
+    figsize: tuple = (10, 6)
+    ncols: int = 1
+    style: str = "whitegrid"
+    bbox_inches: str | None = None
+
+
+def style_axes(ax, style: str = "whitegrid"):
+    """Apply a seaborn axes style to one Axes, the global rcParams are left untouched"""
+    rc = sns.axes_style(style)
+    ax.set_facecolor(rc["axes.facecolor"])
+    ax.set_axisbelow(rc["axes.axisbelow"])
+    if rc["axes.grid"]:
+        ax.grid(True, color=rc["grid.color"], linestyle=rc["grid.linestyle"])
+    else:
+        ax.grid(False)
+    for side, spine in ax.spines.items():
+        spine.set_visible(rc[f"axes.spines.{side}"])
+        spine.set_edgecolor(rc["axes.edgecolor"])
+    ax.tick_params(axis="x", colors=rc["xtick.color"], direction=rc["xtick.direction"],
+                   bottom=rc["xtick.bottom"], top=rc["xtick.top"])
+    ax.tick_params(axis="y", colors=rc["ytick.color"], direction=rc["ytick.direction"],
+                   left=rc["ytick.left"], right=rc["ytick.right"])
+    ax.xaxis.label.set_color(rc["axes.labelcolor"])
+    ax.yaxis.label.set_color(rc["axes.labelcolor"])
+    ax.title.set_color(rc["text.color"])
+
+
+def rotate_xticks(ax, rotation: float, ha: str = "right"):
+    """plt.xticks(rotation=..., ha=...) for a given Axes"""
+    setp(ax.get_xticklabels(), rotation=rotation, ha=ha)
+
+
+def draw_histogram(ax, hist: dict, *, color, alpha: float = 0.5, edgecolor="white", linewidth: float = 1.0, line_kws: dict | None = None):
+    """Bars and KDE curve of core.plotdata.histogram, as sns.histplot(kde=True) draws them"""
+    edges = hist["edges"]
+    ax.bar(edges[:-1], hist["counts"], width=np.diff(edges), align="edge",
+           color=color, alpha=alpha, edgecolor=edgecolor, linewidth=linewidth)
+    if hist["kde"] is not None:
+        ax.plot(*hist["kde"], **{"color": color, **(line_kws or {})})
+
+
+def draw_boxes(ax, stats: list[dict], *, color, width: float = 0.6, linewidth: float = 1.5,
+               fliersize: float = 3, orientation: str = "vertical"):
+    """Box plots from core.plotdata box statistics, styled like sns.boxplot"""
+    line = {"color": ".15", "linewidth": linewidth}
+    ax.bxp(
+        stats, widths=width, patch_artist=True, orientation=orientation,
+        boxprops={"facecolor": color, "edgecolor": ".15", "linewidth": linewidth},
+        whiskerprops=line, capprops=line, medianprops=line,
+        flierprops={"marker": "d", "markersize": fliersize, "markerfacecolor": ".15", "markeredgecolor": ".15"},
+    )
+
+
+def draw_regression(ax, points: dict, line: dict | None, *, scatter_kws: dict, line_kws: dict):
+    """sns.regplot from core.plotdata.scatter_sample points and a regression_line fitted on all rows"""
+    kws = dict(scatter_kws)
+    if points["weights"] is not None:
+        # binned points: the area grows with the rows of the cell
+        kws["s"] = kws.get("s", 36) * np.sqrt(points["weights"] / points["weights"].max())
+    ax.scatter(points["x"], points["y"], **kws)
+    if line is None:
+        return
+    ax.plot(line["x"], line["y"], **line_kws)
+    if line["lower"] is not None:
+        ax.fill_between(line["x"], line["lower"], line["upper"], color=line_kws.get("color"), alpha=0.15, linewidth=0)
+
+
+def render_figure(spec: PlotSpec, path: str, *, dpi: int = 300, fmt: str = "png") -> str:
+    """Draw a spec on a new Figure with its own Agg canvas and save it, pyplot is never involved"""
+    with span("figure.render", figure=spec.name, fmt=fmt):
+        fig = Figure(figsize=spec.figsize)
+        FigureCanvasAgg(fig)
+        axes = fig.subplots(1, spec.ncols)
+        for ax in np.atleast_1d(axes):
+            style_axes(ax, spec.style)
+
+        spec.draw(fig, axes, **spec.params)
+        fig.tight_layout()
+        fig.savefig(path, dpi=dpi, format=fmt, bbox_inches=spec.bbox_inches)
+    return path
+
+
+class RenderBatch:
+    """
+    The figures one submitter (e.g. one request) sends to a shared FigureRenderer:
+    wait() only blocks on them and metrics() only counts them, the figures other submitters
+    render on the same pool are left alone. Get one with FigureRenderer.batch().
+    """
+
+    def __init__(self, renderer: "FigureRenderer"):
+        self.renderer = renderer
+        self.rendered = 0
+        self.failed = 0
+        self.cache_hits = 0
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def path(self, directory: str, name: str) -> str:
+        return self.renderer.path(directory, name)
+
+    def submit(self, spec: PlotSpec, directory: str) -> str | None:
+        """Render a spec into directory, return the path of the figure (None if rendering it inline failed)"""
+        renderer = self.renderer
+        path = renderer.path(directory, spec.name)
+        key = None
+        if renderer.cache is not None:
+            key = renderer.cache.key(spec, dpi=renderer.dpi, fmt=renderer.fmt)
+            data = renderer.cache.get(key)
+            if data is not None:
+                with open(path, "wb") as f:
+                    f.write(data)
+                with self._lock:
+                    self.cache_hits += 1
+                return path
+
+        if renderer.max_workers == 0:
+            try:
+                render_figure(spec, path, dpi=renderer.dpi, fmt=renderer.fmt)
+            except Exception as e:
+                self._count(failed=1)
+                logger.exception("Failed to render figure %s: %s", path, e)
+                return None
+            self._rendered(path, key)
+            return path
+
+        future = renderer._pool().submit(render_figure, spec, path, dpi=renderer.dpi, fmt=renderer.fmt)
+        with self._lock:
+            self._futures.append((path, key, future))
+        return path
+
+    def _count(self, *, rendered: int = 0, failed: int = 0):
+        # per batch and in total on the renderer
+        with self._lock:
+            self.rendered += rendered
+            self.failed += failed
+        with self.renderer._lock:
+            self.renderer.rendered += rendered
+            self.renderer.failed += failed
+
+    def _rendered(self, path: str, key: str | None):
+        self._count(rendered=1)
+        if key is not None:
+            with open(path, "rb") as f:
+                self.renderer.cache.put(key, f.read())
+
+    def wait(self) -> list[str]:
+        """Block until every figure submitted through this batch is written, return the paths of the rendered ones"""
+        rendered = []
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for path, key, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                self._count(failed=1)
+                logger.error("Failed to render figure %s: %s", path, e)
+                continue
+            self._rendered(path, key)
+            rendered.append(path)
+        logger.debug("Figure renderer | rendered %d/%d figures", len(rendered), len(futures))
+        return rendered
+
+    def metrics(self) -> dict:
+        """Figures of this batch rendered, failed and copied from the cache"""
+        return {"rendered": self.rendered, "failed": self.failed, "cache_hits": self.cache_hits}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.wait()
+
+
+class FigureRenderer:
+    """
+    Renders the PlotSpecs of the profilers.
+    With max_workers=0 a figure is rendered as soon as it is submitted, otherwise the figures of
+    every profiler sharing the renderer are rendered concurrently on a pool of worker processes
+    (or threads); wait(), close() or leaving a with block returns once all of them are written.
+    With a FigureCache, a figure already rendered from the same plot inputs is copied from the cache.
+    A renderer shared by concurrent requests hands each one a batch() to submit to and wait on.
+    """
+
+    def __init__(self, *, dpi: int = 300, fmt: str = "png", max_workers: int | None = None, processes: bool = True,
+                 cache: FigureCache | None = None):
+        """
+        dpi, fmt: resolution and format ("png", "webp" or "svg") of the figures
+        max_workers: size of the pool, the number of CPUs by default, 0 renders inline
+        processes: render on worker processes, on threads otherwise
+        cache: reuse the figures rendered from identical plot inputs, e.g. FigureCache("results/.figure_cache")
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"fmt must be one of {FORMATS}, got '{fmt}'")
+        self.dpi = dpi
+        self.fmt = fmt
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.processes = processes
+        self.cache = cache
+        # totals over every batch
+        self.rendered = 0
+        self.failed = 0
+        self._executor = None
+        # profilers may submit from several threads (DAGScheduler stages)
+        self._lock = threading.Lock()
+        # figures submitted to the renderer directly
+        self._default = RenderBatch(self)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    # spawned workers, forking a process that runs the polars thread pool can deadlock
+                    context = multiprocessing.get_context("spawn")
+                    self._executor = ProcessPoolExecutor(self.max_workers, mp_context=context)
+                else:
+                    self._executor = ThreadPoolExecutor(self.max_workers)
+            return self._executor
+
+    def path(self, directory: str, name: str) -> str:
+        return os.path.join(directory, f"{name}.{self.fmt}")
+
+    def batch(self) -> RenderBatch:
+        """
+        Figures tracked apart from the other submitters:
+
+            with FIGURE_RENDERER.batch() as figures:
+                DataVisualizer(df=profile, renderer=figures).run_viz()
+            figures.metrics()  # only the figures of this batch, all written
+        """
+        return RenderBatch(self)
+
+    def submit(self, spec: PlotSpec, directory: str) -> str | None:
+        """Render a spec into directory, return the path of the figure (None if rendering it inline failed)"""
+        return self._default.submit(spec, directory)
+
+    def wait(self) -> list[str]:
+        """Block until every figure submitted to the renderer directly is written, return the paths of the rendered ones"""
+        return self._default.wait()
+
+    def metrics(self) -> dict:
+        """Figures rendered and failed so far, and the cache hit rate"""
+        return {
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
+
+    def close(self):
+        self.wait()
+        if self._executor is not None:
+            # the figures of open batches are still awaited
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
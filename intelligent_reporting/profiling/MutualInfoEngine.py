@@ -0,0 +1,156 @@
+import heapq
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import polars as pl
+
+from ..core.stats import NUMERIC_DTYPES
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+
+class MutualInfoEngine:
+    """
+    Pairwise mutual information over many columns.
+    Every column is discretized once into integer codes (-1 marks a missing value),
+    each pair then only needs a contingency table built with np.bincount on combined codes.
+    Pairs are evaluated in batches on a thread pool, ordered by an entropy upper bound
+    so the top-k search can stop as soon as no remaining pair can enter the top-k.
+    """
+
+    # above this many cells per observed row, the contingency table is built sparsely
+    DENSE_TABLE_FACTOR = 4
+
+    def __init__(self, df: pl.DataFrame, columns: list[str] | None = None, *, n_bins: int = 20,
+                 max_workers: int | None = None, batch_size: int = 256):
+        self.columns = list(columns) if columns is not None else list(df.columns)
+        self.n_bins = n_bins
+        self.max_workers = max_workers or min(32, os.cpu_count() or 1)
+        self.batch_size = batch_size
+
+        self.codes = {}
+        self.counts = {}
+        self.cardinality = {}
+        self.has_nulls = {}
+        self.entropy = {}
+        self.log_distinct = {}
+        for col in self.columns:
+            codes = self._encode(df[col])
+            self._register(col, codes)
+
+    def _encode(self, s: pl.Series) -> np.ndarray:
+        """Integer codes of a column, numeric columns are binned, the others dictionary-encoded"""
+        if s.dtype in NUMERIC_DTYPES:
+            arr = s.cast(pl.Float64).to_numpy()
+            valid = ~np.isnan(arr)
+            codes = np.full(len(arr), -1, dtype=np.int64)
+            if not valid.any():
+                return codes
+            values = arr[valid]
+            if np.std(values) == 0:
+                codes[valid] = 0
+                return codes
+            bins = np.histogram_bin_edges(values, bins=self.n_bins)
+            codes[valid] = np.digitize(values, bins, right=False)
+            return codes
+
+        # dictionary codes dense-ranked to 0..k-1
+        encoded = s if s.dtype in (pl.Categorical, pl.Enum) else s.cast(pl.Utf8).cast(pl.Categorical)
+        ranks = encoded.to_physical().rank("dense").cast(pl.Int64) - 1
+        return ranks.fill_null(-1).to_numpy()
+
+    def _register(self, col: str, codes: np.ndarray):
+        valid = codes[codes >= 0]
+        k = int(valid.max()) + 1 if valid.size else 1
+        full_counts = np.bincount(valid, minlength=k) if valid.size else np.zeros(1, dtype=np.int64)
+        counts = full_counts[full_counts > 0]
+
+        self.codes[col] = codes
+        self.counts[col] = full_counts
+        self.cardinality[col] = k
+        self.has_nulls[col] = valid.size != codes.size
+        self.log_distinct[col] = math.log(len(counts)) if len(counts) else 0.0
+        if counts.size:
+            p = counts / counts.sum()
+            self.entropy[col] = float(-(p * np.log(p)).sum())
+        else:
+            self.entropy[col] = 0.0
+
+    def upper_bound(self, col_a: str, col_b: str) -> float:
+        """Cheap upper bound of MI(a, b): min of the entropies (or of log distinct counts with nulls)"""
+        if self.has_nulls[col_a] or self.has_nulls[col_b]:
+            # dropping rows changes the marginals, only the distinct counts still bound them
+            return min(self.log_distinct[col_a], self.log_distinct[col_b])
+        return min(self.entropy[col_a], self.entropy[col_b])
+
+    def mutual_info(self, col_a: str, col_b: str) -> float:
+        """Mutual information (natural log) of two columns over their rows without missing values"""
+        a, b = self.codes[col_a], self.codes[col_b]
+        ka, kb = self.cardinality[col_a], self.cardinality[col_b]
+        if self.has_nulls[col_a] or self.has_nulls[col_b]:
+            mask = (a >= 0) & (b >= 0)
+            a, b = a[mask], b[mask]
+            marginal_a, marginal_b = np.bincount(a, minlength=ka), np.bincount(b, minlength=kb)
+        else:
+            marginal_a, marginal_b = self.counts[col_a], self.counts[col_b]
+        n = a.size
+        if n == 0:
+            return 0.0
+
+        combined = a * kb + b
+        if ka * kb <= self.DENSE_TABLE_FACTOR * n:
+            joint = np.bincount(combined, minlength=ka * kb)
+            nz = np.flatnonzero(joint)
+            joint = joint[nz]
+        else:
+            nz, joint = np.unique(combined, return_counts=True)
+
+        count_a = marginal_a[nz // kb]
+        count_b = marginal_b[nz % kb]
+
+        mi = (joint / n) * (np.log(joint) + math.log(n) - np.log(count_a) - np.log(count_b))
+        return max(float(mi.sum()), 0.0)
+
+    def _evaluate(self, pair):
+        a, b = pair
+        try:
+            return a, b, self.mutual_info(a, b)
+        except Exception as e:
+            logger.debug("skipping pair %s-%s: %s", a, b, e)
+            return a, b, None
+
+    def top_pairs(self, top_k: int = 3) -> list[dict]:
+        """Top-k pairs by mutual information"""
+        cols = self.columns
+        position = {col: i for i, col in enumerate(cols)}
+        pairs = [(cols[i], cols[j]) for i in range(len(cols)) for j in range(i + 1, len(cols))]
+        if not pairs or top_k <= 0:
+            return []
+
+        bounds = {pair: self.upper_bound(*pair) for pair in pairs}
+        pairs.sort(key=lambda p: bounds[p], reverse=True)
+
+        heap = []  # (mi, -order, a, b), the smallest of the top-k on top
+        evaluated = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for start in range(0, len(pairs), self.batch_size):
+                batch = pairs[start:start + self.batch_size]
+                if len(heap) == top_k and bounds[batch[0]] < heap[0][0]:
+                    break
+                for a, b, mi in pool.map(self._evaluate, batch):
+                    evaluated += 1
+                    if mi is None:
+                        continue
+                    item = (mi, -position[a] * len(cols) - position[b], a, b)
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, item)
+                    elif item > heap[0]:
+                        heapq.heapreplace(heap, item)
+
+        logger.debug("Mutual information evaluated %d/%d pairs", evaluated, len(pairs))
+        best = sorted(heap, reverse=True)
+        return [{"col_a": a, "col_b": b, "mutual_info": round(mi, 5)} for mi, _, a, b in best]
@@ -0,0 +1,263 @@
+import os
+import json
+from typing import Iterable
+import numpy as np
+import polars as pl
+
+from ..core.sketches import HyperLogLog, KLLSketch, SpaceSaving, Moments, ReservoirSample
+from ..core.stats import CATEGORICAL_DTYPES, NUMERIC_DTYPES, INDEX_NAMES
+from ..core.tracing import traced
+from .MutualInfoEngine import MutualInfoEngine
+
+import logging
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class SketchSummarizer:
+    """
+    Approximate, one pass version of DataSummarizer.summary for inputs too large for memory.
+    Batches are folded into mergeable sketches (HyperLogLog distinct counts, KLL quantiles,
+    Space-Saving top values, moments, reservoir sample) so memory stays bounded
+    whatever the number of rows; the summary reports the error bound of every estimate.
+    """
+
+    # row hashes are kept exactly up to this many distinct rows, the HyperLogLog takes over beyond
+    EXACT_ROW_HASHES = 1_000_000
+
+    def __init__(self, *, summary_dir: str, precision: int = 14, quantile_k: int = 200,
+                 top_capacity: int = 64, sample_size: int = 10_000, seed: int = 42, verbose=False):
+        self.summary_dir = summary_dir
+        self.precision = precision
+        self.quantile_k = quantile_k
+        self.top_capacity = top_capacity
+        self.sample_size = sample_size
+        self.seed = seed
+        self.verbose = verbose
+
+        self.n_rows = 0
+        self.schema = None
+        self.nulls = {}
+        self.distinct = {}
+        self.top = {}
+        self.quantiles = {}
+        self.moments = {}
+        self.consecutive = {}
+        self._last = {}
+        self.rows = HyperLogLog(precision=18)
+        self._row_hashes = np.empty(0, dtype=np.uint64)
+        self.reservoir = ReservoirSample(sample_size, seed=seed)
+
+        os.makedirs(self.summary_dir, exist_ok=True)
+
+    def _init_columns(self, batch: pl.DataFrame):
+        self.schema = dict(batch.schema)
+        for i, (col, dtype) in enumerate(self.schema.items()):
+            self.nulls[col] = 0
+            self.distinct[col] = HyperLogLog(precision=self.precision)
+            self.top[col] = SpaceSaving(self.top_capacity)
+            if dtype in NUMERIC_DTYPES:
+                self.quantiles[col] = KLLSketch(self.quantile_k, seed=self.seed + i)
+                self.moments[col] = Moments()
+            if dtype.is_integer():
+                self.consecutive[col] = True
+
+    @property
+    def numeric_cols(self) -> list[str]:
+        index_cols = set(self.index_cols)
+        return [col for col in self.schema if col in self.moments and col not in index_cols]
+
+    def update(self, batch: pl.DataFrame):
+        """Fold a batch into the sketches"""
+        if batch.is_empty():
+            return self
+        if self.schema is None:
+            self._init_columns(batch)
+
+        nulls = batch.null_count().row(0, named=True)
+        for col in self.schema:
+            s = batch[col]
+            self.nulls[col] += nulls[col]
+            self.distinct[col].update(s)
+            self.top[col].update(s)
+            if col in self.moments:
+                self.quantiles[col].update(s)
+                self.moments[col].update(s)
+            if self.consecutive.get(col):
+                # consecutive within the batch and with the previous batch
+                first, last = s[0], s[-1]
+                previous = self._last.get(col)
+                self.consecutive[col] = (
+                    s.null_count() == 0
+                    and (s.diff().drop_nulls() == 1).all()
+                    and (previous is None or first == previous + 1)
+                )
+                self._last[col] = last
+
+        hashes = batch.hash_rows(seed=HyperLogLog.HASH_SEED).to_numpy()
+        self.rows.update_hashes(hashes)
+        if self._row_hashes is not None:
+            self._row_hashes = np.union1d(self._row_hashes, hashes)
+            if self._row_hashes.size > self.EXACT_ROW_HASHES:
+                self._row_hashes = None
+        self.reservoir.update(batch)
+        self.n_rows += batch.height
+        logger.debug("Sketch summarizer | batch rows=%d | total rows=%d", batch.height, self.n_rows)
+        return self
+
+    def update_many(self, batches: Iterable[pl.DataFrame]):
+        for batch in batches:
+            self.update(batch)
+        return self
+
+    def distinct_rows(self) -> int:
+        """Distinct rows, exact (up to hash collisions) while few enough, estimated otherwise"""
+        if self._row_hashes is not None:
+            return int(self._row_hashes.size)
+        return min(int(round(self.rows.count())), self.n_rows)
+
+    def distinct_count(self, col: str) -> int:
+        """Estimated distinct non-null values of a column"""
+        non_null = self.n_rows - self.nulls[col]
+        return min(int(round(self.distinct[col].count())), non_null)
+
+    @property
+    def index_cols(self) -> list[str]:
+        index_cols = []
+        for col in self.schema:
+            # unique within the distinct count error (3 standard errors)
+            if self.nulls[col] or self.distinct_count(col) < self.n_rows * (1 - 3 * self.distinct[col].relative_error):
+                continue
+            if self.consecutive.get(col) or col.lower() in INDEX_NAMES:
+                index_cols.append(col)
+        return index_cols
+
+    def detect_outliers(self) -> dict:
+        """Estimated IQR outliers per numeric column, from the quantile sketches"""
+        outliers = {}
+        for col in self.numeric_cols:
+            sketch = self.quantiles[col]
+            if sketch.n == 0:
+                outliers[col] = 0
+                continue
+            q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+            iqr = q3 - q1
+            lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+            outside = sketch.rank(lower, inclusive=False) + 1 - sketch.rank(upper, inclusive=True)
+            outliers[col] = int(round(outside * sketch.n))
+        return outliers
+
+    def describe_numeric(self) -> dict:
+        described = {}
+        for col in self.numeric_cols:
+            m, q = self.moments[col], self.quantiles[col]
+            described[col] = {
+                "count": float(m.n),
+                "null_count": float(self.nulls[col]),
+                "mean": m.mean if m.n else None,
+                "std": m.std,
+                "min": m.min,
+                "25%": q.quantile(0.25),
+                "50%": q.quantile(0.5),
+                "75%": q.quantile(0.75),
+                "max": m.max,
+                "skew": m.skew,
+                "kurtosis": m.kurtosis,
+            }
+        return described
+
+    def detect_constants(self) -> dict:
+        constant_cols = {}
+        for col in self.schema:
+            top = self.top[col].top(1)
+            if not top:
+                continue
+            top_freq = top[0][1] / self.n_rows
+            if top_freq >= 0.8:
+                constant_cols[col] = round(float(top_freq), 3)
+        return constant_cols
+
+    def detect_near_zero_variance(self, *, freq_cut=20, unique_cut=10) -> dict:
+        nzv_cols = {}
+        if self.n_rows == 0:
+            return nzv_cols
+        index_cols = set(self.index_cols)
+        for col, dtype in self.schema.items():
+            if col in index_cols or not (dtype in NUMERIC_DTYPES or dtype in CATEGORICAL_DTYPES):
+                continue
+            # distinct values, the null group included
+            n_groups = self.distinct_count(col) + (1 if self.nulls[col] else 0)
+            top = self.top[col].top(2)
+            if n_groups < 2 or len(top) < 2:
+                continue
+
+            most, second = top[0][1], top[1][1]
+            freq_ratio = most / second if second != 0 else float("inf")
+            percent_unique = (n_groups / self.n_rows) * 100
+
+            if freq_ratio > freq_cut or percent_unique < unique_cut:
+                nzv_cols[col] = {
+                    "freq_ratio": round(freq_ratio, 3),
+                    "percent_unique": round(percent_unique, 3),
+                    "most_common_value": top[0][0],
+                }
+        return nzv_cols
+
+    def error_bounds(self) -> dict:
+        """Error bound of every estimated figure of the summary"""
+        return {
+            "distinct_count_relative_error": round(float(HyperLogLog(self.precision).relative_error), 5),
+            "duplicated_rows_absolute_error": 0 if self._row_hashes is not None else int(round(self.rows.relative_error * self.rows.count())),
+            "quantile_rank_error": round(KLLSketch(self.quantile_k).rank_error, 5),
+            "top_value_max_overcount": {col: max((e for _, _, e in self.top[col].top(2)), default=0) for col in self.schema},
+            "sample_rows": self.reservoir.sample.height if self.reservoir.sample is not None else 0,
+        }
+
+    @property
+    def sample(self) -> pl.DataFrame | None:
+        """Uniform sample of the rows seen, e.g. to feed a DataSampler"""
+        return self.reservoir.sample
+
+    @traced("profiling.sketch_summary")
+    def summary(self, top_k_mutual_info=3) -> dict:
+        """Approximate summary, same layout as DataSummarizer.summary plus its error bounds"""
+        if self.schema is None:
+            raise ValueError("No batch has been summarized yet")
+
+        n_rows = self.n_rows
+        summary_info = {
+            "num_rows": n_rows,
+            "num_columns": len(self.schema),
+            "approximate": True,
+            "duplicated_rows": n_rows - self.distinct_rows(),
+        }
+        summary_info["missing"] = {
+            col: {"missing_count": int(self.nulls[col]), "missing_pct": round((self.nulls[col] / n_rows) * 100, 4)}
+            for col in self.schema
+        }
+        summary_info["distinct_counts"] = {col: self.distinct_count(col) for col in self.schema}
+
+        if self.numeric_cols:
+            summary_info["outliers_per_column"] = self.detect_outliers()
+            summary_info["statistical_summary"] = {
+                col: {s: round(v, 2) if isinstance(v, (int, float)) else v for s, v in stats.items()}
+                for col, stats in self.describe_numeric().items()
+            }
+
+        summary_info["constant_columns"] = self.detect_constants()
+        summary_info["near_zero_variance_columns"] = self.detect_near_zero_variance()
+
+        # mutual information is computed on the reservoir sample
+        index_cols = set(self.index_cols)
+        cols = [c for c in self.schema if c not in index_cols]
+        summary_info["top_mutual_info_pairs"] = MutualInfoEngine(self.sample, cols).top_pairs(top_k=top_k_mutual_info)
+        summary_info["error_bounds"] = self.error_bounds()
+
+        json_path = os.path.join(self.summary_dir, "data_summary.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(summary_info, f, ensure_ascii=False, separators=(",", ":"), default=str)
+
+        if self.verbose:
+            print(f"Summary saved to: {json_path}")
+
+        return summary_info
@@ -2,5 +2,9 @@ from .DataCorrelater import DataCorrelater
 from .DataSampler import DataSampler
 from .DataSummarizer import DataSummarizer
 from .DataVisualizer import DataVisualizer
+from .DatasetProfile import DatasetProfile
+from .FigureCache import FigureCache
+from .FigureRenderer import FigureRenderer, PlotSpec, RenderBatch
+from .SketchSummarizer import SketchSummarizer
 
-__all__ = ["DataCorrelater", "DataSampler", "DataSummarizer", "DataVisualizer"]
\ No newline at end of file
+__all__ = ["DataCorrelater", "DataSampler", "DataSummarizer", "DataVisualizer", "DatasetProfile", "FigureCache", "FigureRenderer", "PlotSpec", "RenderBatch", "SketchSummarizer"]
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Micro-benchmarks of the vectorized typing/sampling hot paths against their
+former row-by-row implementations.
+
+usage: python scripts/benchmark_hotpaths.py --rows 1000000
+"""
+import sys
+import os
+import time
+import json
+import argparse
+import tempfile
+from datetime import datetime, date, timedelta
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import polars as pl
+
+from intelligent_reporting.custom_typing import SchemaInfererFlatFiles
+from intelligent_reporting.profiling import DataSampler
+from intelligent_reporting.profiling.MutualInfoEngine import MutualInfoEngine
+
+
+# --- former implementations ---
+def legacy_series_to_boolean(col: pl.Series) -> pl.Series:
+    bool_map = {
+        "true": True, "1": True, "yes": True,
+        "false": False, "0": False, "no": False
+    }
+    s = col.cast(pl.Utf8).str.to_lowercase()
+    return pl.Series([bool_map.get(v, None) for v in s])
+
+
+def legacy_json_safe(df: pl.DataFrame):
+    rows = df.to_dicts()
+    safe_rows = []
+    for row in rows:
+        safe_row = {}
+        for k, v in row.items():
+            if isinstance(v, (datetime, date)):
+                safe_row[k] = v.isoformat()
+            else:
+                safe_row[k] = v
+        safe_rows.append(safe_row)
+    return json.dumps(safe_rows, separators=(",", ":"))
+
+
+def legacy_to_labels(s: pl.Series):
+    vals = s.to_list()
+    uniques = sorted({str(v) for v in vals})
+    mapping = {u: i for i, u in enumerate(uniques)}
+    return np.array([mapping[str(v)] for v in vals], dtype=int)
+
+
+# --- current implementations ---
+def current_series_to_boolean(col: pl.Series) -> pl.Series:
+    converted, _ = SchemaInfererFlatFiles()._convert_column(col, "Boolean")
+    return converted
+
+
+def current_json_safe(df: pl.DataFrame):
+    sampler = DataSampler(df=df, max_rows=df.height, sample_dir=tempfile.gettempdir())
+    return sampler._to_json(df)
+
+
+def current_to_labels(s: pl.Series):
+    # no columns registered, only the encoding is timed
+    return MutualInfoEngine(s.to_frame(), [])._encode(s)
+
+
+def timed(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_benchmark(rows: int, repeat: int):
+    rng = np.random.default_rng(42)
+
+    bool_col = pl.Series("flag", rng.choice(["yes", "No", "TRUE", "false", "1", "0"], rows))
+    labels_col = pl.Series("country", rng.choice([f"country_{i}" for i in range(200)], rows))
+    start = datetime(2024, 1, 1)
+    sample_df = pl.DataFrame({
+        "ts": [start + timedelta(seconds=int(s)) for s in rng.integers(0, 10**7, rows)],
+        "value": rng.random(rows),
+        "label": labels_col,
+    })
+
+    cases = [
+        ("series_to_boolean", legacy_series_to_boolean, (bool_col,), current_series_to_boolean, (bool_col,)),
+        ("DataSampler._json_safe", legacy_json_safe, (sample_df,), current_json_safe, (sample_df,)),
+        ("MutualInfoEngine._encode (str)", legacy_to_labels, (labels_col,), current_to_labels, (labels_col,)),
+    ]
+
+    results = {}
+    for name, legacy, legacy_args, current, current_args in cases:
+        legacy_ms = timed(legacy, *legacy_args, repeat=repeat)
+        current_ms = timed(current, *current_args, repeat=repeat)
+        results[name] = {
+            "legacy_ms": round(legacy_ms, 2),
+            "vectorized_ms": round(current_ms, 2),
+            "speedup": round(legacy_ms / current_ms, 1) if current_ms else None,
+        }
+        print(f"{name:<30} legacy={legacy_ms:10.1f} ms  vectorized={current_ms:9.1f} ms  x{results[name]['speedup']}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the vectorized typing and sampling hot paths"
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of rows")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+    parser.add_argument("--output", type=str, default=None, help="Optional output JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -10,7 +10,7 @@ from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from intelligent_reporting.pipeline import Pipeline
-from intelligent_reporting.profiling import DataSampler, DataSummarizer, DataVisualizer
+from intelligent_reporting.profiling import DataSampler, DataSummarizer, DataVisualizer, DatasetProfile, FigureCache, FigureRenderer
 from intelligent_reporting.agents.metadata_agent import MetadataAgent
 from intelligent_reporting.agents.supervisor_agent import SupervisorAgent
 from intelligent_reporting.agents.assistant_agent import AssistantAgent
@@ -70,16 +70,21 @@ def run_benchmark(
     os.makedirs(RESULTS_DIR, exist_ok=True)
     os.makedirs(FIGURES_DIR, exist_ok=True)
 
-    sampler = DataSampler(df=downcasted, max_rows=10, sample_dir=RESULTS_DIR)
+    profile = DatasetProfile(downcasted)
+    renderer = FigureRenderer(max_workers=0, cache=FigureCache(os.path.join(RESULTS_DIR, ".figure_cache")))
+    sampler = DataSampler(df=profile, max_rows=10, sample_dir=RESULTS_DIR)
     summarizer = DataSummarizer(
-        df=downcasted, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR
+        df=profile, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR, renderer=renderer
     )
 
     sample_data = sampler.run_sample()
     description = summarizer.summary()
     input_schema = {col: str(downcasted.schema[col]) for col in downcasted.columns}
 
-    results["steps"]["profiling"] = {"latency_ms": (time.perf_counter() - start) * 1000}
+    results["steps"]["profiling"] = {
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "figures": renderer.metrics(),
+    }
 
     # Helper to accumulate tokens
     def add_usage(step_name, usage_dict):
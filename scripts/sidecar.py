@@ -10,16 +10,19 @@ import requests
 import httpx  # Async HTTP client
 import uvicorn
 import polars as pl
-from fastapi import FastAPI, HTTPException, Body, UploadFile, File
+from fastapi import FastAPI, HTTPException, Body, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 import shutil
 
-from intelligent_reporting.profiling import DataSampler, DataSummarizer, DataVisualizer
+from intelligent_reporting.profiling import DataSampler, DataSummarizer, DataVisualizer, DatasetProfile, FigureCache, FigureRenderer
 from scripts.utils import json_fix, strip_code_fence
 from intelligent_reporting.orchestrator.selector import Selector
+from intelligent_reporting.orchestrator.scheduler import DAGScheduler
+from intelligent_reporting.core import tracing
+from intelligent_reporting.core.profiler import PROFILE_URL_HEADER, RequestProfiler, requested_mode, is_enabled as profiling_enabled
 from intelligent_reporting.custom_typing.schemaInfererFlatFiles import (
     SchemaInfererFlatFiles,
 )
@@ -48,16 +51,49 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[PROFILE_URL_HEADER],
 )
 
 # Constants
 RESULTS_DIR = "results"
 FIGURES_DIR = "figures"
 DATA_DIR = "data"
+# profiles of the requests sent with an X-Profile header or ?profile=1
+PROFILES_DIR = os.path.join(RESULTS_DIR, "profiles")
+# files above this size are profiled on rows sampled at the source (quick profile)
+QUICK_PROFILE_BYTES = 256 * 1024 * 1024
+QUICK_PROFILE_ROWS = 50_000
 # Ensure directories exist
 os.makedirs(RESULTS_DIR, exist_ok=True)
 os.makedirs(FIGURES_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
+# figures already rendered from the same plot inputs are reused across requests
+FIGURE_RENDERER = FigureRenderer(max_workers=0, cache=FigureCache(os.path.join(RESULTS_DIR, ".figure_cache")))
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Profile a request on demand, the link to its profile is returned in the X-Profile-Url header"""
+    mode = requested_mode(request.headers, request.query_params)
+    if mode is None:
+        return await call_next(request)
+
+    profiler = RequestProfiler(PROFILES_DIR, mode=mode, name=request.url.path)
+    with profiler:
+        response = await call_next(request)
+    if profiler.filename:
+        response.headers[PROFILE_URL_HEADER] = str(request.url_for("get_profile", filename=profiler.filename))
+    return response
+
+
+@app.get("/profiles/{filename}")
+async def get_profile(filename: str):
+    from fastapi.responses import FileResponse
+
+    path = os.path.join(PROFILES_DIR, os.path.basename(filename))
+    if not profiling_enabled() or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Profile not found: {filename}")
+    return FileResponse(path, filename=os.path.basename(path))
 
 
 # Pydantic Models
@@ -69,6 +105,8 @@ class UploadResponse(BaseModel):
 class ProfileRequest(BaseModel):
     file_path: str
     max_rows: int = 250
+    # profile a sample read at the source, None: only for files above QUICK_PROFILE_BYTES
+    quick_profile: Optional[bool] = None
 
 
 class ProfileResponse(BaseModel):
@@ -162,57 +200,93 @@ async def profile_data(request: ProfileRequest):
                 status_code=404, detail=f"File not found: {request.file_path}"
             )
 
-        # Use Selector for format-agnostic loading
-        try:
-            selector = Selector(file=request.file_path)
-            df = selector.get_data()
-        except Exception as e:
-            raise HTTPException(
-                status_code=400, detail=f"Failed to load file: {str(e)}"
+        quick_profile = request.quick_profile
+        if quick_profile is None:
+            quick_profile = os.path.getsize(request.file_path) > QUICK_PROFILE_BYTES
+        # the figures of this request, counted apart from the concurrent ones
+        figures = FIGURE_RENDERER.batch()
+
+        def load():
+            # Use Selector for format-agnostic loading
+            try:
+                selector = Selector(file=request.file_path)
+                if quick_profile:
+                    df = selector.get_sample(QUICK_PROFILE_ROWS)
+                    logger.info(f"Quick profile on {df.height} rows sampled from the source.")
+                    return df
+                return selector.get_data()
+            except Exception as e:
+                raise HTTPException(
+                    status_code=400, detail=f"Failed to load file: {str(e)}"
+                )
+
+        def infer(df):
+            # Infer schema and clean data
+            try:
+                inferer = SchemaInfererFlatFiles()
+                df, rich_schema = inferer.infer_schema(df, schema_dir=RESULTS_DIR)
+                logger.info("Schema inference and data cleaning completed.")
+            except Exception as e:
+                logger.error(f"Schema inference failed: {e}")
+                # Fallback to original df if inference fails, though ideal is to fail hard or warn
+                rich_schema = {col: str(df.schema[col]) for col in df.columns}
+            return df, rich_schema
+
+        def stats(inferred):
+            # derived facts computed once and shared by the profilers
+            profile = DatasetProfile(inferred[0])
+            profile.stats, profile.index_cols
+            return profile
+
+        def sample(profile):
+            # Consistent setup with entry_script.py
+            effective_max_rows = request.max_rows
+            if profile.height < request.max_rows:
+                logger.info(
+                    f"Dataset has fewer rows ({profile.height}) than requested max_rows ({request.max_rows}). Using {profile.height} rows."
+                )
+                effective_max_rows = profile.height
+            sampler = DataSampler(
+                df=profile, max_rows=effective_max_rows, sample_dir=RESULTS_DIR
             )
+            return sampler.run_sample()
 
-        # Infer schema and clean data
-        try:
-            inferer = SchemaInfererFlatFiles()
-            df, rich_schema = inferer.infer_schema(df, schema_dir=RESULTS_DIR)
-            logger.info("Schema inference and data cleaning completed.")
-        except Exception as e:
-            logger.error(f"Schema inference failed: {e}")
-            # Fallback to original df if inference fails, though ideal is to fail hard or warn
-            rich_schema = {col: str(df.schema[col]) for col in df.columns}
-
-        # Consistent setup with entry_script.py
-        effective_max_rows = request.max_rows
-        if df.height < request.max_rows:
-            logger.info(
-                f"Dataset has fewer rows ({df.height}) than requested max_rows ({request.max_rows}). Using {df.height} rows."
+        def summary(profile):
+            # summarizer = DataSummarizer(df=df, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR)
+            summarizer = DataSummarizer(
+                df=profile, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR, renderer=figures
             )
-            effective_max_rows = df.height
-
-        sampler = DataSampler(
-            df=df, max_rows=effective_max_rows, sample_dir=RESULTS_DIR
-        )
-
-        # summarizer = DataSummarizer(df=df, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR)
-        summarizer = DataSummarizer(
-            df=df, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR
-        )
+            return summarizer.summary()
+
+        # sampling and summary only share the profile, they run concurrently
+        dag = DAGScheduler()
+        dag.add("load", load)
+        dag.add("infer", infer, deps=["load"])
+        dag.add("stats", stats, deps=["infer"])
+        dag.add("sample", sample, deps=["stats"])
+        dag.add("summary", summary, deps=["stats"])
+        results = dag.run()
+        df, rich_schema = results["infer"]
+        sample_data, description = results["sample"], results["summary"]
 
         # visualizer = DataVisualizer(
         #    df=df, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR, top_k_categories=5
         # )
         visualizer = DataVisualizer(
-            df=df, summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR, top_k_categories=5
+            df=results["stats"], summary_dir=RESULTS_DIR, figures_dir=FIGURES_DIR, top_k_categories=5, renderer=figures
         )
 
-        sample_data = sampler.run_sample()
-        description = summarizer.summary()
+        logger.info(f"Stage timings: {dag.timings()}")
+        export_trace()
+        logger.info(f"Figure metrics: {figures.metrics()}")
+        if quick_profile:
+            description["quick_profile"] = {"sampled_rows": df.height}
         # schema = {col: str(df.schema[col]) for col in df.columns} # Replaced by rich_schema
 
         # Flatten rich schema for frontend compatibility while keeping accuracy
-        # rich_schema['columns'] is {col: {inferred_type: ..., ...}}
+        # rich_schema['columns'] is {col: ColumnSchema(inferred_type=..., ...)}
         schema_info = {
-            col: details["inferred_type"]
+            col: details.inferred_type
             for col, details in rich_schema["columns"].items()
         }
 
@@ -251,13 +325,24 @@ logger.info(f"Sidecar configured to proxy to Backend at: {effective_backend_url}
 
 
 # Helper for proxying
+def export_trace():
+    """With INTELLIGENT_REPORTING_TRACE set, write the spans of the last request next to the results"""
+    if not tracing.is_enabled():
+        return
+    tracing.export_jsonl(os.path.join(RESULTS_DIR, "trace.jsonl"))
+    tracing.export_chrome_trace(os.path.join(RESULTS_DIR, "trace.json"))
+    tracing.reset()
+    logger.info(f"Trace written to {RESULTS_DIR}/trace.json")
+
+
 async def proxy_request(url: str, json_body: dict):
     # Use httpx for async requests
     async with httpx.AsyncClient(
         timeout=120.0
     ) as client:  # Generous timeout for agents
         try:
-            resp = await client.post(url, json=json_body)
+            with tracing.span("agent.proxy", url=url):
+                resp = await client.post(url, json=json_body)
             # Forward status code and content
             if resp.status_code >= 400:
                 raise HTTPException(status_code=resp.status_code, detail=resp.text)
@@ -388,9 +473,10 @@ async def execute_task(request: ExecuteTaskRequest):
 
         # Use httpx for async consistency (previously used blocking requests)
         async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(
-                f"{effective_backend_url}/sandbox/run", json=sandbox_payload
-            )
+            with tracing.span("sandbox.run", task=task_name):
+                resp = await client.post(
+                    f"{effective_backend_url}/sandbox/run", json=sandbox_payload
+                )
 
         if resp.status_code >= 400:
             # Manually raise for status since httpx doesn't have quite the same API as requests in all versions,
@@ -438,6 +524,7 @@ async def execute_task(request: ExecuteTaskRequest):
 
         # Extract usage
         usage = assistant_out.get("_usage", {})
+        export_trace()
 
         return ExecuteTaskResponse(
             task_name=task_name,
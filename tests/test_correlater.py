@@ -0,0 +1,33 @@
+"""
+DataCorrelater column selection: NaN values are skipped like nulls, as pandas does.
+"""
+import numpy as np
+import polars as pl
+import pytest
+
+from intelligent_reporting.profiling.DataCorrelater import DataCorrelater
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(5)
+    x = rng.random(500)
+    with_nan = x * 2 + rng.random(500) * 0.1
+    with_nan[::50] = np.nan
+    constant_nan = np.ones(500)
+    constant_nan[::50] = np.nan
+    return pl.DataFrame({"x": x, "with_nan": with_nan, "constant_nan": constant_nan, "y": rng.random(500)})
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_nan_column_is_varying(tmp_path, frame, lazy):
+    correlater = DataCorrelater(frame.lazy() if lazy else frame, output_dir=str(tmp_path))
+    assert correlater._varying_columns() == ["x", "with_nan", "y"]
+
+
+def test_nan_column_in_heatmap_and_blocked_pairs(tmp_path, frame):
+    corr_df, _ = DataCorrelater(frame, output_dir=str(tmp_path)).correlation_heatmap()
+    assert corr_df.loc["x", "with_nan"] > 0.9
+
+    pairs = DataCorrelater(frame, blocked=True, output_dir=str(tmp_path))._pairs("pearson")
+    assert {pairs[0][0], pairs[0][1]} == {"x", "with_nan"}
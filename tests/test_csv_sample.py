@@ -0,0 +1,28 @@
+"""
+CSVConnector.sample on a file read in chunks: quoted newlines must not cut records or shorten the sample.
+"""
+import pytest
+
+from intelligent_reporting.connectors.csv_connector import CSVConnector
+
+
+@pytest.fixture
+def quoted_newlines(tmp_path, monkeypatch):
+    monkeypatch.setattr(CSVConnector, "SAMPLE_FULL_READ_BYTES", 0)
+    path = tmp_path / "notes.csv"
+    with open(path, "w", newline="") as f:
+        f.write("id,score,note\n")
+        for i in range(60_000):
+            note = f'"line one {i}\nline two, with comma\nthree"' if i % 3 == 0 else f"plain {i}"
+            f.write(f"{i},{i % 97},{note}\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("seed", [1, 3, 7, 42])
+def test_sample_quoted_newlines(quoted_newlines, seed):
+    df = CSVConnector(quoted_newlines).sample(250, seed=seed)
+    assert df.height == 250
+    assert df["id"].n_unique() == 250
+    # columns are read as strings
+    multiline = df.filter(df["id"].cast(int) % 3 == 0)["note"]
+    assert multiline.str.ends_with("three").all()
@@ -0,0 +1,18 @@
+"""
+ParquetConnector.sample must return n_rows distinct rows whatever the row group sizes.
+"""
+import numpy as np
+import polars as pl
+import pytest
+
+from intelligent_reporting.connectors.parquet_connector import ParquetConnector
+
+
+@pytest.mark.parametrize("row_group_size", [100, 3000])
+@pytest.mark.parametrize("n_rows", [50, 2500])
+def test_sample_size(tmp_path, row_group_size, n_rows):
+    path = str(tmp_path / "ids.parquet")
+    pl.DataFrame({"id": np.arange(3000)}).write_parquet(path, row_group_size=row_group_size)
+    df = ParquetConnector(path).sample(n_rows, seed=3)
+    assert df.height == n_rows
+    assert df["id"].n_unique() == n_rows
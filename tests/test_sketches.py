@@ -0,0 +1,133 @@
+"""
+The sketches of core.sketches against exact values on seeded data, within their stated error bounds.
+"""
+import numpy as np
+import polars as pl
+import pytest
+
+from intelligent_reporting.core.sketches import HyperLogLog, KLLSketch, Moments, SpaceSaving
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def batches(values: np.ndarray, n: int) -> list[pl.Series]:
+    return [pl.Series("x", part) for part in np.array_split(values, n)]
+
+
+# --- HyperLogLog: relative error of the distinct count within 3 standard errors ---
+
+def test_hyperloglog_update(rng):
+    values = rng.integers(0, 10**9, 200_000)
+    sketch = HyperLogLog(precision=14)
+    for batch in batches(values, 4):
+        sketch.update(batch)
+    exact = len(np.unique(values))
+    assert abs(sketch.count() - exact) / exact <= 3 * sketch.relative_error
+
+
+def test_hyperloglog_merge(rng):
+    left, right = rng.integers(0, 150_000, 100_000), rng.integers(100_000, 250_000, 100_000)
+    a, b = HyperLogLog(precision=14).update(pl.Series(left)), HyperLogLog(precision=14).update(pl.Series(right))
+    union = HyperLogLog(precision=14).update(pl.Series(np.concatenate([left, right])))
+    merged = a.merge(b)
+
+    # a merged sketch is the sketch of the union
+    assert np.array_equal(merged.registers, union.registers)
+    exact = len(np.union1d(left, right))
+    assert abs(merged.count() - exact) / exact <= 3 * merged.relative_error
+
+
+def test_hyperloglog_small_counts_are_exact():
+    sketch = HyperLogLog(precision=14).update(pl.Series(["a", "b", "c", "a", None]))
+    assert round(sketch.count()) == 3
+
+
+# --- KLL: normalized rank of the estimated quantiles within rank_error ---
+
+QUANTILES = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+
+
+def assert_ranks(sketch: KLLSketch, values: np.ndarray):
+    ordered = np.sort(values)
+    for q in QUANTILES:
+        estimate = sketch.quantile(q)
+        low = np.searchsorted(ordered, estimate, side="left") / ordered.size
+        high = np.searchsorted(ordered, estimate, side="right") / ordered.size
+        # the estimate is a value of the data, q must fall within its rank range up to the error
+        assert low - sketch.rank_error <= q <= high + sketch.rank_error, (q, estimate)
+
+
+def test_kll_update(rng):
+    values = rng.lognormal(size=300_000)
+    sketch = KLLSketch(k=200, seed=1)
+    for batch in batches(values, 6):
+        sketch.update(batch)
+    assert sketch.n == values.size
+    assert sketch.min == values.min() and sketch.max == values.max()
+    assert_ranks(sketch, values)
+
+
+def test_kll_merge(rng):
+    left, right = rng.normal(0, 1, 150_000), rng.normal(3, 2, 100_000)
+    a, b = KLLSketch(k=200, seed=1).update(pl.Series(left)), KLLSketch(k=200, seed=2).update(pl.Series(right))
+    merged = a.merge(b)
+    values = np.concatenate([left, right])
+    assert merged.n == values.size
+    assert_ranks(merged, values)
+
+
+# --- Space-Saving: true <= reported <= true + error, unreported values occur at most floor times ---
+
+def assert_counts(sketch: SpaceSaving, values: np.ndarray):
+    uniques, counts = np.unique(values, return_counts=True)
+    exact = dict(zip(uniques.tolist(), counts.tolist()))
+    reported = {value: (count, error) for value, count, error in sketch.top()}
+    for value, (count, error) in reported.items():
+        assert exact[value] <= count <= exact[value] + error
+    assert all(count <= sketch.floor for value, count in exact.items() if value not in reported)
+
+
+def test_space_saving_update(rng):
+    values = rng.zipf(1.5, 200_000) % 5_000
+    sketch = SpaceSaving(capacity=64)
+    for batch in batches(values, 8):
+        sketch.update(batch)
+    assert sketch.n == values.size
+    assert_counts(sketch, values)
+    # the heaviest hitter of a skewed distribution is found
+    assert sketch.top(1)[0][0] == np.bincount(values).argmax()
+
+
+def test_space_saving_merge(rng):
+    left, right = rng.zipf(1.3, 100_000) % 2_000, rng.zipf(1.8, 100_000) % 2_000
+    merged = SpaceSaving(capacity=32).update(pl.Series(left)).merge(SpaceSaving(capacity=32).update(pl.Series(right)))
+    assert_counts(merged, np.concatenate([left, right]))
+
+
+# --- Moments: exact up to floating point ---
+
+def assert_moments(moments: Moments, values: np.ndarray):
+    s = pl.Series(values)
+    assert moments.n == values.size
+    assert moments.mean == pytest.approx(s.mean(), rel=1e-9)
+    assert moments.var == pytest.approx(s.var(), rel=1e-9)
+    assert moments.skew == pytest.approx(s.skew(), rel=1e-6)
+    assert moments.kurtosis == pytest.approx(s.kurtosis(), rel=1e-6)
+    assert (moments.min, moments.max) == (values.min(), values.max())
+
+
+def test_moments_update(rng):
+    values = rng.gamma(2.0, 3.0, 100_000)
+    moments = Moments()
+    for batch in batches(values, 7):
+        moments.update(batch)
+    assert_moments(moments, values)
+
+
+def test_moments_merge(rng):
+    left, right = rng.normal(10, 2, 50_000), rng.exponential(5, 20_000)
+    merged = Moments.from_values(left).merge(Moments.from_values(right))
+    assert_moments(merged, np.concatenate([left, right]))